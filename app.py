@@ -37,6 +37,14 @@ def create_app(config_class=Config):
     
     # Initialize extensions
     db.init_app(app)
+
+    # Per-request SQL statement counter
+    from services.query_counter import init_query_counter
+    init_query_counter(app)
+
+    # Uploaded audio analysis pool
+    from services.audio_worker import init_audio_worker
+    init_audio_worker(app)
     
     # CORS setup
     cors_origins = app.config.get("CORS_ORIGINS") or "*"
@@ -197,10 +205,16 @@ def create_app(config_class=Config):
     app.register_blueprint(learning_bp)
     app.register_blueprint(analysis_bp)
     app.register_blueprint(recommendations_bp)
+
+    # CLI commands
+    from commands import register_commands
+    register_commands(app)
     
     # Create database tables
+    from migrations import upgrade_schema
     with app.app_context():
         db.create_all()
+        upgrade_schema()
     
     # ========== ROOT ROUTES ==========
     
@@ -229,12 +243,14 @@ def create_app(config_class=Config):
             description: Basic service and dataset status
         """
         from models import Maqam, MaqamContribution
+        from services.cache_service import cache_stats
         maqamet_count = Maqam.query.count()
         contributions_count = MaqamContribution.query.count()
         return jsonify({
             "services": ["knowledge", "learning", "recommendation", "analysis"],
             "maqamet_count": maqamet_count,
-            "contributions_count": contributions_count
+            "contributions_count": contributions_count,
+            "caches": cache_stats(),
         }), 200
     
     @app.route("/")
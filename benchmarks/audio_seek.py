@@ -0,0 +1,122 @@
+"""
+Concurrent audio seeks: Flask's static route vs /knowledge/audio/<sha256>.
+
+Serves a clip from static/audio both ways from a local threaded server, then
+has concurrent clients issue random Range requests (what a browser does when
+the player seeks) and reports latency, throughput and the caching headers.
+
+    python benchmarks/audio_seek.py --clients 16 --seeks 50 --chunk 262144
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+WORK_DIR = tempfile.mkdtemp(prefix="tunimaqam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ["AUDIO_STORAGE_DIR"] = os.path.join(WORK_DIR, "audio")
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+os.environ.setdefault("ALLOW_WEAK_SECRETS", "1")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from services.audio_storage import acquire_blob, get_audio_storage  # noqa: E402
+
+
+def store_clip(app, filename):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        with open(os.path.join(app.static_folder, "audio", filename), "rb") as fh:
+            sha256, size = get_audio_storage().put(fh)
+        acquire_blob(sha256, size, "audio/mpeg")
+        db.session.commit()
+    return sha256, size
+
+
+def fetch(port, path, headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    start = time.perf_counter()
+    conn.request("GET", path, headers=headers)
+    res = conn.getresponse()
+    body = res.read()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return res.status, dict(res.getheaders()), len(body), elapsed
+
+
+def run(port, path, size, clients, seeks, chunk, seed=7):
+    rng = random.Random(seed)
+    ranges = [rng.randrange(0, max(1, size - chunk)) for _ in range(clients * seeks)]
+
+    def client(offsets):
+        return [fetch(port, path, {"Range": f"bytes={o}-{o + chunk - 1}"}) for o in offsets]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        batches = list(pool.map(client, [ranges[i::clients] for i in range(clients)]))
+    wall = time.perf_counter() - start
+
+    results = [r for batch in batches for r in batch]
+    latencies = sorted(r[3] * 1000 for r in results)
+    return {
+        "statuses": sorted({r[0] for r in results}),
+        "requests_per_s": len(results) / wall,
+        "mb_per_s": sum(r[2] for r in results) / wall / 1e6,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clip", default="AL_MAYA.mp3", help="File under static/audio to serve.")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients.")
+    parser.add_argument("--seeks", type=int, default=50, help="Range requests per client.")
+    parser.add_argument("--chunk", type=int, default=256 * 1024, help="Bytes per range request.")
+    args = parser.parse_args()
+
+    app = create_app()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    sha256, size = store_clip(app, args.clip)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    routes = {
+        "static route": f"/static/audio/{args.clip}",
+        "audio endpoint": f"/knowledge/audio/{sha256}",
+    }
+    print(f"{args.clip}: {size / 1e6:.1f} MB, {args.clients} clients x {args.seeks} seeks of {args.chunk} bytes")
+    try:
+        for label, path in routes.items():
+            headers = fetch(port, path, {})[1]
+            stats = run(port, path, size, args.clients, args.seeks, args.chunk)
+            print(f"{label} ({path})")
+            print(f"  statuses {stats['statuses']}  {stats['requests_per_s']:.0f} req/s  "
+                  f"{stats['mb_per_s']:.0f} MB/s  p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms")
+            print(f"  ETag: {headers.get('ETag')}  Cache-Control: {headers.get('Cache-Control')}")
+            if "immutable" in headers.get("Cache-Control", ""):
+                print("  replays: served from the browser cache, no request")
+            else:
+                revalidations = [fetch(port, path, {"If-None-Match": headers["ETag"]}) for _ in range(50)]
+                median = statistics.median(r[3] * 1000 for r in revalidations)
+                print(f"  replays: one revalidation round trip each ({revalidations[0][0]}, p50 {median:.1f} ms)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Contribution throughput: per-item endpoints vs the batch endpoints.
+
+Submits and then reviews N contributions against a throwaway SQLite database,
+once through /knowledge/maqam/<id>/contributions + /knowledge/contributions/<id>/review
+and once through /knowledge/contributions/batch + /knowledge/contributions/review/batch.
+
+    python benchmarks/contribution_throughput.py --count 1000 --batch-size 500
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="tunimaqam-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+os.environ.setdefault("ALLOW_WEAK_SECRETS", "1")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Maqam  # noqa: E402
+from services.auth_service import issue_token  # noqa: E402
+
+
+def setup(app, maqamet=20):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Maqam(name_en=f"Bench {i}", name_ar=f"مقام {i}") for i in range(maqamet)])
+        db.session.commit()
+        ids = [m.id for m in Maqam.query.order_by(Maqam.id)]
+        token = issue_token(sub="bench@test", role="admin", email="bench@test")
+    return ids, {"Authorization": f"Bearer {token}"}
+
+
+def items(maqam_ids, count):
+    return [
+        {"maqam_id": maqam_ids[i % len(maqam_ids)], "type": "note", "payload": {"text": f"note {i}"}}
+        for i in range(count)
+    ]
+
+
+def run_single(client, headers, contributions):
+    start = time.perf_counter()
+    ids = []
+    for item in contributions:
+        res = client.post(f"/knowledge/maqam/{item['maqam_id']}/contributions",
+                          json={"type": item["type"], "payload": item["payload"]}, headers=headers)
+        ids.append(res.get_json()["id"])
+    submitted = time.perf_counter()
+    for i, contrib_id in enumerate(ids):
+        status = "accepted" if i % 2 else "rejected"
+        client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": status}, headers=headers)
+    return submitted - start, time.perf_counter() - submitted
+
+
+def run_batch(client, headers, contributions, batch_size):
+    start = time.perf_counter()
+    ids = []
+    for i in range(0, len(contributions), batch_size):
+        res = client.post("/knowledge/contributions/batch",
+                          json={"contributions": contributions[i:i + batch_size]}, headers=headers)
+        ids.extend(r["id"] for r in res.get_json()["results"])
+    submitted = time.perf_counter()
+    reviews = [{"id": contrib_id, "status": "accepted" if i % 2 else "rejected"} for i, contrib_id in enumerate(ids)]
+    for i in range(0, len(reviews), batch_size):
+        client.post("/knowledge/contributions/review/batch", json={"reviews": reviews[i:i + batch_size]},
+                    headers=headers)
+    return submitted - start, time.perf_counter() - submitted
+
+
+def report(label, count, seconds):
+    print(f"  {label:<22} {seconds * 1000:10.1f} ms  {count / seconds:10.0f} items/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000, help="Contributions submitted and reviewed per run.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Items per batch request (max 500).")
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+
+    print(f"{args.count} contributions, SQLite at {DB_PATH}")
+    maqam_ids, headers = setup(app)
+    single = run_single(client, headers, items(maqam_ids, args.count))
+    print("per-item endpoints")
+    report("submit", args.count, single[0])
+    report("review", args.count, single[1])
+
+    maqam_ids, headers = setup(app)
+    batch = run_batch(client, headers, items(maqam_ids, args.count), args.batch_size)
+    print(f"batch endpoints ({args.batch_size} per request)")
+    report("submit", args.count, batch[0])
+    report("review", args.count, batch[1])
+
+    print(f"speedup: submit x{single[0] / batch[0]:.1f}, review x{single[1] / batch[1]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
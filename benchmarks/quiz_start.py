@@ -0,0 +1,131 @@
+"""
+Quiz start latency against catalog size.
+
+Fills a throwaway SQLite database with synthetic maqamet and times
+POST /learning/quiz/start: the first call after a catalog change (which
+compiles the quiz catalog) and the median of the following calls. For
+comparison it also times the question bank as it was built before quiz
+catalogs (distractor pools rebuilt per maqam, every question generated),
+which grows quadratically and is skipped above --legacy-max maqamet.
+
+    python benchmarks/quiz_start.py --sizes 100 1000 5000 --repeat 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="tunimaqam-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+os.environ.setdefault("ALLOW_WEAK_SECRETS", "1")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Maqam  # noqa: E402
+from services.auth_service import issue_token  # noqa: E402
+from services.catalog_service import catalog_rebuilt  # noqa: E402
+
+REGIONS = [f"region {i}" for i in range(60)]
+USAGES = [f"usage {i}" for i in range(40)]
+
+
+def fill(app, size, seed=3):
+    rng = random.Random(seed)
+    rows = [{
+        "name_en": f"Maqam {i}",
+        "name_ar": f"مقام {i}",
+        "emotion": rng.choice(["joy", "sadness", "longing", "calm"]),
+        "usage": ", ".join(rng.sample(USAGES, 2)),
+        "regions_json": json.dumps(rng.sample(REGIONS, 2)),
+        "ajnas_json": json.dumps([{"name": {"en": f"Jins {i}"}}, {"name": {"en": f"Jins {i + 1}"}}]),
+    } for i in range(size)]
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(Maqam), rows)
+        catalog_rebuilt()
+        db.session.commit()
+
+
+def legacy_question_bank(maqamet):
+    """The bank as start_quiz built it before: every pool rebuilt for every maqam."""
+    def choices(correct, pool):
+        pool = list(dict.fromkeys(p for p in pool if p and p != correct))
+        picked = [correct] + random.sample(pool, k=min(3, len(pool)))
+        random.shuffle(picked)
+        return picked
+
+    questions = []
+    for m in maqamet:
+        if m.emotion:
+            questions.append({"type": "open", "answer": m.emotion, "maqam_id": m.id})
+        regions = json.loads(m.regions_json) if m.regions_json else []
+        if regions:
+            pool = [r for mm in maqamet for r in (json.loads(mm.regions_json) if mm.regions_json else [])]
+            questions.append({"type": "mcq", "choices": choices(regions[0], pool), "maqam_id": m.id})
+        usages = [u.strip() for u in (m.usage or "").split(",") if u.strip()]
+        if usages:
+            pool = [u.strip() for mm in maqamet for u in (mm.usage or "").split(",") if u.strip()]
+            questions.append({"type": "mcq", "choices": choices(usages[0], pool), "maqam_id": m.id})
+        names = [a["name"]["en"] for a in (json.loads(m.ajnas_json) if m.ajnas_json else [])]
+        if names:
+            pool = [a["name"]["en"] for mm in maqamet for a in (json.loads(mm.ajnas_json) if mm.ajnas_json else [])]
+            questions.append({"type": "mcq", "choices": choices(names[0], pool), "maqam_id": m.id})
+    random.shuffle(questions)
+    return questions[:20]
+
+
+def time_legacy(app):
+    with app.app_context():
+        start = time.perf_counter()
+        legacy_question_bank(Maqam.query.all())
+        return (time.perf_counter() - start) * 1000
+
+
+def time_start(client, headers, repeat):
+    def call():
+        start = time.perf_counter()
+        res = client.post("/learning/quiz/start", json={"lang": "en"}, headers=headers)
+        assert res.status_code == 200 and res.get_json()["count"] == 20, res.get_data(as_text=True)
+        return (time.perf_counter() - start) * 1000
+
+    cold = call()
+    warm = sorted(call() for _ in range(repeat))
+    return cold, statistics.median(warm), warm[int(0.95 * (len(warm) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Catalog sizes.")
+    parser.add_argument("--repeat", type=int, default=50, help="Warm quiz starts per size.")
+    parser.add_argument("--legacy-max", type=int, default=1000,
+                        help="Largest catalog to time the legacy bank on (it is quadratic).")
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["CATALOG_VERSION_POLL_SECONDS"] = 60
+    client = app.test_client()
+    with app.app_context():
+        token = issue_token(sub="bench@test", role="learner", email="bench@test")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    print(f"{'maqamet':>8} {'first start':>12} {'p50 start':>10} {'p95 start':>10} {'legacy bank':>12}")
+    for size in args.sizes:
+        fill(app, size)
+        cold, p50, p95 = time_start(client, headers, args.repeat)
+        legacy = f"{time_legacy(app):10.1f}ms" if size <= args.legacy_max else f"{'skipped':>12}"
+        print(f"{size:>8} {cold:10.1f}ms {p50:8.2f}ms {p95:8.2f}ms {legacy}")
+
+
+if __name__ == "__main__":
+    main()
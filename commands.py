@@ -0,0 +1,180 @@
+"""
+Flask CLI commands (run with `flask --app app <group> <command>`).
+"""
+
+import os
+import json
+
+import click
+from flask.cli import AppGroup
+
+recommendations_cli = AppGroup("recommendations", help="Recommendation engine evaluation and tuning.")
+catalog_cli = AppGroup("catalog", help="Maqam catalog import and export.")
+contributions_cli = AppGroup("contributions", help="Contribution maintenance.")
+audio_cli = AppGroup("audio", help="Uploaded audio storage.")
+
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recommendation_scenarios.json")
+
+
+@recommendations_cli.command("evaluate")
+@click.option("--scenarios", "scenarios_path", default=DEFAULT_SCENARIOS, show_default=True,
+              help="Labelled scenario set (JSON).")
+@click.option("--weights", "weights_path", default=None, help="Weights file to evaluate (defaults to built-in weights).")
+@click.option("--k", default=3, show_default=True, help="Ranking cutoff.")
+@click.option("--repeat", default=5, show_default=True, help="Timing repetitions per scenario.")
+def evaluate_command(scenarios_path, weights_path, k, repeat):
+    """Report ranking metrics and per-scenario latency for one weight configuration."""
+    from services.recommendation_eval import evaluate, load_scenarios
+    from services.recommendation_service import load_profiles, load_weights
+
+    report = evaluate(load_profiles(), load_scenarios(scenarios_path), load_weights(weights_path), k=k, repeat=repeat)
+    click.echo(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+@recommendations_cli.command("tune")
+@click.option("--scenarios", "scenarios_path", default=DEFAULT_SCENARIOS, show_default=True,
+              help="Labelled scenario set (JSON).")
+@click.option("--grid", "grid_path", default=None, help="JSON {weight: [values]} search space (defaults to a built-in grid).")
+@click.option("--base", "base_path", default=None, help="Weights file for weights not in the grid.")
+@click.option("--objective", default="ndcg_at_k", show_default=True,
+              type=click.Choice(["precision_at_k", "recall_at_k", "mrr", "ndcg_at_k"]))
+@click.option("--k", default=3, show_default=True, help="Ranking cutoff.")
+@click.option("--workers", default=None, type=int, help="Process pool size (defaults to CPU count).")
+@click.option("--output", default="recommendation_weights.json", show_default=True,
+              help="Where to write the winning configuration.")
+def tune_command(scenarios_path, grid_path, base_path, objective, k, workers, output):
+    """Grid-search scoring weights and write the best configuration."""
+    from services.recommendation_eval import grid_search, load_scenarios
+    from services.recommendation_service import load_profiles, load_weights
+
+    grid = None
+    if grid_path:
+        with open(grid_path, encoding="utf-8") as fh:
+            grid = json.load(fh)
+    result = grid_search(
+        load_profiles(), load_scenarios(scenarios_path), grid=grid, base=load_weights(base_path),
+        objective=objective, k=k, workers=workers,
+    )
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({"weights": result["weights"], "objective": objective, "metrics": result["metrics"]}, fh, indent=2)
+
+    click.echo(json.dumps({k_: v for k_, v in result.items() if k_ != "leaderboard"}, indent=2))
+    click.echo(f"Best configuration written to {output}; set RECOMMENDATION_WEIGHTS_FILE={output} to serve it.")
+
+
+@catalog_cli.command("export")
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-", show_default=True,
+              help="NDJSON file to write ('-' for stdout).")
+def export_command(output):
+    """Write the catalog as newline-delimited JSON."""
+    from services.catalog_io_service import export_lines
+
+    for line in export_lines():
+        output.write(line)
+
+
+@catalog_cli.command("import")
+@click.argument("source", type=click.File("rb"))
+def import_command(source):
+    """Upsert maqamet from a newline-delimited JSON file ('-' for stdin) in one transaction."""
+    from extensions import db
+    from services.catalog_io_service import CatalogImportError, import_lines
+
+    try:
+        stats = import_lines(source)
+    except CatalogImportError as exc:
+        db.session.rollback()
+        raise click.ClickException(f"Import failed, nothing was imported: {exc}")
+    db.session.commit()
+    click.echo(f"Imported catalog: {stats['created']} created, {stats['updated']} updated, "
+               f"{stats['audios']} audio references added.")
+
+
+@catalog_cli.command("rebuild")
+def rebuild_command():
+    """Recompute the related-maqamet graph and the duplicate-detection index."""
+    from extensions import db
+    from services.catalog_service import catalog_rebuilt
+
+    catalog_rebuilt()
+    db.session.commit()
+    click.echo("Rebuilt the related-maqamet graph and the duplicate-detection index.")
+
+
+@catalog_cli.command("render-previews")
+def render_previews_command():
+    """Synthesize the audio preview of every jins into JINS_PREVIEW_DIR."""
+    from services.jins_preview_service import render_all_previews
+
+    counts = render_all_previews()
+    click.echo(f"Rendered {counts['rendered']} jins previews; {counts['stored']} already stored, "
+               f"{counts['unplayable']} without playable notes.")
+
+
+@contributions_cli.command("backfill-stats")
+def backfill_stats_command():
+    """Rebuild the contributor leaderboard table from the contributions."""
+    from extensions import db
+    from services.leaderboard_service import rebuild_contributor_stats
+
+    count = rebuild_contributor_stats()
+    db.session.commit()
+    click.echo(f"Rebuilt leaderboard totals for {count} contributors.")
+
+
+@contributions_cli.command("apply-accepted")
+@click.option("--limit", default=None, type=int, help="Stop after this many contributions.")
+def apply_accepted_command(limit):
+    """Merge accepted new_maqam and field_edit contributions that were not applied yet."""
+    from services.merge_service import apply_accepted
+
+    result = apply_accepted(limit=limit)
+    for conflict in result["conflicts"]:
+        click.echo(f"contribution {conflict['id']}: {conflict['error']}", err=True)
+    click.echo(f"Applied {result['applied']} contributions, {len(result['conflicts'])} conflicts.")
+
+
+@audio_cli.command("gc")
+@click.option("--grace", default=3600, show_default=True,
+              help="Keep unreferenced files younger than this many seconds (uploads in flight).")
+def audio_gc_command(grace):
+    """Delete stored audio files that no upload references."""
+    from services.audio_storage import collect_garbage
+
+    click.echo(f"Removed {collect_garbage(grace_seconds=grace)} unreferenced audio files.")
+
+
+@audio_cli.command("import-static")
+def audio_import_static_command():
+    """Move clips served from static/audio into the content-addressed store."""
+    from flask import current_app, url_for
+    from extensions import db
+    from services.audio_storage import adopt_static_audio
+    from services.catalog_service import catalog_changed
+
+    with current_app.test_request_context():
+        adopted, missing = adopt_static_audio(
+            current_app.static_folder, lambda sha256: url_for("knowledge.get_audio_blob", sha256=sha256)
+        )
+    if adopted:
+        catalog_changed()
+    db.session.commit()
+    click.echo(f"Moved {adopted} audio clips into storage; {missing} referenced files were not found.")
+
+
+@audio_cli.command("analyze")
+@click.option("--all", "reanalyze", is_flag=True, help="Re-analyze clips that already have results.")
+def audio_analyze_command(reanalyze):
+    """Analyze stored clips still pending (e.g. when the queue was full)."""
+    from services.audio_worker import analyze_pending
+
+    counts = analyze_pending(reanalyze=reanalyze)
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "nothing to do"
+    click.echo(f"Analyzed {sum(counts.values())} audio clips: {summary}.")
+
+
+def register_commands(app):
+    app.cli.add_command(recommendations_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(contributions_cli)
+    app.cli.add_command(audio_cli)
@@ -35,6 +35,48 @@ class Config:
     ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY", "")
     ASSEMBLYAI_API_URL = os.getenv("ASSEMBLYAI_API_URL", "https://api.assemblyai.com/v2")
 
+    # Catalog caching: how often workers re-check the shared catalog version
+    CATALOG_VERSION_POLL_SECONDS = float(os.getenv("CATALOG_VERSION_POLL_SECONDS", "2"))
+    RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+    # Tuned scoring weights written by `flask recommendations tune` (empty = built-in defaults)
+    RECOMMENDATION_WEIGHTS_FILE = os.getenv("RECOMMENDATION_WEIGHTS_FILE", "")
+    # Pre-serialized catalog views (/knowledge/maqam, /knowledge/regions, /learning/flashcards)
+    CATALOG_SNAPSHOT_CACHE_SIZE = int(os.getenv("CATALOG_SNAPSHOT_CACHE_SIZE", "256"))
+    CATALOG_SNAPSHOT_MAX_AGE = int(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "0"))
+
+    # Uploaded audio, stored once per SHA-256 digest ("local" is the only backend)
+    AUDIO_STORAGE_BACKEND = os.getenv("AUDIO_STORAGE_BACKEND", "local")
+    AUDIO_STORAGE_DIR = os.getenv("AUDIO_STORAGE_DIR") or os.path.join(basedir, "storage", "audio")
+    # Stored clips never change, so they are cached as immutable for this long
+    AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+    # Hand file transfer to the front proxy: an nginx internal location aliased
+    # to AUDIO_STORAGE_DIR (X-Accel-Redirect), or X-Sendfile (Apache/lighttpd)
+    AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv("AUDIO_ACCEL_REDIRECT_PREFIX", "")
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "0") == "1"
+    # Background analysis of uploads (duration, loudness, waveform peaks).
+    # 0 workers analyzes during the upload request instead
+    AUDIO_ANALYSIS_WORKERS = int(os.getenv("AUDIO_ANALYSIS_WORKERS", "2"))
+    AUDIO_ANALYSIS_QUEUE_SIZE = int(os.getenv("AUDIO_ANALYSIS_QUEUE_SIZE", "64"))
+    # Decoder for non-WAV clips; without it MP3s only get duration and sample rate
+    AUDIO_FFMPEG_BIN = os.getenv("AUDIO_FFMPEG_BIN", "ffmpeg")
+
+    # Synthesized jins previews: rendered WAVs kept in memory (bounded by
+    # bytes) and on disk, where `flask catalog render-previews` stores them
+    JINS_PREVIEW_DIR = os.getenv("JINS_PREVIEW_DIR") or os.path.join(basedir, "storage", "previews")
+    JINS_PREVIEW_CACHE_SIZE = int(os.getenv("JINS_PREVIEW_CACHE_SIZE", "512"))
+    JINS_PREVIEW_CACHE_BYTES = int(os.getenv("JINS_PREVIEW_CACHE_BYTES", str(32 * 1024 * 1024)))
+    JINS_PREVIEW_MAX_AGE = int(os.getenv("JINS_PREVIEW_MAX_AGE", "86400"))
+
+    # Started quizzes: "database" (shared by all workers) or "memory" (single process)
+    QUIZ_STORE_BACKEND = os.getenv("QUIZ_STORE_BACKEND", "database")
+    QUIZ_TTL_SECONDS = int(os.getenv("QUIZ_TTL_SECONDS", "3600"))
+    QUIZ_STORE_MAX_SIZE = int(os.getenv("QUIZ_STORE_MAX_SIZE", "10000"))
+    # Issue signed, self-contained quiz tokens instead of storing quizzes
+    QUIZ_TOKENS = os.getenv("QUIZ_TOKENS", "0") == "1"
+
+    # Report the per-request SQL statement count in an X-SQL-Queries header
+    SQL_QUERY_COUNT_HEADER = os.getenv("SQL_QUERY_COUNT_HEADER", "0") == "1"
+
     # Demo access (for local front-end games without Google OAuth)
     ENABLE_DEMO_TOKEN = os.getenv("ENABLE_DEMO_TOKEN", "1") == "1"
     DEMO_TOKEN_EMAIL = os.getenv("DEMO_TOKEN_EMAIL", "demo@local")
@@ -0,0 +1,105 @@
+"""
+Lightweight additive schema upgrades.
+
+db.create_all() creates missing tables but never alters existing ones, so
+columns added to existing tables after a database was first created are
+applied here on startup, followed by one-off data migrations (backfills).
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+# (table, column, column DDL)
+ADDED_COLUMNS = [
+    ("maqam_contribution", "duplicates_json", "TEXT"),
+    ("maqam_contribution", "applied_at", "TIMESTAMP"),
+    ("maqam", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("maqam_audio", "sha256", "VARCHAR(64) REFERENCES audio_blob (sha256)"),
+]
+
+# (index name, CREATE INDEX body) for indexes added to existing tables
+ADDED_INDEXES = [
+    ("ix_maqam_name_en_lower", "maqam (lower(name_en))"),
+    ("ix_maqam_contribution_status_created", "maqam_contribution (status, created_at)"),
+    ("ix_maqam_contribution_contributor_status", "maqam_contribution (contributor_id, status)"),
+    ("ix_maqam_audio_sha256", "maqam_audio (sha256)"),
+]
+
+# Names of applied data migrations
+schema_migration = db.Table(
+    "schema_migration",
+    db.Column("name", db.String(100), primary_key=True),
+    db.Column("applied_at", db.DateTime, nullable=False),
+)
+
+
+def _backfill_maqam_children():
+    """Populate the normalized region/period/season/emotion/jins tables from the JSON columns."""
+    from models.maqam import Maqam
+
+    for maqam in Maqam.query.all():
+        maqam.sync_normalized()
+
+
+def _build_search_index():
+    from services.search_service import rebuild_search_index
+
+    rebuild_search_index()
+
+
+def _baseline_change_feed():
+    """Seed the change feed with the catalog as it was before the feed existed."""
+    from services.change_feed_service import record_baseline
+
+    record_baseline()
+
+
+def _backfill_contributor_stats():
+    from services.leaderboard_service import rebuild_contributor_stats
+
+    rebuild_contributor_stats()
+
+
+# (name, callable) run once per database, in order
+DATA_MIGRATIONS = [
+    ("0001_maqam_child_tables", _backfill_maqam_children),
+    ("0002_catalog_change_baseline", _baseline_change_feed),
+    ("0003_maqam_search_index", _build_search_index),
+    ("0004_contributor_stats", _backfill_contributor_stats),
+]
+
+
+def upgrade_schema():
+    """Add any missing columns and indexes to existing tables, then run pending data migrations."""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        for name, ddl in ADDED_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {ddl}"))
+    run_data_migrations()
+
+
+def run_data_migrations():
+    applied = {row.name for row in db.session.execute(db.select(schema_migration.c.name))}
+    for name, migrate in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            # Claim the migration first so concurrent workers don't run it twice
+            db.session.execute(schema_migration.insert().values(name=name, applied_at=datetime.now(timezone.utc)))
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            continue
+        migrate()
+        db.session.commit()
@@ -4,5 +4,23 @@ from models.contribution import MaqamContribution
 from models.user_stat import UserStat
 from models.activity_log import ActivityLog
 from models.maqam_audio import MaqamAudio
+from models.maqam_relation import MaqamRelation
+from models.maqam_lsh_bucket import MaqamLshBucket
+from models.catalog_state import CatalogState
+from models.maqam_region import MaqamRegion
+from models.maqam_period import MaqamPeriod
+from models.maqam_season import MaqamSeason
+from models.maqam_emotion_weight import MaqamEmotionWeight
+from models.jins import Jins, JinsNote
+from models.catalog_change import CatalogChange
+from models.contributor_stat import ContributorStat
+from models.audio_blob import AudioBlob
+from models.audio_analysis import AudioAnalysis
+from models.quiz_session import QuizSession
+from models.quiz_answer import QuizAnswer
+from models.review_state import ReviewState
 
-__all__ = ['Maqam', 'MaqamContribution', 'UserStat', 'ActivityLog', 'MaqamAudio']
+__all__ = ['Maqam', 'MaqamContribution', 'UserStat', 'ActivityLog', 'MaqamAudio', 'MaqamRelation', 'MaqamLshBucket', 'CatalogState',
+           'MaqamRegion', 'MaqamPeriod', 'MaqamSeason', 'MaqamEmotionWeight', 'Jins', 'JinsNote', 'CatalogChange',
+           'ContributorStat', 'AudioBlob', 'AudioAnalysis', 'QuizSession', 'QuizAnswer',
+           'ReviewState']
@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class AudioAnalysis(db.Model):
+    """Duration, loudness and waveform peaks of a stored audio blob, filled in by the analysis workers."""
+    __tablename__ = "audio_analysis"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    # pending, done, partial (duration and sample rate only) or failed
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)
+    duration_seconds = db.Column(db.Float)
+    sample_rate = db.Column(db.Integer)
+    channels = db.Column(db.Integer)
+    loudness_dbfs = db.Column(db.Float)
+    peak_dbfs = db.Column(db.Float)
+    # Interleaved (min, max) int8 pairs, see services.audio_analysis.waveform_peaks
+    peaks = db.Column(db.LargeBinary)
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    analyzed_at = db.Column(db.DateTime)
@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class AudioBlob(db.Model):
+    """An uploaded audio file stored once under its SHA-256 digest."""
+    __tablename__ = "audio_blob"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False, default="application/octet-stream")
+    # Number of maqam_audio rows pointing at this blob; the file is removed at 0
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class CatalogChange(db.Model):
+    """One entry of the catalog change feed; seq only ever increases."""
+    __tablename__ = "catalog_change"
+    __table_args__ = (
+        db.Index("ix_catalog_change_entity", "entity", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # "maqam", "audio" or "contribution"
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    # "upsert" or "delete"
+    op = db.Column(db.String(10), nullable=False)
+    maqam_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
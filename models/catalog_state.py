@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class CatalogState(db.Model):
+    """Single-row table holding the catalog version shared by all workers."""
+    __tablename__ = "catalog_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
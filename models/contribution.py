@@ -4,6 +4,11 @@ from extensions import db
 
 class MaqamContribution(db.Model):
     __tablename__ = "maqam_contribution"
+    __table_args__ = (
+        # Review queue: oldest first within a status, and per-contributor filtering
+        db.Index("ix_maqam_contribution_status_created", "status", "created_at"),
+        db.Index("ix_maqam_contribution_contributor_status", "contributor_id", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id"), nullable=True)
@@ -15,5 +20,9 @@ class MaqamContribution(db.Model):
     contributor_score = db.Column(db.Integer, default=0)
     reviewed_by = db.Column(db.String(255), nullable=True)
     review_notes = db.Column(db.Text, nullable=True)
+    # Likely duplicates of the proposed maqam found in the catalog (JSON list)
+    duplicates_json = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     reviewed_at = db.Column(db.DateTime, nullable=True)
+    # Set once an accepted contribution has been merged into the catalog
+    applied_at = db.Column(db.DateTime, nullable=True)
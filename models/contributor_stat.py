@@ -0,0 +1,16 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class ContributorStat(db.Model):
+    """Accepted contribution totals per contributor, maintained on every review."""
+    __tablename__ = "contributor_stat"
+    __table_args__ = (
+        db.Index("ix_contributor_stat_ranking", "accepted_count", "total_score"),
+    )
+
+    contributor_id = db.Column(db.String(255), primary_key=True)
+    accepted_count = db.Column(db.Integer, nullable=False, default=0)
+    # Sum of contributor_score over the accepted contributions
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
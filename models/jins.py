@@ -0,0 +1,33 @@
+from extensions import db
+
+
+class Jins(db.Model):
+    """A jins (tetrachord / pentachord) of a maqam, in scale order (normalized from ajnas_json)."""
+    __tablename__ = "jins"
+    __table_args__ = (
+        db.Index("ix_jins_key_maqam", "key", "maqam_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    name_en = db.Column(db.String(255), nullable=True)
+    name_ar = db.Column(db.String(255), nullable=True)
+    # Lower-cased English (or Arabic) name used for filtering
+    key = db.Column(db.String(255), nullable=True)
+
+    notes = db.relationship(
+        "JinsNote", order_by="JinsNote.position", cascade="all, delete-orphan",
+        lazy="selectin",
+    )
+
+
+class JinsNote(db.Model):
+    """A note of a jins, in scale order."""
+    __tablename__ = "jins_note"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jins_id = db.Column(db.Integer, db.ForeignKey("jins.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    note_en = db.Column(db.String(100), nullable=True)
+    note_ar = db.Column(db.String(100), nullable=True)
@@ -1,6 +1,22 @@
 import json
 from datetime import datetime, timezone
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, load_only, selectinload
+
 from extensions import db
+from models.jins import Jins, JinsNote
+from models.maqam_emotion_weight import MaqamEmotionWeight
+from models.maqam_period import MaqamPeriod
+from models.maqam_region import MaqamRegion
+from models.maqam_season import MaqamSeason
+
+# JSON columns mirrored into the normalized child tables on flush
+NORMALIZED_SOURCE_COLUMNS = (
+    "ajnas_json", "regions_json", "regions_ar_json", "emotion_weights_json",
+    "historical_periods_json", "historical_periods_ar_json",
+    "seasonal_usage_json", "seasonal_usage_ar_json",
+)
 
 
 class Maqam(db.Model):
@@ -54,62 +70,261 @@ class Maqam(db.Model):
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Row version for optimistic concurrency: every UPDATE checks and bumps it
+    version = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationship to contributions
     contributions = db.relationship('MaqamContribution', backref='maqam', lazy=True)
     # Relationship to audios (one-to-many)
     audios = db.relationship('MaqamAudio', backref='maqam', lazy=True)
 
+    # Normalized views of the JSON columns (kept in sync by sync_normalized)
+    _child = dict(cascade="all, delete-orphan", lazy=True)
+    regions = db.relationship(MaqamRegion, order_by=MaqamRegion.position, **_child)
+    historical_periods = db.relationship(MaqamPeriod, order_by=MaqamPeriod.position, **_child)
+    seasonal_usages = db.relationship(MaqamSeason, order_by=MaqamSeason.position, **_child)
+    emotion_weights = db.relationship(MaqamEmotionWeight, order_by=MaqamEmotionWeight.emotion, **_child)
+    ajnas = db.relationship(Jins, order_by=Jins.position, **_child)
+    del _child
+
+    @classmethod
+    def load_options(cls, fields=None):
+        """
+        Loader options for serializing the given fields: only their columns are
+        loaded and the child rows they read are batch-loaded.
+        """
+        fields = FULL_FIELDS if fields is None else fields
+        columns = {cls.id, cls.version}
+        options = []
+        for field in fields:
+            columns.update(getattr(cls, name) for name in _FIELD_COLUMNS.get(field, ()))
+            if field in _FIELD_RELATIONSHIPS:
+                options.append(_FIELD_RELATIONSHIPS[field](cls))
+        if set(fields) != set(FULL_FIELDS):
+            options.append(load_only(*columns))
+        return options
+
+    @classmethod
+    def basic_load_options(cls):
+        """Loader options that batch-load everything to_dict_basic reads."""
+        return cls.load_options(BASIC_FIELDS)
+
+    @classmethod
+    def full_load_options(cls):
+        """Loader options that batch-load everything to_dict_full reads."""
+        return cls.load_options(FULL_FIELDS)
+
     def _loads(self, s):
         return json.loads(s) if s else None
 
-    def to_dict_basic(self):
+    def _loads_safe(self, s, expected):
+        try:
+            value = json.loads(s) if s else None
+        except (TypeError, ValueError):
+            return expected()
+        return value if isinstance(value, expected) else expected()
+
+    def _localized_rows(self, model, en_column, ar_column):
+        en = self._loads_safe(getattr(self, en_column), list)
+        ar = self._loads_safe(getattr(self, ar_column), list)
+        rows = []
+        for pos in range(max(len(en), len(ar))):
+            name_en = str(en[pos]) if pos < len(en) and en[pos] is not None else None
+            name_ar = str(ar[pos]) if pos < len(ar) and ar[pos] is not None else None
+            rows.append(model(
+                position=pos, name_en=name_en, name_ar=name_ar,
+                key=name_en.strip().lower() if name_en else None,
+            ))
+        return rows
+
+    def sync_normalized(self):
+        """Rebuild the normalized child rows from the JSON columns."""
+        self.regions = self._localized_rows(MaqamRegion, "regions_json", "regions_ar_json")
+        self.historical_periods = self._localized_rows(MaqamPeriod, "historical_periods_json", "historical_periods_ar_json")
+        self.seasonal_usages = self._localized_rows(MaqamSeason, "seasonal_usage_json", "seasonal_usage_ar_json")
+
+        weights = {}
+        for emotion, weight in self._loads_safe(self.emotion_weights_json, dict).items():
+            try:
+                weights[str(emotion).strip().lower()] = float(weight)
+            except (TypeError, ValueError):
+                continue
+        # Update rows in place: (maqam_id, emotion) is unique and the flush
+        # inserts new rows before deleting removed ones
+        existing = {w.emotion: w for w in self.emotion_weights}
+        rows = []
+        for emotion, weight in weights.items():
+            if not emotion:
+                continue
+            row = existing.get(emotion) or MaqamEmotionWeight(emotion=emotion)
+            row.weight = weight
+            rows.append(row)
+        self.emotion_weights = rows
+
+        ajnas = []
+        for pos, jins in enumerate(self._loads_safe(self.ajnas_json, list)):
+            if not isinstance(jins, dict):
+                jins = {"name": jins}
+            name = jins.get("name")
+            if not isinstance(name, dict):
+                name = {"en": name}
+            name_en = str(name["en"]) if name.get("en") is not None else None
+            name_ar = str(name["ar"]) if name.get("ar") is not None else None
+            notes = jins.get("notes") or []
+            if not isinstance(notes, dict):
+                notes = {"en": notes}
+            notes_en, notes_ar = list(notes.get("en") or []), list(notes.get("ar") or [])
+            key = (name_en or name_ar or "").strip().lower() or None
+            ajnas.append(Jins(
+                position=pos, name_en=name_en, name_ar=name_ar, key=key,
+                notes=[
+                    JinsNote(
+                        position=i,
+                        note_en=str(notes_en[i]) if i < len(notes_en) else None,
+                        note_ar=str(notes_ar[i]) if i < len(notes_ar) else None,
+                    )
+                    for i in range(max(len(notes_en), len(notes_ar)))
+                ],
+            ))
+        self.ajnas = ajnas
+
+    def _localized_json(self, en_column, ar_column):
         return {
-            "id": self.id,
-            "name": {
-                "ar": self.name_ar,
-                "en": self.name_en,
-            },
-            "emotion": {
-                "en": self.emotion,
-                "ar": self.emotion_ar,
-            },
-            "usage": {
+            "en": self._loads(getattr(self, en_column)) or [],
+            "ar": self._loads(getattr(self, ar_column)) or [],
+        }
+
+    def _serialize_field(self, field):
+        if field == "id":
+            return self.id
+        if field == "name":
+            return {"ar": self.name_ar, "en": self.name_en}
+        if field == "emotion":
+            return {"en": self.emotion, "ar": self.emotion_ar}
+        if field == "usage":
+            return {
                 "en": (self.usage or "").split(",") if self.usage else [],
                 "ar": (self.usage_ar or "").split(",") if self.usage_ar else [],
-            },
-            "regions": {
-                "en": self._loads(self.regions_json) or [],
-                "ar": self._loads(self.regions_ar_json) or [],
-            },
-            "rarity_level": {
-                "en": self.rarity_level,
-                "ar": self.rarity_level_ar,
-            },
-            "difficulty_label": {
-                "en": self.difficulty_label,
-                "ar": self.difficulty_label_ar,
-            },
-        }
+            }
+        if field == "regions":
+            return self._localized_json("regions_json", "regions_ar_json")
+        if field == "rarity_level":
+            return {"en": self.rarity_level, "ar": self.rarity_level_ar}
+        if field == "difficulty_label":
+            return {"en": self.difficulty_label, "ar": self.difficulty_label_ar}
+        if field == "ajnas":
+            return self._loads(self.ajnas_json)
+        if field == "descriptions":
+            return {"ar": self.description_ar, "en": self.description_en}
+        if field == "related":
+            return self._loads(self.related_json)
+        if field == "difficulty_index":
+            return self.difficulty_index
+        if field == "emotion_weights":
+            return self._loads(self.emotion_weights_json)
+        if field == "historical_periods":
+            return self._localized_json("historical_periods_json", "historical_periods_ar_json")
+        if field == "seasonal_usage":
+            return self._localized_json("seasonal_usage_json", "seasonal_usage_ar_json")
+        if field == "audio_urls":
+            return [audio.url for audio in self.audios]
+        if field == "created_at":
+            return self.created_at.isoformat() if self.created_at else None
+        if field == "version":
+            return self.version
+        raise ValueError(f"unknown maqam field: {field}")
+
+    def to_dict(self, fields=None, lang=None):
+        """
+        Serialize the requested fields (all of FULL_FIELDS by default). JSON
+        columns are returned as stored; the child tables only serve lookups.
+
+        With lang ("en" or "ar"), bilingual values keep only that language.
+        """
+        data = {}
+        for field in FULL_FIELDS if fields is None else fields:
+            value = self._serialize_field(field)
+            if lang and value is not None:
+                if field in LOCALIZED_FIELDS:
+                    value = {lang: value.get(lang)}
+                elif field == "ajnas":
+                    value = [_localized_jins(j, lang) for j in value]
+            data[field] = value
+        return data
+
+    def to_dict_basic(self):
+        return self.to_dict(BASIC_FIELDS)
 
     def to_dict_full(self):
-        return {
-            **self.to_dict_basic(),
-            "ajnas": self._loads(self.ajnas_json),
-            "descriptions": {
-                "ar": self.description_ar,
-                "en": self.description_en,
-            },
-            "related": self._loads(self.related_json),
-            "difficulty_index": self.difficulty_index,
-            "emotion_weights": self._loads(self.emotion_weights_json),
-            "historical_periods": {
-                "en": self._loads(self.historical_periods_json) or [],
-                "ar": self._loads(self.historical_periods_ar_json) or [],
-            },
-            "seasonal_usage": {
-                "en": self._loads(self.seasonal_usage_json) or [],
-                "ar": self._loads(self.seasonal_usage_ar_json) or [],
-            },
-            "audio_urls": [audio.url for audio in self.audios],
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+        return self.to_dict(FULL_FIELDS)
+
+
+BASIC_FIELDS = ("id", "name", "emotion", "usage", "regions", "rarity_level", "difficulty_label")
+FULL_FIELDS = BASIC_FIELDS + (
+    "ajnas", "descriptions", "related", "difficulty_index", "emotion_weights",
+    "historical_periods", "seasonal_usage", "audio_urls", "created_at", "version",
+)
+# Columns writable through PUT /knowledge/maqam/<id> and field-edit contributions
+EDITABLE_COLUMNS = (
+    "name_en", "name_ar", "emotion", "emotion_ar", "usage", "usage_ar",
+    "ajnas_json", "regions_json", "regions_ar_json", "description_ar", "description_en",
+    "related_json", "difficulty_index", "difficulty_label", "difficulty_label_ar",
+    "emotion_weights_json", "historical_periods_json", "historical_periods_ar_json",
+    "seasonal_usage_json", "seasonal_usage_ar_json", "rarity_level", "rarity_level_ar",
+)
+# Fields holding {"en": ..., "ar": ...} values
+LOCALIZED_FIELDS = (
+    "name", "emotion", "usage", "regions", "rarity_level", "difficulty_label",
+    "descriptions", "historical_periods", "seasonal_usage",
+)
+
+# Case-insensitive name lookups (get_maqam_by_name, related)
+db.Index("ix_maqam_name_en_lower", func.lower(Maqam.name_en))
+
+# Columns each field reads (id and version are always loaded)
+_FIELD_COLUMNS = {
+    "name": ("name_en", "name_ar"),
+    "emotion": ("emotion", "emotion_ar"),
+    "usage": ("usage", "usage_ar"),
+    "rarity_level": ("rarity_level", "rarity_level_ar"),
+    "difficulty_label": ("difficulty_label", "difficulty_label_ar"),
+    "regions": ("regions_json", "regions_ar_json"),
+    "ajnas": ("ajnas_json",),
+    "descriptions": ("description_en", "description_ar"),
+    "related": ("related_json",),
+    "difficulty_index": ("difficulty_index",),
+    "emotion_weights": ("emotion_weights_json",),
+    "historical_periods": ("historical_periods_json", "historical_periods_ar_json"),
+    "seasonal_usage": ("seasonal_usage_json", "seasonal_usage_ar_json"),
+    "created_at": ("created_at",),
+    "version": ("version",),
+}
+
+# Child rows each field reads, batch-loaded with one SELECT per relationship
+_FIELD_RELATIONSHIPS = {
+    "audio_urls": lambda cls: selectinload(cls.audios),
+}
+
+
+def _localized_jins(jins, lang):
+    """One stored jins with only one language of its name and notes (other shapes are kept as stored)."""
+    if not isinstance(jins, dict):
+        return jins
+    jins = dict(jins)
+    if isinstance(jins.get("name"), dict):
+        jins["name"] = {lang: jins["name"].get(lang)}
+    if isinstance(jins.get("notes"), dict):
+        jins["notes"] = {lang: jins["notes"].get(lang, [])}
+    return jins
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_maqam_children(session, flush_context, instances):
+    """Mirror JSON column writes on new or modified maqamet into the child tables."""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Maqam):
+            continue
+        state = inspect(obj)
+        if state.pending or any(state.attrs[col].history.has_changes() for col in NORMALIZED_SOURCE_COLUMNS):
+            obj.sync_normalized()
@@ -7,3 +7,5 @@ class MaqamAudio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id"), nullable=False)
     url = db.Column(db.String(512), nullable=False)
+    # Digest of the stored upload (None for external or legacy static URLs)
+    sha256 = db.Column(db.String(64), db.ForeignKey("audio_blob.sha256"), nullable=True, index=True)
@@ -0,0 +1,16 @@
+from extensions import db
+
+
+class MaqamEmotionWeight(db.Model):
+    """Weight (0-1) of a mood for a maqam (normalized from emotion_weights_json)."""
+    __tablename__ = "maqam_emotion_weight"
+    __table_args__ = (
+        db.UniqueConstraint("maqam_id", "emotion", name="uq_maqam_emotion_weight"),
+        db.Index("ix_maqam_emotion_weight_emotion_weight", "emotion", "weight"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id", ondelete="CASCADE"), nullable=False)
+    # Lower-cased mood name
+    emotion = db.Column(db.String(100), nullable=False)
+    weight = db.Column(db.Float, nullable=False, default=0.0)
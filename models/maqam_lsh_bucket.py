@@ -0,0 +1,10 @@
+from extensions import db
+
+
+class MaqamLshBucket(db.Model):
+    """One band of a maqam's MinHash signature, hashed into an LSH bucket."""
+    __tablename__ = "maqam_lsh_bucket"
+
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.String(16), primary_key=True)
+    maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id"), primary_key=True, index=True)
@@ -0,0 +1,17 @@
+from extensions import db
+
+
+class MaqamPeriod(db.Model):
+    """Historical period of a maqam (normalized from historical_periods_json / _ar_json)."""
+    __tablename__ = "maqam_period"
+    __table_args__ = (
+        db.Index("ix_maqam_period_key_maqam", "key", "maqam_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    name_en = db.Column(db.String(255), nullable=True)
+    name_ar = db.Column(db.String(255), nullable=True)
+    # Lower-cased English name used for filtering
+    key = db.Column(db.String(255), nullable=True)
@@ -0,0 +1,16 @@
+from extensions import db
+
+
+class MaqamRelation(db.Model):
+    """Materialized top-N similarity edge from one maqam to a related one."""
+    __tablename__ = "maqam_relation"
+    __table_args__ = (
+        db.Index("ix_maqam_relation_maqam_rank", "maqam_id", "rank"),
+    )
+
+    maqam_id = db.Column(db.Integer, db.ForeignKey("maqam.id"), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey("maqam.id"), primary_key=True)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    related = db.relationship("Maqam", foreign_keys=[related_id], lazy="joined")
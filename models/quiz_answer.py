@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class QuizAnswer(db.Model):
+    """One graded quiz question, kept for learning analytics."""
+    __tablename__ = "quiz_answer"
+    __table_args__ = (
+        db.Index("ix_quiz_answer_user_created", "user_id", "created_at"),
+        # A quiz is graded once: a replayed submission cannot insert its answers again
+        db.Index("ux_quiz_answer_ref_position", "quiz_ref", "position", unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(255), nullable=False)
+    # Stored quiz id, or the jti of the quiz token for stateless quizzes
+    quiz_ref = db.Column(db.String(64), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    # No foreign key: answers outlive deleted maqamet
+    maqam_id = db.Column(db.Integer, nullable=True, index=True)
+    kind = db.Column(db.String(20), nullable=False)
+    user_answer = db.Column(db.String(255), nullable=True)
+    is_correct = db.Column(db.Boolean, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from extensions import db
+
+
+class QuizSession(db.Model):
+    """A started quiz awaiting answers, shared by every worker process (see services.quiz_store)."""
+    __tablename__ = "quiz_session"
+    # Never reuse the id of a deleted quiz (SQLite otherwise hands out max(id) + 1 again)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    payload_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
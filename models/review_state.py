@@ -0,0 +1,24 @@
+from datetime import datetime
+from extensions import db
+
+
+class ReviewState(db.Model):
+    """Spaced-repetition state of one (user, maqam, topic) item (see services.review_service)."""
+    __tablename__ = "review_state"
+    __table_args__ = (
+        # The due queue is a range scan on this index
+        db.Index("ix_review_state_user_due", "user_id", "due_at"),
+    )
+
+    user_id = db.Column(db.String(255), primary_key=True)
+    # No foreign key, like quiz_answer: the due queue joins maqam and skips deleted ones
+    maqam_id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(20), primary_key=True)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)
+    interval_days = db.Column(db.Float, nullable=False, default=0.0)
+    ease = db.Column(db.Float, nullable=False, default=2.5)
+    lapses = db.Column(db.Integer, nullable=False, default=0)
+    reviews = db.Column(db.Integer, nullable=False, default=0)
+    last_grade = db.Column(db.Integer, nullable=True)
+    last_reviewed_at = db.Column(db.DateTime, nullable=True)
+    due_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
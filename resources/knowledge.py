@@ -1,17 +1,38 @@
-import os
 import json
+import mimetypes
 from datetime import datetime
-from flask import Blueprint, jsonify, request, url_for, current_app
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
 from werkzeug.utils import secure_filename
 from sqlalchemy import func
+from sqlalchemy.orm.exc import StaleDataError
 from marshmallow import ValidationError
 
 from extensions import db
-from models.maqam import Maqam
+from models.maqam import Maqam, EDITABLE_COLUMNS, FULL_FIELDS
 from models.contribution import MaqamContribution
 from models.maqam_audio import MaqamAudio
+from models.audio_analysis import AudioAnalysis
+from models.maqam_region import MaqamRegion
+from models.maqam_emotion_weight import MaqamEmotionWeight
 from services.auth_service import require_jwt
-from schemas import contribution_schema, new_maqam_schema, contribution_review_schema
+from services.audio_storage import acquire_blob, blob_response, delete_audio, get_audio_storage, release_blob
+from services.audio_analysis import PEAK_SCALE, unpack_peaks
+from services.audio_worker import queue_analysis
+from services.jins_preview_service import JinsNotFound, jins_preview
+from services.catalog_service import catalog_changed
+from services.related_service import related_maqamet
+from services.dedup_service import find_duplicates
+from services.snapshot_service import snapshot_response
+from services.catalog_io_service import CatalogImportError, export_lines, import_lines
+from services.search_service import SEARCH_LIMIT, search_maqamet
+from services.change_feed_service import CHANGES_PAGE_SIZE, changes_since
+from services.contribution_service import (
+    MAX_BATCH_SIZE, apply_review, contribution_row, review_contributions, submit_contributions,
+)
+from services.leaderboard_service import leaderboard
+from services.merge_service import MergeConflict, apply_contribution, is_mergeable
+from services.pagination import decode_cursor, encode_cursor, next_page_headers, parse_limit
+from schemas import contribution_schema, new_maqam_schema, contribution_review_schema, field_edit_schema
 
 knowledge_bp = Blueprint('knowledge', __name__, url_prefix='/knowledge')
 
@@ -19,7 +40,7 @@ knowledge_bp = Blueprint('knowledge', __name__, url_prefix='/knowledge')
 @knowledge_bp.route("/maqam", methods=["GET"])
 def list_maqamet():
     """
-    List maqamet (optionally by region)
+    List maqamet (optionally by region, ordered by weight for a mood)
     ---
     tags:
       - Knowledge
@@ -28,22 +49,110 @@ def list_maqamet():
         name: region
         type: string
         required: false
+      - in: query
+        name: mood
+        type: string
+        required: false
+        description: Order by the maqam's emotion weight for this mood (highest first)
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Page size (1-200); omit to return every maqam
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: Opaque cursor from the X-Next-Cursor header of the previous page
+      - in: query
+        name: fields
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,name,regions
+      - in: query
+        name: lang
+        type: string
+        enum: [en, ar]
+        required: false
+        description: Keep only this language in bilingual fields
     responses:
       200:
-        description: List of maqamet
+        description: List of maqamet (X-Next-Cursor / Link headers point to the next page)
+      304:
+        description: Not modified (If-None-Match matched the ETag)
+      400:
+        description: Invalid limit, cursor, fields or lang
     """
-    region = request.args.get("region")
-    if not region:
-        maqamet = Maqam.query.all()
-        return jsonify([m.to_dict_full() for m in maqamet]), 200
+    region = (request.args.get("region") or "").strip().lower()
+    mood = (request.args.get("mood") or "").strip().lower()
+    lang = (request.args.get("lang") or "").strip().lower() or None
+    if lang not in (None, "en", "ar"):
+        return jsonify({"error": "lang must be 'en' or 'ar'"}), 400
 
-    region_l = region.lower()
-    result = []
-    for m in Maqam.query.all():
-        regions = json.loads(m.regions_json) if m.regions_json else []
-        if any(str(r).lower() == region_l for r in regions):
-            result.append(m.to_dict_full())
-    return jsonify(result), 200
+    fields = None
+    if request.args.get("fields"):
+        requested = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+        unknown = [f for f in requested if f not in FULL_FIELDS]
+        if unknown:
+            return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+        fields = tuple(f for f in FULL_FIELDS if f in requested)
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor") or None
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None and (
+            not isinstance(position.get("id"), int)
+            or (mood and not isinstance(position.get("w"), (int, float)))
+        ):
+            raise ValueError("invalid cursor")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    params = {"region": region, "mood": mood, "fields": fields, "lang": lang, "limit": limit, "cursor": cursor}
+    return snapshot_response("maqamet", params, lambda: _maqamet_view(region, mood, fields, lang, limit, position))
+
+
+def _maqamet_view(region, mood, fields, lang, limit, position):
+    query = Maqam.query.options(*Maqam.load_options(fields))
+    if region:
+        in_region = db.select(MaqamRegion.maqam_id).where(MaqamRegion.key == region)
+        query = query.filter(Maqam.id.in_(in_region))
+
+    sort_weight = None
+    if mood:
+        sort_weight = func.coalesce(MaqamEmotionWeight.weight, -1.0)
+        query = query.outerjoin(
+            MaqamEmotionWeight,
+            db.and_(MaqamEmotionWeight.maqam_id == Maqam.id, MaqamEmotionWeight.emotion == mood),
+        ).add_columns(sort_weight).order_by(sort_weight.desc())
+
+    if position is not None:
+        if sort_weight is not None:
+            query = query.filter(db.or_(
+                sort_weight < position["w"],
+                db.and_(sort_weight == position["w"], Maqam.id > position["id"]),
+            ))
+        else:
+            query = query.filter(Maqam.id > position["id"])
+
+    query = query.order_by(Maqam.id)
+    rows = query.limit(limit + 1).all() if limit else query.all()
+    if sort_weight is None:
+        rows = [(m, None) for m in rows]
+
+    headers = {}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last, weight = rows[-1]
+        next_position = {"id": last.id} if sort_weight is None else {"id": last.id, "w": weight}
+        headers = next_page_headers(
+            "knowledge.list_maqamet",
+            {"region": region, "mood": mood, "fields": ",".join(fields) if fields else None,
+             "lang": lang, "limit": limit},
+            encode_cursor(next_position),
+        )
+    return [m.to_dict(fields, lang) for m, _ in rows], headers
 
 
 @knowledge_bp.route("/maqam/<int:maqam_id>", methods=["GET"])
@@ -118,24 +227,10 @@ def get_related_maqamet(name_en):
     if not base:
         return jsonify({"error": "Maqam not found"}), 404
 
-    base_regions = json.loads(base.regions_json) if base.regions_json else []
-    base_emotion = base.emotion
-
-    related = []
-    for m in Maqam.query.all():
-        if m.id == base.id:
-            continue
-        score = 0
-        if base_emotion and m.emotion == base_emotion:
-            score += 1
-        regions = json.loads(m.regions_json) if m.regions_json else []
-        if base_regions and any(r in base_regions for r in regions):
-            score += 1
-        if score > 0:
-            related.append((score, m))
-
-    related.sort(key=lambda t: t[0], reverse=True)
-    result = [m.to_dict_full() for score, m in related[:5]]
+    result = [
+        {**rel.related.to_dict_full(), "similarity": rel.score}
+        for rel in related_maqamet(base, related_options=Maqam.full_load_options())
+    ]
     return jsonify({"base": base.to_dict_full(), "related": result}), 200
 
 
@@ -149,15 +244,145 @@ def list_regions():
     responses:
       200:
         description: Regions and associated maqamet
+      304:
+        description: Not modified (If-None-Match matched the ETag)
     """
+    return snapshot_response("regions", {}, _regions_view)
+
+
+def _regions_view():
     regions_map = {}
-    for m in Maqam.query.all():
-        regions = json.loads(m.regions_json) if m.regions_json else []
-        for r in regions:
-            regions_map.setdefault(r, [])
-            regions_map[r].append(m.to_dict_basic())
-    regions_list = [{"region": r, "maqamet": maq_list} for r, maq_list in regions_map.items()]
-    return jsonify(regions_list), 200
+    rows = (
+        db.session.query(MaqamRegion.name_en, Maqam)
+        .join(Maqam, Maqam.id == MaqamRegion.maqam_id)
+        .filter(MaqamRegion.name_en.isnot(None))
+        .options(*Maqam.basic_load_options())
+        .order_by(Maqam.id, MaqamRegion.position)
+        .all()
+    )
+    for region, m in rows:
+        regions_map.setdefault(region, []).append(m.to_dict_basic())
+    return [{"region": r, "maqamet": maq_list} for r, maq_list in regions_map.items()]
+
+
+@knowledge_bp.route("/search", methods=["GET"])
+def search_catalog():
+    """
+    Full-text search over maqam names, descriptions and ajnas (Arabic or Latin)
+    ---
+    tags:
+      - Knowledge
+    parameters:
+      - in: query
+        name: q
+        type: string
+        required: true
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Maximum number of results (1-100, default 20)
+    responses:
+      200:
+        description: Ranked results with matches wrapped in <mark> tags
+      400:
+        description: Missing query or invalid limit
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"), default=SEARCH_LIMIT, maximum=100)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    results = search_maqamet(q, limit)
+    return jsonify({"query": q, "count": len(results), "results": results}), 200
+
+
+@knowledge_bp.route("/changes", methods=["GET"])
+def list_catalog_changes():
+    """
+    Catalog change feed for delta sync
+    ---
+    tags:
+      - Knowledge
+    parameters:
+      - in: query
+        name: since
+        type: integer
+        required: false
+        description: Last seq already applied by the client (0 replays the whole feed)
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Maximum number of change records to read (1-500, default 100)
+    responses:
+      200:
+        description: Changed maqamet, audios and accepted contributions since the given seq
+      400:
+        description: Invalid since or limit
+    """
+    try:
+        since = int(request.args.get("since", 0))
+        if since < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"error": "since must be a non-negative integer"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"), default=CHANGES_PAGE_SIZE, maximum=500)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    changes, next_since, has_more = changes_since(since, limit)
+    return jsonify({"changes": changes, "next_since": next_since, "has_more": has_more}), 200
+
+
+@knowledge_bp.route("/export", methods=["GET"])
+def export_catalog():
+    """
+    Export the catalog as newline-delimited JSON (streamed, one maqam per line)
+    ---
+    tags:
+      - Knowledge
+    produces:
+      - application/x-ndjson
+    responses:
+      200:
+        description: NDJSON stream of maqamet with bilingual fields, ajnas and audio URLs
+    """
+    return Response(
+        stream_with_context(export_lines()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=maqamet.ndjson"},
+    )
+
+
+@knowledge_bp.route("/import", methods=["POST"])
+@require_jwt(roles=["admin"])
+def import_catalog():
+    """
+    Import (upsert) maqamet from newline-delimited JSON, matched on name_en
+    ---
+    tags:
+      - Knowledge
+    security:
+      - Bearer: []
+    consumes:
+      - application/x-ndjson
+    responses:
+      200:
+        description: Counts of created and updated maqamet and added audio references
+      400:
+        description: Invalid line (nothing is imported)
+    """
+    try:
+        stats = import_lines(request.stream)
+    except CatalogImportError as exc:
+        db.session.rollback()
+        return jsonify({"error": "Import failed", "details": str(exc), "line": exc.line_no}), 400
+    db.session.commit()
+    return jsonify(stats), 200
 
 
 # ========== CONTRIBUTION ROUTES ==========
@@ -186,18 +411,64 @@ def add_maqam_contribution(maqam_id):
     except ValidationError as err:
         return jsonify({"error": "Validation failed", "details": err.messages}), 400
 
-    contrib = MaqamContribution(
-        maqam_id=maqam.id,
-        type=validated["type"],
-        payload_json=json.dumps(validated["payload"]),
-        status="pending",
-        contributor_id=contributor_id,
-    )
+    contrib = MaqamContribution(**contribution_row(maqam.id, validated, contributor_id, maqam.version))
     db.session.add(contrib)
     db.session.commit()
     return jsonify({"id": contrib.id, "status": contrib.status}), 201
 
 
+def _batch_items(key):
+    """The list under `key` of a batch request body, or an error response."""
+    items = (request.get_json(silent=True) or {}).get(key)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"'{key}' must be a non-empty list"}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({"error": f"At most {MAX_BATCH_SIZE} items per batch"}), 400)
+    return items, None
+
+
+def _batch_response(results, **counts):
+    failed = sum(1 for r in results if "error" in r)
+    return jsonify(dict(counts, failed=failed, results=results)), 200
+
+
+@knowledge_bp.route("/contributions/batch", methods=["POST"])
+@require_jwt(roles=["admin", "expert", "learner"])
+def add_contributions_batch():
+    """
+    Submit many contributions at once
+    ---
+    tags:
+      - Contributions
+    security:
+      - Bearer: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            contributions:
+              type: array
+              description: Up to 500 items of {maqam_id, type, payload}
+              items:
+                type: object
+    responses:
+      200:
+        description: Per-item results ({index, id, status} or {index, error}); valid items are stored even if others fail
+      400:
+        description: Missing, empty or oversized batch
+    """
+    items, error = _batch_items("contributions")
+    if error:
+        return error
+    contributor_id = request.jwt_payload.get("email", "anonymous")
+    results = submit_contributions(items, contributor_id)
+    db.session.commit()
+    return _batch_response(results, created=sum(1 for r in results if "id" in r))
+
+
 @knowledge_bp.route("/maqam/<int:maqam_id>/contributions", methods=["GET"])
 def list_maqam_contributions(maqam_id):
     """
@@ -210,19 +481,208 @@ def list_maqam_contributions(maqam_id):
     if not maqam:
         return jsonify({"error": "Maqam not found"}), 404
 
+    contributions = (
+        MaqamContribution.query
+        .filter_by(maqam_id=maqam.id)
+        .order_by(MaqamContribution.id)
+        .all()
+    )
     result = []
-    for c in maqam.contributions:
+    for c in contributions:
         result.append({
             "id": c.id,
             "type": c.type,
             "status": c.status,
             "payload": json.loads(c.payload_json),
             "contributor_id": c.contributor_id,
+            "duplicates": _duplicates(c.duplicates_json),
             "created_at": c.created_at.isoformat()
         })
     return jsonify(result), 200
 
 
+def _duplicates(duplicates_json):
+    """Likely duplicates stored with a new_maqam proposal ([] for other contributions)."""
+    return json.loads(duplicates_json) if duplicates_json else []
+
+
+# Columns of a review-queue row; payload_json is only read on request
+QUEUE_COLUMNS = (
+    MaqamContribution.id, MaqamContribution.maqam_id, MaqamContribution.maqam_name,
+    MaqamContribution.type, MaqamContribution.status, MaqamContribution.contributor_id,
+    MaqamContribution.duplicates_json, MaqamContribution.created_at,
+)
+CONTRIBUTION_STATUSES = ("pending", "accepted", "rejected")
+
+
+@knowledge_bp.route("/contributions", methods=["GET"])
+@require_jwt(roles=["admin"])
+def list_contributions():
+    """
+    Review queue: contributions across all maqamet, oldest first
+    ---
+    tags:
+      - Contributions
+    security:
+      - Bearer: []
+    parameters:
+      - in: query
+        name: status
+        type: string
+        enum: [pending, accepted, rejected]
+        default: pending
+      - in: query
+        name: type
+        type: string
+        required: false
+      - in: query
+        name: contributor
+        type: string
+        required: false
+      - in: query
+        name: include_payload
+        type: boolean
+        required: false
+        description: Also decode and return each contribution's payload
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Page size (1-200, default 50)
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: Opaque cursor from the X-Next-Cursor header of the previous page
+    responses:
+      200:
+        description: >
+          One page of contributions, each with the likely duplicates found for a
+          new_maqam proposal; X-Next-Cursor and Link headers point to the next one
+      400:
+        description: Invalid status, limit or cursor
+    """
+    status = request.args.get("status") or "pending"
+    if status not in CONTRIBUTION_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(CONTRIBUTION_STATUSES)}"}), 400
+    contrib_type = request.args.get("type") or None
+    contributor = request.args.get("contributor") or None
+    include_payload = request.args.get("include_payload", "").lower() in ("1", "true", "yes")
+
+    try:
+        limit = parse_limit(request.args.get("limit"), default=50)
+        cursor = request.args.get("cursor") or None
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None:
+            try:
+                after = datetime.fromisoformat(position.get("t"))
+            except (TypeError, ValueError):
+                raise ValueError("invalid cursor")
+            if not isinstance(position.get("id"), int):
+                raise ValueError("invalid cursor")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    columns = QUEUE_COLUMNS + ((MaqamContribution.payload_json,) if include_payload else ())
+    query = db.select(*columns).where(MaqamContribution.status == status)
+    if contrib_type:
+        query = query.where(MaqamContribution.type == contrib_type)
+    if contributor:
+        query = query.where(MaqamContribution.contributor_id == contributor)
+    if position is not None:
+        query = query.where(db.or_(
+            MaqamContribution.created_at > after,
+            db.and_(MaqamContribution.created_at == after, MaqamContribution.id > position["id"]),
+        ))
+    query = query.order_by(MaqamContribution.created_at, MaqamContribution.id).limit(limit + 1)
+    rows = db.session.execute(query).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers = next_page_headers(
+            "knowledge.list_contributions",
+            {"status": status, "type": contrib_type, "contributor": contributor,
+             "include_payload": "1" if include_payload else None, "limit": limit},
+            encode_cursor({"id": rows[-1].id, "t": rows[-1].created_at.isoformat()}),
+        )
+
+    result = []
+    for row in rows:
+        item = {
+            "id": row.id,
+            "maqam_id": row.maqam_id,
+            "maqam_name": row.maqam_name,
+            "type": row.type,
+            "status": row.status,
+            "contributor_id": row.contributor_id,
+            "duplicates": _duplicates(row.duplicates_json),
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        }
+        if include_payload:
+            item["payload"] = json.loads(row.payload_json)
+        result.append(item)
+    return jsonify(result), 200, headers
+
+
+@knowledge_bp.route("/contributions", methods=["POST"])
+@require_jwt(roles=["admin", "expert", "learner"])
+def propose_field_edit():
+    """
+    Propose an edit of one maqam field (stored as a pending field_edit contribution)
+    ---
+    tags:
+      - Contributions
+    security:
+      - Bearer: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          required: [maqam_id, field, new_value]
+          properties:
+            maqam_id:
+              type: integer
+            field:
+              type: string
+              description: One of the columns accepted by PUT /knowledge/maqam/<id>
+            new_value:
+              description: Checked against the column's type and nullability
+            notes:
+              type: string
+            base_version:
+              type: integer
+              description: >
+                Maqam version the edit is based on (defaults to the current
+                one); accepting it after the maqam changed is a merge conflict
+    responses:
+      201:
+        description: Contribution stored as pending
+      400:
+        description: Validation failed
+      404:
+        description: Maqam not found
+    """
+    try:
+        validated = field_edit_schema.load(request.get_json() or {})
+    except ValidationError as err:
+        return jsonify({"error": "Validation failed", "details": err.messages}), 400
+
+    maqam = db.session.get(Maqam, validated["maqam_id"])
+    if not maqam:
+        return jsonify({"error": "Maqam not found"}), 404
+
+    contrib = MaqamContribution(**contribution_row(maqam.id, {
+        "type": "field_edit",
+        "payload": {k: validated[k] for k in ("field", "new_value", "notes", "base_version")},
+    }, request.jwt_payload.get("email", "anonymous"), maqam.version))
+    db.session.add(contrib)
+    db.session.commit()
+    return jsonify({"id": contrib.id, "status": contrib.status}), 201
+
+
 @knowledge_bp.route("/maqam", methods=["POST"])
 @require_jwt(roles=["admin", "expert", "learner"])
 def propose_maqam():
@@ -243,6 +703,7 @@ def propose_maqam():
         return jsonify({"error": "Validation failed", "details": err.messages}), 400
 
     contributor = request.jwt_payload.get("email", "anonymous")
+    duplicates = find_duplicates(validated["name_en"], validated["name_ar"], validated["ajnas"])
     contrib = MaqamContribution(
         maqam_id=None,
         maqam_name=validated["name_en"],
@@ -251,10 +712,11 @@ def propose_maqam():
         status="pending",
         contributor_id=contributor,
         contributor_score=0,
+        duplicates_json=json.dumps(duplicates),
     )
     db.session.add(contrib)
     db.session.commit()
-    return jsonify({"id": contrib.id, "status": contrib.status}), 201
+    return jsonify({"id": contrib.id, "status": contrib.status, "duplicates": duplicates}), 201
 
 
 @knowledge_bp.route("/contributions/<int:contrib_id>/review", methods=["POST"])
@@ -280,12 +742,60 @@ def review_contribution(contrib_id):
     except ValidationError as err:
         return jsonify({"error": "Validation failed", "details": err.messages}), 400
 
-    contrib.status = validated["status"]
-    contrib.reviewed_at = datetime.utcnow()
-    if validated["status"] == "accepted":
-        contrib.contributor_score = (contrib.contributor_score or 0) + 1
+    apply_review(contrib, validated["status"], request.jwt_payload.get("email"))
+    if contrib.status == "accepted":
+        # new_maqam and field_edit contributions are merged into the catalog
+        if is_mergeable(contrib):
+            try:
+                apply_contribution(contrib)
+            except MergeConflict as exc:
+                db.session.rollback()
+                return jsonify({"error": "Merge conflict", "details": str(exc)}), 409
+        catalog_changed(updated_ids=[contrib.maqam_id])
+    db.session.commit()
+    return jsonify({
+        "id": contrib.id,
+        "status": contrib.status,
+        "contributor_score": contrib.contributor_score,
+        "maqam_id": contrib.maqam_id,
+        "applied": contrib.applied_at is not None,
+    }), 200
+
+
+@knowledge_bp.route("/contributions/review/batch", methods=["POST"])
+@require_jwt(roles=["admin"])
+def review_contributions_batch():
+    """
+    Accept or reject many contributions at once
+    ---
+    tags:
+      - Contributions
+    security:
+      - Bearer: []
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            reviews:
+              type: array
+              description: Up to 500 items of {id, status}
+              items:
+                type: object
+    responses:
+      200:
+        description: Per-item results ({index, id, status, contributor_score} or {index, error})
+      400:
+        description: Missing, empty or oversized batch
+    """
+    items, error = _batch_items("reviews")
+    if error:
+        return error
+    results = review_contributions(items, request.jwt_payload.get("email"))
     db.session.commit()
-    return jsonify({"id": contrib.id, "status": contrib.status, "contributor_score": contrib.contributor_score}), 200
+    return _batch_response(results, reviewed=sum(1 for r in results if "error" not in r))
 
 
 @knowledge_bp.route("/top-contributors", methods=["GET"])
@@ -296,24 +806,11 @@ def top_contributors():
     tags:
       - Contributions
     """
-    # Aggregate accepted contributions by contributor_id
-    results = db.session.query(
-        MaqamContribution.contributor_id,
-        func.count(MaqamContribution.id).label('total_contributions'),
-        func.sum(MaqamContribution.contributor_score).label('total_score')
-    ).filter(
-        MaqamContribution.status == 'accepted'
-    ).group_by(
-        MaqamContribution.contributor_id
-    ).order_by(
-        func.count(MaqamContribution.id).desc()
-    ).limit(20).all()
-    
     contributors = [{
-        "contributor_id": r.contributor_id,
-        "total_contributions": r.total_contributions,
-        "total_score": r.total_score or 0
-    } for r in results]
+        "contributor_id": s.contributor_id,
+        "total_contributions": s.accepted_count,
+        "total_score": s.total_score,
+    } for s in leaderboard()]
     
     return jsonify({"contributors": contributors}), 200
 
@@ -322,10 +819,26 @@ def top_contributors():
 @require_jwt(roles=["admin", "expert"])
 def upload_maqam_audio(maqam_id):
     """
-    Upload an audio clip for a maqam (stored as static file)
+    Upload an audio clip for a maqam (stored once per content digest)
     ---
     tags:
       - Knowledge
+    consumes:
+      - multipart/form-data
+    parameters:
+      - in: formData
+        name: audio
+        type: file
+        required: true
+    responses:
+      201:
+        description: Clip stored and attached to the maqam; analysis runs in the background
+      200:
+        description: The maqam already has this exact clip
+      400:
+        description: Missing file or invalid filename
+      404:
+        description: Maqam not found
     """
     maqam = db.session.get(Maqam, maqam_id)
     if not maqam:
@@ -339,17 +852,157 @@ def upload_maqam_audio(maqam_id):
     if not filename:
         return jsonify({"error": "invalid filename"}), 400
 
-    save_dir = os.path.join(current_app.root_path, "static", "audio")
-    os.makedirs(save_dir, exist_ok=True)
-    save_path = os.path.join(save_dir, filename)
-    file.save(save_path)
-
-    audio_url = url_for("static", filename=f"audio/{filename}", _external=True)
+    sha256, size = get_audio_storage().put(file.stream)
+    audio = MaqamAudio.query.filter_by(maqam_id=maqam.id, sha256=sha256).first()
+    if audio:
+        return jsonify(_uploaded_audio(audio, size)), 200
 
-    maqam.audio_url = audio_url
+    content_type = file.mimetype if (file.mimetype or "").startswith("audio/") else (
+        mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    )
+    acquire_blob(sha256, size, content_type)
+    queue_analysis(sha256)
+    audio = MaqamAudio(
+        maqam_id=maqam.id,
+        url=url_for("knowledge.get_audio_blob", sha256=sha256, _external=True),
+        sha256=sha256,
+    )
+    db.session.add(audio)
+    catalog_changed()
     db.session.commit()
 
-    return jsonify({"audio_url": audio_url}), 200
+    return jsonify(_uploaded_audio(audio, size)), 201
+
+
+def _uploaded_audio(audio, size):
+    analysis = db.session.get(AudioAnalysis, audio.sha256)
+    return {
+        "id": audio.id,
+        "audio_url": audio.url,
+        "sha256": audio.sha256,
+        "size": size,
+        "analysis": {
+            "status": analysis.status if analysis else "pending",
+            "url": url_for("knowledge.get_audio_analysis", sha256=audio.sha256, _external=True),
+        },
+    }
+
+
+@knowledge_bp.route("/audio/<string:sha256>", methods=["GET"])
+def get_audio_blob(sha256):
+    """
+    Download an uploaded audio clip by content digest
+    ---
+    tags:
+      - Knowledge
+    parameters:
+      - in: path
+        name: sha256
+        type: string
+        required: true
+      - in: header
+        name: Range
+        type: string
+        required: false
+        description: Byte range, e.g. bytes=1048576- to seek
+    responses:
+      200:
+        description: Audio bytes (ETag is the digest; cached as immutable)
+      206:
+        description: The requested byte range
+      304:
+        description: Not modified (If-None-Match matches the digest)
+      404:
+        description: Unknown digest
+    """
+    response = blob_response(sha256)
+    if response is None:
+        return jsonify({"error": "Audio not found"}), 404
+    return response
+
+
+@knowledge_bp.route("/audio/<string:sha256>/analysis", methods=["GET"])
+def get_audio_analysis(sha256):
+    """
+    Duration, loudness and waveform peaks of an uploaded clip
+    ---
+    tags:
+      - Knowledge
+    parameters:
+      - in: path
+        name: sha256
+        type: string
+        required: true
+    responses:
+      200:
+        description: >
+          Analysis with status pending, done, partial (duration and sample rate
+          only) or failed. peaks.data holds interleaved min/max pairs scaled
+          to peaks.scale, one pair per bucket.
+      304:
+        description: Not modified
+      404:
+        description: Unknown digest
+    """
+    analysis = db.session.get(AudioAnalysis, sha256.lower())
+    if analysis is None:
+        return jsonify({"error": "Audio not found"}), 404
+    peaks = unpack_peaks(analysis.peaks)
+    response = jsonify({
+        "sha256": analysis.sha256,
+        "status": analysis.status,
+        "duration_seconds": analysis.duration_seconds,
+        "sample_rate": analysis.sample_rate,
+        "channels": analysis.channels,
+        "loudness_dbfs": analysis.loudness_dbfs,
+        "peak_dbfs": analysis.peak_dbfs,
+        "peaks": {"buckets": len(peaks) // 2, "scale": PEAK_SCALE, "data": peaks} if peaks else None,
+        "error": analysis.error,
+    })
+    analyzed_at = analysis.analyzed_at.isoformat() if analysis.analyzed_at else "none"
+    response.set_etag(f"{analysis.sha256}-{analysis.status}-{analyzed_at}")
+    if analysis.status != "pending":
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+    return response.make_conditional(request)
+
+
+@knowledge_bp.route("/maqam/<int:maqam_id>/jins/<int:n>/preview.wav", methods=["GET"])
+def get_jins_preview(maqam_id, n):
+    """
+    Synthesized audio preview of a jins of a maqam
+    ---
+    tags:
+      - Knowledge
+    produces:
+      - audio/wav
+    parameters:
+      - in: path
+        name: maqam_id
+        type: integer
+        required: true
+      - in: path
+        name: n
+        type: integer
+        required: true
+        description: Position of the jins in the maqam's ajnas (0 = first)
+    responses:
+      200:
+        description: WAV playing the notes of the jins on a quarter-tone scale
+      304:
+        description: Not modified
+      404:
+        description: Maqam or jins not found, or its notes cannot be played
+    """
+    try:
+        key, data = jins_preview(maqam_id, n)
+    except JinsNotFound as exc:
+        return jsonify({"error": str(exc)}), 404
+    response = Response(data, mimetype="audio/wav")
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["JINS_PREVIEW_MAX_AGE"]
+    return response.make_conditional(request, accept_ranges=True)
 
 
 @knowledge_bp.route("/maqam/<int:maqam_id>", methods=["PUT"])
@@ -416,27 +1069,33 @@ def update_maqam(maqam_id):
                 type: string
               rarity_level_ar:
                 type: string
+              version:
+                type: integer
+                description: Version the edit is based on (or send it as If-Match)
     responses:
       200:
         description: Maqam updated
       404:
         description: Not found
+      409:
+        description: The maqam changed since the given version
     """
     maqam = db.session.get(Maqam, maqam_id)
     if not maqam:
         return jsonify({"error": "Maqam not found"}), 404
     data = request.get_json() or {}
-    # Update fields (add more as needed)
-    for field in [
-        "name_en", "name_ar", "emotion", "emotion_ar", "usage", "usage_ar",
-        "ajnas_json", "regions_json", "regions_ar_json", "description_ar", "description_en",
-        "related_json", "difficulty_index", "difficulty_label", "difficulty_label_ar",
-        "emotion_weights_json", "historical_periods_json", "historical_periods_ar_json",
-        "seasonal_usage_json", "seasonal_usage_ar_json", "rarity_level", "rarity_level_ar"
-    ]:
+    expected = data.get("version", request.headers.get("If-Match", "").strip('"') or None)
+    if expected is not None and str(expected) != str(maqam.version):
+        return jsonify({"error": "Version conflict", "current_version": maqam.version}), 409
+    for field in EDITABLE_COLUMNS:
         if field in data:
             setattr(maqam, field, data[field])
-    db.session.commit()
+    catalog_changed(updated_ids=[maqam.id])
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Version conflict", "details": "maqam was modified concurrently; retry"}), 409
     return jsonify(maqam.to_dict_full()), 200
 
 
@@ -462,9 +1121,10 @@ def delete_maqam(maqam_id):
     maqam = db.session.get(Maqam, maqam_id)
     if not maqam:
         return jsonify({"error": "Maqam not found"}), 404
+    catalog_changed(deleted_ids=[maqam.id])
     # Delete all associated audios
     for audio in maqam.audios:
-        db.session.delete(audio)
+        delete_audio(audio)
     db.session.delete(maqam)
     db.session.commit()
     return jsonify({"result": "deleted"}), 200
@@ -503,7 +1163,12 @@ def update_maqam_audio(audio_id):
         return jsonify({"error": "Audio not found"}), 404
     data = request.get_json() or {}
     if "url" in data:
+        if audio.sha256 and data["url"] != audio.url:
+            # Pointing the row elsewhere drops its reference to the stored upload
+            release_blob(audio.sha256)
+            audio.sha256 = None
         audio.url = data["url"]
+        catalog_changed()
         db.session.commit()
         return jsonify({"id": audio.id, "url": audio.url}), 200
     return jsonify({"error": "No url provided"}), 400
@@ -531,6 +1196,7 @@ def delete_maqam_audio(audio_id):
     audio = db.session.get(MaqamAudio, audio_id)
     if not audio:
         return jsonify({"error": "Audio not found"}), 404
-    db.session.delete(audio)
+    delete_audio(audio)
+    catalog_changed()
     db.session.commit()
     return jsonify({"result": "deleted"}), 200
@@ -1,6 +1,8 @@
 import json
 import random
-from flask import Blueprint, jsonify, request
+import hashlib
+import uuid
+from flask import Blueprint, current_app, jsonify, request
 from marshmallow import ValidationError
 
 from extensions import db
@@ -10,93 +12,21 @@ from models.user_stat import UserStat
 from models.activity_log import ActivityLog
 from services.auth_service import require_jwt
 from services.user_service import get_or_create_user_stat, record_activity, update_quiz_stats
+from services.snapshot_service import snapshot_response
+from services.pagination import decode_cursor, encode_cursor, next_page_headers, parse_limit
+from services.flashcard_service import FLASHCARD_LANGS, FLASHCARD_LEVELS, FLASHCARD_TOPICS, get_flashcard_decks
+from services.quiz_store import get_quiz_store
+from services.review_service import GRADE_ACTIVITY, REVIEW_TOPICS, due_reviews, record_quiz_reviews
+from services.quiz_service import (
+    QuizAlreadyAnswered, QuizTokenError, QuizTokenExpired, build_mcq_choices, decode_quiz_token, get_quiz_catalog,
+    grade_quiz, issue_quiz_token, record_answers, regenerate_questions, seeded_questions,
+)
 from schemas import quiz_answer_schema
 
 learning_bp = Blueprint('learning', __name__, url_prefix='/learning')
 
-# In-memory quiz storage
-QUIZZES = {}
-QUIZ_COUNTER = 1
-
-
-def build_mcq_choices(correct, pool, k=3):
-    pool = [p for p in pool if p and p != correct]
-    pool = list(dict.fromkeys(pool))
-    distractors = random.sample(pool, k=min(k, len(pool)))
-    choices = [correct] + distractors
-    choices = list(dict.fromkeys(choices))
-    random.shuffle(choices)
-    return choices
-
-
-def make_question_bank(maqamet):
-    questions = []
-    for m in maqamet:
-        # Emotion open
-        if m.emotion:
-            questions.append({
-                "type": "open",
-                "prompt": f"What is the main emotion of {m.name_en}?",
-                "answer": m.emotion,
-                "maqam_id": m.id
-            })
-        # Region MCQ
-        regions = json.loads(m.regions_json) if m.regions_json else []
-        if regions:
-            choices = build_mcq_choices(regions[0], [r for mm in maqamet for r in (json.loads(mm.regions_json) if mm.regions_json else [])])
-            questions.append({
-                "type": "mcq",
-                "prompt": f"In which region is {m.name_en} mainly used?",
-                "choices": choices,
-                "answer": regions[0],
-                "maqam_id": m.id
-            })
-        # Usage MCQ
-        usages = [u.strip() for u in (m.usage or "").split(",") if u.strip()]
-        if usages:
-            pool_usage = []
-            for mm in maqamet:
-                pool_usage += [u.strip() for u in (mm.usage or "").split(",") if u.strip()]
-            choices = build_mcq_choices(usages[0], pool_usage)
-            questions.append({
-                "type": "mcq",
-                "prompt": f"Select a typical usage of {m.name_en}.",
-                "choices": choices,
-                "answer": usages[0],
-                "maqam_id": m.id
-            })
-        # Ajnas MCQ
-        try:
-            ajnas = json.loads(m.ajnas_json) if m.ajnas_json else []
-            names = []
-            for a in ajnas:
-                nm = a.get("name")
-                if isinstance(nm, dict):
-                    nm = nm.get("en") or nm.get("ar")
-                if isinstance(nm, str):
-                    names.append(nm)
-            if names:
-                pool_ajnas = []
-                for mm in maqamet:
-                    ajn = json.loads(mm.ajnas_json) if mm.ajnas_json else []
-                    for a in ajn:
-                        nm2 = a.get("name")
-                        if isinstance(nm2, dict):
-                            nm2 = nm2.get("en") or nm2.get("ar")
-                        if isinstance(nm2, str):
-                            pool_ajnas.append(nm2)
-                choices = build_mcq_choices(names[0], pool_ajnas)
-                questions.append({
-                    "type": "mcq",
-                    "prompt": f"Which jins (ajnas) is part of {m.name_en}?",
-                    "choices": choices,
-                    "answer": names[0],
-                    "maqam_id": m.id
-                })
-        except Exception:
-            pass
-    random.shuffle(questions)
-    return questions
+QUIZ_LENGTH = 20
+REVIEW_PAGE_SIZE = 20
 
 
 @learning_bp.route("/flashcards", methods=["GET"])
@@ -118,107 +48,68 @@ def learning_flashcards():
         schema:
           type: string
         required: false
-        description: Difficulty level
+        description: Difficulty level (beginner, intermediate, advanced); all levels when omitted or "all"
+      - in: query
+        name: lang
+        schema:
+          type: string
+        required: false
+        description: Only the fields of one language (en or ar); bilingual cards when omitted
+      - in: query
+        name: limit
+        schema:
+          type: integer
+        required: false
+        description: Page size (1-200); the whole deck when omitted
+      - in: query
+        name: cursor
+        schema:
+          type: string
+        required: false
+        description: Opaque cursor from the X-Next-Cursor header of the previous page
     responses:
       200:
-        description: List of flashcards
+        description: List of flashcards (X-Next-Cursor and Link headers when more follow)
+      304:
+        description: Not modified (If-None-Match matched the ETag)
+      400:
+        description: Invalid topic, level, lang, limit or cursor
     """
     topic = request.args.get("topic", "emotion")
-    level = request.args.get("level", "beginner")
-    cards = []
-    maqamet = Maqam.query.all()
-    for m in maqamet:
-        if topic == "emotion":
-            cards.append({
-                "name_en": m.name_en,
-                "name_ar": m.name_ar,
-                "emotion_en": m.emotion,
-                "emotion_ar": getattr(m, "emotion_ar", None),
-                "regions_en": json.loads(m.regions_json) if m.regions_json else [],
-                "regions_ar": json.loads(getattr(m, "regions_ar_json", "[]") or "[]"),
-                "back": [m.emotion] if m.emotion else [],
-                "level": m.difficulty_label,
-            })
-        elif topic == "region":
-            regions_en = json.loads(m.regions_json) if m.regions_json else []
-            regions_ar = json.loads(getattr(m, "regions_ar_json", "[]") or "[]")
-            cards.append({
-                "name_en": m.name_en,
-                "name_ar": m.name_ar,
-                "emotion_en": m.emotion,
-                "emotion_ar": getattr(m, "emotion_ar", None),
-                "usage_en": m.usage,
-                "usage_ar": getattr(m, "usage_ar", None),
-                "regions_en": regions_en,
-                "regions_ar": regions_ar,
-                "back": regions_en,
-                "level": m.difficulty_label,
-            })
-        elif topic == "usage":
-            usages_en = [u.strip() for u in (m.usage or "").split(",") if u.strip()]
-            if hasattr(m, "usage_ar_json") and m.usage_ar_json:
-                try:
-                    usages_ar_list = json.loads(m.usage_ar_json)
-                    usages_ar = [u.strip() for u in usages_ar_list if str(u).strip()] if isinstance(usages_ar_list, list) else []
-                except Exception:
-                    usages_ar = []
-            else:
-                raw_ar = getattr(m, "usage_ar", None)
-                usages_ar = [raw_ar.strip()] if raw_ar else []
-            cards.append({
-                "name_en": m.name_en,
-                "name_ar": m.name_ar,
-                "emotion_en": m.emotion,
-                "emotion_ar": getattr(m, "emotion_ar", None),
-                "usage_en": ", ".join(usages_en),
-                "usage_ar_list": usages_ar,
-                "regions_en": json.loads(m.regions_json) if m.regions_json else [],
-                "regions_ar": json.loads(getattr(m, "regions_ar_json", "[]") or "[]"),
-                "back": usages_en,
-                "level": m.difficulty_label,
-            })
-        elif topic == "ajnas":
-            # Ajnas flashcards: show maqam name, reveal first and second jins
-            ajnas_data = []
-            first_jins_en = ""
-            first_jins_ar = ""
-            second_jins_en = ""
-            second_jins_ar = ""
-            
-            if m.ajnas_json:
-                try:
-                    ajnas = json.loads(m.ajnas_json)
-                    for i, a in enumerate(ajnas[:2]):  # First two ajnas
-                        nm = a.get("name", {})
-                        if isinstance(nm, dict):
-                            en_name = nm.get("en", "")
-                            ar_name = nm.get("ar", "")
-                        else:
-                            en_name = str(nm) if nm else ""
-                            ar_name = ""
-                        
-                        if i == 0:
-                            first_jins_en = en_name
-                            first_jins_ar = ar_name
-                        elif i == 1:
-                            second_jins_en = en_name
-                            second_jins_ar = ar_name
-                except Exception:
-                    pass
-            
-            cards.append({
-                "name_en": m.name_en,
-                "name_ar": m.name_ar,
-                "first_jins_en": first_jins_en,
-                "first_jins_ar": first_jins_ar,
-                "second_jins_en": second_jins_en,
-                "second_jins_ar": second_jins_ar,
-                "back": f"{first_jins_en}" + (f" / {second_jins_en}" if second_jins_en else ""),
-                "level": m.difficulty_label,
-            })
-        else:
-            return jsonify({"error": "invalid topic"}), 400
-    return jsonify({"topic": topic, "level": level, "count": len(cards), "cards": cards}), 200
+    if topic not in FLASHCARD_TOPICS:
+        return jsonify({"error": "invalid topic"}), 400
+    level = (request.args.get("level") or "all").strip().lower()
+    if level != "all" and level not in FLASHCARD_LEVELS:
+        return jsonify({"error": f"level must be 'all' or one of: {', '.join(FLASHCARD_LEVELS)}"}), 400
+    lang = (request.args.get("lang") or "").strip().lower() or None
+    if lang not in (None,) + FLASHCARD_LANGS:
+        return jsonify({"error": "lang must be 'en' or 'ar'"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor") or None
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None and not isinstance(position.get("id"), int):
+            raise ValueError("invalid cursor")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    params = {"topic": topic, "level": level, "lang": lang, "limit": limit, "cursor": cursor}
+    return snapshot_response("flashcards", params, lambda: _flashcards_view(topic, level, lang, limit, position))
+
+
+def _flashcards_view(topic, level, lang, limit, position):
+    cards, last_id = get_flashcard_decks().page(
+        topic, level=None if level == "all" else level, lang=lang, limit=limit,
+        after_id=position["id"] if position else None,
+    )
+    headers = {}
+    if last_id is not None:
+        headers = next_page_headers(
+            "learning.learning_flashcards",
+            {"topic": topic, "level": level, "lang": lang, "limit": limit},
+            encode_cursor({"id": last_id}),
+        )
+    return {"topic": topic, "level": level, "count": len(cards), "cards": cards}, headers
 
 
 @learning_bp.route("/plan", methods=["GET"])
@@ -284,33 +175,41 @@ def start_quiz():
             properties:
               lang:
                 type: string
+              stateless:
+                type: boolean
+                description: >
+                  Return a signed quiz token as quiz_id instead of storing the
+                  quiz (defaults to QUIZ_TOKENS); answers are then left out
     responses:
       200:
         description: Quiz started
     """
-    global QUIZ_COUNTER, QUIZZES
-
     data = request.get_json() or {}
     lang = data.get("lang", "en")
-    maqamet = Maqam.query.all()
-    if not maqamet:
+    stateless = bool(data.get("stateless", current_app.config["QUIZ_TOKENS"]))
+    quiz_catalog = get_quiz_catalog()
+    if not quiz_catalog.facts:
         return jsonify({"error": "no maqamet in database"}), 500
 
-    bank = make_question_bank(maqamet)
-    if not bank:
+    seed = random.getrandbits(32)
+    selected = seeded_questions(quiz_catalog, QUIZ_LENGTH, seed)
+    if not selected:
         return jsonify({"error": "no questions available"}), 500
-
-    selected = bank[:20] if len(bank) >= 20 else bank
     for idx, q in enumerate(selected):
         q["index"] = idx
 
-    quiz_id = QUIZ_COUNTER
-    QUIZ_COUNTER += 1
-    QUIZZES[quiz_id] = {
-        "id": quiz_id,
-        "lang": lang,
-        "questions": selected,
-    }
+    if stateless:
+        user_id = request.jwt_payload.get("email") or "anonymous"
+        quiz_id = issue_quiz_token(selected, seed, lang, user_id)
+        selected = [{k: v for k, v in q.items() if k != "answer"} for q in selected]
+    else:
+        quiz_id = get_quiz_store().create({
+            "lang": lang,
+            "questions": selected,
+            # Answers are recorded under the nonce: store ids can restart
+            "nonce": uuid.uuid4().hex,
+        })
+        db.session.commit()
     return jsonify({
         "quiz_id": quiz_id,
         "count": len(selected),
@@ -318,7 +217,7 @@ def start_quiz():
     }), 200
 
 
-@learning_bp.route("/quiz/<int:quiz_id>/answer", methods=["POST"])
+@learning_bp.route("/quiz/<quiz_id>/answer", methods=["POST"])
 @require_jwt(roles=["admin", "expert", "learner"])
 def learning_quiz_answer(quiz_id):
     """
@@ -330,8 +229,9 @@ def learning_quiz_answer(quiz_id):
       - in: path
         name: quiz_id
         schema:
-          type: integer
+          type: string
         required: true
+        description: Stored quiz id, or the quiz token of a stateless quiz
     requestBody:
       required: true
       content:
@@ -346,12 +246,36 @@ def learning_quiz_answer(quiz_id):
     responses:
       200:
         description: Quiz results
+      400:
+        description: Invalid answers, or a tampered quiz token or one issued to another user
+      404:
+        description: Quiz not found or expired
+      409:
+        description: Quiz already answered
     """
-    quiz = QUIZZES.get(quiz_id)
-    if not quiz:
-        return jsonify({"error": "quiz not found"}), 404
     data = request.get_json() or {}
-    user_id = request.jwt_payload.get("email", "anonymous")
+    user_id = request.jwt_payload.get("email") or "anonymous"
+    seed = None
+    quiz_catalog = get_quiz_catalog()
+    if quiz_id.isdigit():
+        quiz_id = int(quiz_id)
+        quiz = get_quiz_store().get(quiz_id)
+        if not quiz:
+            return jsonify({"error": "quiz not found"}), 404
+        # Quizzes stored before they carried a nonce are identified by their id
+        quiz_ref = f"s:{quiz['nonce']}" if quiz.get("nonce") else str(quiz_id)
+    else:
+        try:
+            descriptor = decode_quiz_token(quiz_id, user_id)
+        except QuizTokenExpired as exc:
+            return jsonify({"error": str(exc)}), 404
+        except QuizTokenError as exc:
+            return jsonify({"error": str(exc)}), 400
+        # Tokens issued before they carried a jti are identified by their digest
+        jti = descriptor["jti"]
+        quiz_ref = f"t:{jti}" if jti else hashlib.sha256(quiz_id.encode("utf-8")).hexdigest()
+        seed = descriptor["seed"]
+        quiz = {"questions": regenerate_questions(descriptor, quiz_catalog)}
     
     # Validate input using Marshmallow schema
     try:
@@ -362,33 +286,14 @@ def learning_quiz_answer(quiz_id):
     answers = validated["answers"]
     questions = quiz["questions"]
     total = len(questions)
-    correct_count = 0
-    detailed = []
-    for idx, q in enumerate(questions):
-        user_answer = answers[idx] if idx < len(answers) else None
-        correct_answer = q["answer"]
-        is_correct = False
-        if q["type"] == "open":
-            is_correct = str(user_answer or "").strip().lower() == str(correct_answer or "").strip().lower()
-        else:
-            is_correct = user_answer == correct_answer
-        if is_correct:
-            correct_count += 1
-        m = db.session.get(Maqam, q.get("maqam_id")) if q.get("maqam_id") else None
-        detailed.append({
-            "question": q["prompt"],
-            "question_type": q["type"],
-            "choices": q.get("choices"),
-            "user_answer": user_answer,
-            "correct_answer": correct_answer,
-            "is_correct": is_correct,
-            "explanation": {
-                "maqam_en": m.name_en if m else None,
-                "emotion_en": m.emotion if m else None,
-                "regions": json.loads(m.regions_json) if m and m.regions_json else [],
-                "usage": m.usage if m else None,
-            }
-        })
+    correct_count, detailed, rows = grade_quiz(questions, answers, quiz_catalog, seed=seed)
+    try:
+        record_answers(user_id, quiz_ref, rows)
+    except QuizAlreadyAnswered as exc:
+        # Answers are revealed once; a replay must not score again
+        db.session.rollback()
+        return jsonify({"error": str(exc)}), 409
+    record_quiz_reviews(user_id, rows)
     score = correct_count / total if total else 0
     update_quiz_stats(user_id, score)
 
@@ -802,25 +707,71 @@ def learning_complete_activity():
                         properties:
                             maqam_id:
                                 type: integer
-                            user_id:
-                                type: string
                             activity:
                                 type: string
+                            grade:
+                                type: integer
+                                description: Recall quality 0-5 for the review scheduler (default 4)
         responses:
             200:
                 description: Activity logged
+            400:
+                description: Missing fields or invalid grade
         """
         data = request.get_json() or {}
         maqam_id = data.get("maqam_id")
-        user_id = data.get("user_id") or request.jwt_payload.get("email", "anonymous")
+        # Progress and review state always belong to the caller
+        user_id = request.jwt_payload.get("email", "anonymous")
         activity = data.get("activity")
         if not all([maqam_id, user_id, activity]):
                 return jsonify({"error": "missing"}), 400
-        record_activity(user_id, int(maqam_id), activity)
+        grade = data.get("grade", GRADE_ACTIVITY)
+        if not isinstance(grade, int) or isinstance(grade, bool) or not 0 <= grade <= 5:
+                return jsonify({"error": "grade must be an integer between 0 and 5"}), 400
+        record_activity(user_id, int(maqam_id), activity, grade)
         stat = get_or_create_user_stat(user_id)
         return jsonify({"ok": True, "progress": stat.activities}), 200
 
 
+@learning_bp.route("/review/due", methods=["GET"])
+@require_jwt(roles=["admin", "expert", "learner"])
+def learning_review_due():
+    """
+    List the caller's spaced-repetition items that are due
+    ---
+    tags:
+      - Learning
+    parameters:
+      - in: query
+        name: limit
+        schema:
+          type: integer
+        required: false
+        description: Number of items (1-100, default 20)
+      - in: query
+        name: topic
+        schema:
+          type: string
+        required: false
+        description: Only items of one topic (emotion, region, usage, ajnas, audio, clues, notes)
+    responses:
+      200:
+        description: Due items, earliest first
+      400:
+        description: Invalid limit or topic
+    """
+    try:
+        limit = parse_limit(request.args.get("limit"), default=REVIEW_PAGE_SIZE, maximum=100)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    topic = request.args.get("topic") or None
+    if topic is not None and topic not in REVIEW_TOPICS:
+        return jsonify({"error": "invalid topic"}), 400
+    user_id = request.jwt_payload.get("email", "anonymous")
+    items = due_reviews(user_id, limit, topic)
+    return jsonify({"user_id": user_id, "count": len(items), "items": items}), 200
+
+
 @learning_bp.route("/leaderboard", methods=["GET"])
 def learning_leaderboard():
     """
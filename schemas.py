@@ -5,7 +5,43 @@ Data validation and serialization schemas using Marshmallow.
 Provides type-safe input validation and consistent output formatting.
 """
 
-from marshmallow import Schema, fields, validate, ValidationError
+import json
+
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from sqlalchemy import Float, String
+
+from models.maqam import EDITABLE_COLUMNS, Maqam
+
+
+def check_field_value(field, value):
+    """
+    The value to store in an editable maqam column, checked against the
+    column's type, length and nullability. JSON columns take any JSON value
+    (or its text). Raises ValidationError.
+    """
+    column = Maqam.__table__.c[field]
+    if value is None:
+        if not column.nullable:
+            raise ValidationError(f"{field} cannot be null")
+        return None
+    if field.endswith("_json"):
+        if not isinstance(value, str):
+            return json.dumps(value, ensure_ascii=False)
+        try:
+            json.loads(value)
+        except ValueError:
+            raise ValidationError(f"{field} must be JSON")
+        return value
+    if isinstance(column.type, Float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValidationError(f"{field} must be a number")
+        return float(value)
+    if isinstance(column.type, String):
+        if not isinstance(value, str):
+            raise ValidationError(f"{field} must be a string")
+        if column.type.length and len(value) > column.type.length:
+            raise ValidationError(f"{field} is longer than {column.type.length} characters")
+    return value
 
 
 # =============================================================================
@@ -37,6 +73,54 @@ class ContributionSchema(Schema):
         error_messages={"required": "payload is required"}
     )
 
+    @validates_schema
+    def _check_field_edit(self, data, **kwargs):
+        """field_edit payloads are validated like POST /knowledge/contributions."""
+        if data["type"] == "field_edit":
+            errors = field_edit_payload_schema.validate(data["payload"])
+            if errors:
+                raise ValidationError(errors, "payload")
+
+
+class BatchContributionSchema(ContributionSchema):
+    """Schema for one item of a batch contribution submission."""
+    maqam_id = fields.Integer(
+        required=True,
+        error_messages={"required": "maqam_id is required"}
+    )
+
+
+class FieldEditPayloadSchema(Schema):
+    """Schema for the payload of a field_edit contribution."""
+    field = fields.String(
+        required=True,
+        validate=validate.OneOf(EDITABLE_COLUMNS),
+        error_messages={"required": "field is required"}
+    )
+    new_value = fields.Raw(
+        required=True,
+        allow_none=True,
+        error_messages={"required": "new_value is required"}
+    )
+    notes = fields.String(validate=validate.Length(max=2000), load_default=None)
+    # Maqam version the edit is based on (the current one when omitted)
+    base_version = fields.Integer(load_default=None)
+
+    @validates_schema
+    def _check_new_value(self, data, **kwargs):
+        try:
+            check_field_value(data["field"], data["new_value"])
+        except ValidationError as err:
+            raise ValidationError(err.messages, "new_value")
+
+
+class FieldEditContributionSchema(FieldEditPayloadSchema):
+    """Schema for a proposed edit of one maqam field."""
+    maqam_id = fields.Integer(
+        required=True,
+        error_messages={"required": "maqam_id is required"}
+    )
+
 
 class NewMaqamSchema(Schema):
     """Schema for proposing a new maqam."""
@@ -76,6 +160,7 @@ class RecommendationRequestSchema(Schema):
     season = fields.String(validate=validate.Length(max=50), load_default=None)
     preserve_heritage = fields.Boolean(load_default=False)
     simple_for_beginners = fields.Boolean(load_default=False)
+    personalize = fields.Boolean(load_default=False)
 
 
 class ContributionReviewSchema(Schema):
@@ -87,6 +172,14 @@ class ContributionReviewSchema(Schema):
     )
 
 
+class BatchReviewSchema(ContributionReviewSchema):
+    """Schema for one decision of a batch contribution review."""
+    id = fields.Integer(
+        required=True,
+        error_messages={"required": "contribution id is required"}
+    )
+
+
 # =============================================================================
 # OUTPUT SCHEMAS (Response Serialization)
 # =============================================================================
@@ -194,6 +287,10 @@ new_maqam_schema = NewMaqamSchema()
 quiz_answer_schema = QuizAnswerSchema()
 recommendation_request_schema = RecommendationRequestSchema()
 contribution_review_schema = ContributionReviewSchema()
+batch_contribution_schema = BatchContributionSchema()
+batch_review_schema = BatchReviewSchema()
+field_edit_schema = FieldEditContributionSchema()
+field_edit_payload_schema = FieldEditPayloadSchema()
 
 # Output schemas
 maqam_basic_schema = MaqamBasicSchema()
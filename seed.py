@@ -1,6 +1,8 @@
 from extensions import db
 from app import create_app
 from models import Maqam, MaqamAudio
+from services.related_service import rebuild_related_graph
+from services.dedup_service import rebuild_lsh_index
 import json
 
 app = create_app()
@@ -312,4 +314,8 @@ with app.app_context():
         maqam_AL_ARDHAWI,
     ] + audios)
     db.session.commit()
+
+    rebuild_related_graph()
+    rebuild_lsh_index()
+    db.session.commit()
     print("Seeded database with 6 maqamet (Al Dhail, Al Maya, Sika, Al Hsin, Al Iraq, Al Ardhawi).")
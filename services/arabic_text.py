@@ -0,0 +1,39 @@
+import re
+
+# Harakat, superscript alef and tatweel
+_ARABIC_DIACRITICS = re.compile("[\u064B-\u0652\u0670\u0640]")
+_LETTER_FOLDING = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"})
+_ARABIC_LETTER = re.compile("[\u0621-\u064A]")
+
+# Simplified Latin transliteration (after folding), geared to how maqam and
+# jins names are usually spelled in Latin script (Rast, Sika, Dhail...)
+_TRANSLIT = {
+    "ا": "a", "ء": "", "ؤ": "u", "ئ": "i", "ب": "b", "ت": "t", "ث": "th", "ج": "j",
+    "ح": "h", "خ": "kh", "د": "d", "ذ": "dh", "ر": "r", "ز": "z", "س": "s", "ش": "sh",
+    "ص": "s", "ض": "d", "ط": "t", "ظ": "dh", "ع": "a", "غ": "gh", "ف": "f", "ق": "q",
+    "ك": "k", "ل": "l", "م": "m", "ن": "n", "ه": "h", "و": "u", "ي": "i",
+}
+
+
+def fold_arabic(text):
+    """Lower-case text with Arabic diacritics removed and alef/ya/ta-marbuta variants folded."""
+    return _ARABIC_DIACRITICS.sub("", str(text or "")).translate(_LETTER_FOLDING).lower()
+
+
+def has_arabic(text):
+    return bool(_ARABIC_LETTER.search(text or ""))
+
+
+def transliterate(text):
+    """Latin transliteration of the Arabic words in text; the article al- becomes its own word."""
+    words = []
+    for word in re.findall(r"\w+", fold_arabic(text)):
+        if not has_arabic(word):
+            continue
+        if word.startswith("ال") and len(word) > 3:
+            words.append("al")
+            word = word[2:]
+        latin = "".join(_TRANSLIT.get(ch, ch if ch.isascii() else "") for ch in word)
+        if latin:
+            words.append(latin)
+    return " ".join(words)
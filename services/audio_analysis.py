@@ -0,0 +1,190 @@
+"""
+Audio clip analysis: duration, sample rate, loudness and waveform peaks.
+
+WAV files are decoded with the standard library. Other formats are decoded
+through ffmpeg when it is installed; without it, MP3 files still get their
+duration and sample rate from a scan of the frame headers.
+"""
+
+import json
+import math
+import wave
+import shutil
+import subprocess
+
+import numpy as np
+
+# Waveform preview resolution: (min, max) pairs stored as int8
+PEAK_BUCKETS = 512
+PEAK_SCALE = 127
+# Rate ffmpeg resamples to for loudness and peaks (the original rate is probed)
+DECODE_RATE = 22050
+
+
+class UnsupportedAudio(Exception):
+    """The clip cannot be decoded with the available tools."""
+
+
+def _decode_wav(path):
+    try:
+        with wave.open(path, "rb") as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as exc:
+        raise UnsupportedAudio(f"unreadable WAV: {exc}")
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 2 ** 15
+    elif width == 3:
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = bytes3[:, 0] | (bytes3[:, 1] << 8) | (bytes3[:, 2] << 16)
+        samples = np.where(ints >= 2 ** 23, ints - 2 ** 24, ints).astype(np.float32) / 2 ** 23
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2 ** 31
+    else:
+        raise UnsupportedAudio(f"unsupported WAV sample width: {width}")
+    samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate, channels
+
+
+# MPEG audio frame header tables (version id bits -> values)
+_MP3_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MP3_BITRATES = {
+    (3, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (3, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (3, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def _scan_mp3(path):
+    """Duration and sample rate of an MP3 from its frame headers (no decoding)."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size
+    samples = frames = 0
+    rate = channels = None
+    while pos + 4 <= len(data):
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+            pos += 1
+            continue
+        version, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+        bitrate_idx, rate_idx, padding = b2 >> 4, (b2 >> 2) & 3, (b2 >> 1) & 1
+        if version == 1 or layer == 4 or bitrate_idx in (0, 15) or rate_idx == 3:
+            pos += 1
+            continue
+        frame_rate = _MP3_RATES[version][rate_idx]
+        bitrate = _MP3_BITRATES[(3 if version == 3 else 2, layer if version == 3 else (1 if layer == 1 else 2))]
+        bitrate = bitrate[bitrate_idx] * 1000
+        if layer == 1:
+            per_frame, length = 384, (12 * bitrate // frame_rate + padding) * 4
+        else:
+            per_frame = 576 if layer == 3 and version != 3 else 1152
+            length = per_frame // 8 * bitrate // frame_rate + padding
+        if length < 4:
+            pos += 1
+            continue
+        rate = rate or frame_rate
+        channels = channels or (1 if (b3 >> 6) == 3 else 2)
+        samples += per_frame
+        frames += 1
+        pos += length
+    if not frames:
+        raise UnsupportedAudio("no MPEG audio frames found")
+    return samples / rate, rate, channels
+
+
+def _ffmpeg_available(ffmpeg):
+    return bool(ffmpeg) and shutil.which(ffmpeg) is not None
+
+
+def _probe(path, ffmpeg):
+    ffprobe = shutil.which(ffmpeg.replace("ffmpeg", "ffprobe"))
+    if not ffprobe:
+        return None, None
+    out = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate,channels",
+         "-of", "json", path],
+        capture_output=True, timeout=60,
+    )
+    try:
+        stream = json.loads(out.stdout)["streams"][0]
+        return int(stream["sample_rate"]), int(stream["channels"])
+    except (ValueError, KeyError, IndexError):
+        return None, None
+
+
+def _decode_ffmpeg(path, ffmpeg):
+    out = subprocess.run(
+        [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-f", "f32le", "-ac", "1", "-ar", str(DECODE_RATE), "-"],
+        capture_output=True, timeout=300,
+    )
+    if out.returncode != 0 or not out.stdout:
+        raise UnsupportedAudio(f"ffmpeg could not decode the clip: {out.stderr.decode(errors='replace')[:200]}")
+    return np.frombuffer(out.stdout, dtype="<f4")
+
+
+def waveform_peaks(samples, buckets=PEAK_BUCKETS):
+    """Interleaved (min, max) int8 pairs over `buckets` equal slices of the clip."""
+    if not len(samples):
+        return b""
+    buckets = min(buckets, len(samples))
+    edges = np.linspace(0, len(samples), buckets + 1).astype(int)
+    mins = np.minimum.reduceat(samples, edges[:-1])
+    maxs = np.maximum.reduceat(samples, edges[:-1])
+    pairs = np.stack([mins, maxs], axis=1).clip(-1.0, 1.0)
+    return np.round(pairs * PEAK_SCALE).astype(np.int8).tobytes()
+
+
+def unpack_peaks(blob):
+    """Flat [min0, max0, min1, max1, ...] list from a stored peaks blob."""
+    return np.frombuffer(blob or b"", dtype=np.int8).tolist()
+
+
+def _dbfs(value):
+    return round(20 * math.log10(value), 2) if value > 0 else None
+
+
+def analyze_file(path, ffmpeg="ffmpeg"):
+    """
+    Analyze a clip. Returns a dict with status ("done", or "partial" when only
+    the duration and sample rate could be read), duration_seconds,
+    sample_rate, channels, loudness_dbfs (RMS), peak_dbfs and peaks.
+    Raises UnsupportedAudio when nothing can be read.
+    """
+    with open(path, "rb") as fh:
+        head = fh.read(12)
+    is_wav = head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+    if is_wav:
+        samples, rate, channels = _decode_wav(path)
+        duration = len(samples) / rate if rate else 0.0
+    elif _ffmpeg_available(ffmpeg):
+        samples = _decode_ffmpeg(path, ffmpeg)
+        rate, channels = _probe(path, ffmpeg)
+        duration = len(samples) / DECODE_RATE
+    else:
+        duration, rate, channels = _scan_mp3(path)
+        return {
+            "status": "partial", "duration_seconds": round(duration, 3), "sample_rate": rate,
+            "channels": channels, "loudness_dbfs": None, "peak_dbfs": None, "peaks": None,
+        }
+
+    samples = np.asarray(samples, dtype=np.float32)
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    return {
+        "status": "done",
+        "duration_seconds": round(duration, 3),
+        "sample_rate": rate,
+        "channels": channels,
+        "loudness_dbfs": _dbfs(rms),
+        "peak_dbfs": _dbfs(peak),
+        "peaks": waveform_peaks(samples),
+    }
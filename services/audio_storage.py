@@ -0,0 +1,258 @@
+"""
+Content-addressed storage for uploaded audio.
+
+Uploads are stored once under their SHA-256 digest; the audio_blob table
+counts how many maqam_audio rows reference each digest and a blob's file is
+removed after the commit that drops its last reference. Because a digest
+always names the same bytes, blobs are served with the digest as a strong
+ETag and immutable caching.
+"""
+
+import os
+import re
+import mimetypes
+import time
+import hashlib
+import tempfile
+from urllib.parse import unquote, urlsplit
+
+from flask import current_app, has_app_context, request, send_file
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.audio_analysis import AudioAnalysis
+from models.audio_blob import AudioBlob
+from models.maqam_audio import MaqamAudio
+from services.cache_service import get_cache
+
+CHUNK_SIZE = 1024 * 1024
+# Content types of recently served blobs, so range requests skip the database
+BLOB_TYPE_CACHE_SIZE = 4096
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class LocalAudioStorage:
+    """Blobs as files under root/<first two hex digits>/<digest>."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def relative_path(self, sha256):
+        return f"{sha256[:2]}/{sha256}"
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def put(self, stream):
+        """Store a file-like object; returns (sha256, size). Storing existing content is a no-op."""
+        os.makedirs(self.root, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self.path(sha256)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256, size
+
+    def delete(self, sha256):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def modified_at(self, sha256):
+        return os.path.getmtime(self.path(sha256))
+
+    def digests(self):
+        """Digests of every stored blob."""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if len(prefix) == 2 and os.path.isdir(folder):
+                yield from (name for name in os.listdir(folder) if name.startswith(prefix))
+
+
+_BACKENDS = {"local": lambda app: LocalAudioStorage(app.config["AUDIO_STORAGE_DIR"])}
+
+
+def get_audio_storage():
+    """The storage backend configured by AUDIO_STORAGE_BACKEND for the current app."""
+    app = current_app._get_current_object()
+    key = (app.config["AUDIO_STORAGE_BACKEND"], app.config["AUDIO_STORAGE_DIR"])
+    cached = app.extensions.get("audio_storage")
+    if cached is None or cached[0] != key:
+        backend = _BACKENDS.get(key[0])
+        if backend is None:
+            raise RuntimeError(f"unknown AUDIO_STORAGE_BACKEND: {key[0]}")
+        cached = (key, backend(app))
+        app.extensions["audio_storage"] = cached
+    return cached[1]
+
+
+def acquire_blob(sha256, size, content_type):
+    """Add a reference to a stored blob, creating its row on first use (the caller commits)."""
+    values = {"refcount": AudioBlob.refcount + 1}
+    if db.session.execute(update(AudioBlob).where(AudioBlob.sha256 == sha256).values(**values)).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(AudioBlob(sha256=sha256, size=size, content_type=content_type, refcount=1))
+    except IntegrityError:
+        # Another request created the row first
+        db.session.execute(update(AudioBlob).where(AudioBlob.sha256 == sha256).values(**values))
+
+
+def release_blob(sha256):
+    """
+    Drop a reference to a blob (the caller commits). The row goes when no
+    reference is left, with its analysis, and its file is removed once that
+    commit succeeds.
+    """
+    if not sha256:
+        return
+    db.session.execute(update(AudioBlob).where(AudioBlob.sha256 == sha256).values(refcount=AudioBlob.refcount - 1))
+    orphaned = db.session.execute(
+        delete(AudioBlob).where(AudioBlob.sha256 == sha256, AudioBlob.refcount <= 0)
+    ).rowcount
+    if orphaned:
+        db.session.execute(delete(AudioAnalysis).where(AudioAnalysis.sha256 == sha256))
+        db.session.info.setdefault("orphaned_audio_blobs", set()).add(sha256)
+
+
+def delete_audio(audio):
+    """Delete a MaqamAudio row and drop its reference to the stored upload (the caller commits)."""
+    release_blob(audio.sha256)
+    db.session.delete(audio)
+
+
+def _blob_content_type(sha256):
+    cache = get_cache("audio_blob_types", BLOB_TYPE_CACHE_SIZE, catalog_bound=False)
+    content_type = cache.get(sha256)
+    if content_type is None:
+        content_type = db.session.scalar(select(AudioBlob.content_type).where(AudioBlob.sha256 == sha256))
+        if content_type is not None:
+            cache.put(sha256, content_type)
+    return content_type
+
+
+def _cache_headers(response, sha256):
+    response.set_etag(sha256)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["AUDIO_CACHE_MAX_AGE"]
+    response.cache_control.immutable = True
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+def blob_response(sha256):
+    """
+    Serve a stored blob, or None when the digest is unknown.
+
+    Range requests are answered with 206 partial content. With
+    AUDIO_ACCEL_REDIRECT_PREFIX set the body (and range handling) is handed
+    to nginx through X-Accel-Redirect; with USE_X_SENDFILE, to the server
+    through X-Sendfile. Otherwise the WSGI server's file wrapper streams it.
+    """
+    sha256 = sha256.lower()
+    storage = get_audio_storage()
+    if not _DIGEST.match(sha256) or not storage.exists(sha256):
+        return None
+    if request.if_none_match.contains(sha256):
+        return _cache_headers(current_app.response_class(status=304), sha256)
+    content_type = _blob_content_type(sha256)
+    if content_type is None:
+        return None
+
+    prefix = current_app.config["AUDIO_ACCEL_REDIRECT_PREFIX"]
+    if prefix:
+        response = current_app.response_class(mimetype=content_type)
+        response.headers["X-Accel-Redirect"] = f"{prefix.rstrip('/')}/{storage.relative_path(sha256)}"
+    else:
+        response = send_file(storage.path(sha256), mimetype=content_type, conditional=True, etag=sha256,
+                             max_age=current_app.config["AUDIO_CACHE_MAX_AGE"])
+    return _cache_headers(response, sha256)
+
+
+def adopt_static_audio(static_folder, blob_url):
+    """
+    Move clips referenced as /static/audio/<file> URLs into the blob store and
+    point their rows at blob_url(sha256) (the caller commits).
+
+    Returns (adopted, missing) row counts; rows whose file is gone are left as they are.
+    """
+    storage = get_audio_storage()
+    audio_dir = os.path.realpath(os.path.join(static_folder, "audio"))
+    adopted = missing = 0
+    for audio in MaqamAudio.query.filter(MaqamAudio.sha256.is_(None)).order_by(MaqamAudio.id):
+        path = urlsplit(audio.url).path
+        if not path.startswith("/static/audio/"):
+            continue
+        file_path = os.path.realpath(os.path.join(audio_dir, unquote(path[len("/static/audio/"):])))
+        if os.path.dirname(file_path) != audio_dir or not os.path.isfile(file_path):
+            missing += 1
+            continue
+        with open(file_path, "rb") as fh:
+            sha256, size = storage.put(fh)
+        acquire_blob(sha256, size, mimetypes.guess_type(file_path)[0] or "application/octet-stream")
+        audio.sha256 = sha256
+        audio.url = blob_url(sha256)
+        adopted += 1
+    return adopted, missing
+
+
+def collect_garbage(grace_seconds=3600):
+    """
+    Remove stored files that no audio_blob row references (e.g. from failed
+    uploads). Files younger than grace_seconds may belong to an upload that
+    has not committed yet and are kept.
+    """
+    storage = get_audio_storage()
+    referenced = set(db.session.scalars(select(AudioBlob.sha256)))
+    cutoff = time.time() - grace_seconds
+    removed = [
+        sha256 for sha256 in storage.digests()
+        if sha256 not in referenced and storage.modified_at(sha256) < cutoff
+    ]
+    for sha256 in removed:
+        storage.delete(sha256)
+    return len(removed)
+
+
+@event.listens_for(Session, "after_commit")
+def _remove_orphaned_blobs(session):
+    orphaned = session.info.pop("orphaned_audio_blobs", None)
+    if not orphaned or not has_app_context():
+        return
+    storage = get_audio_storage()
+    # The session cannot emit SQL after commit; the same content may have
+    # been uploaded again since, so re-check on a fresh connection
+    with db.engine.connect() as conn:
+        kept = set(conn.scalars(select(AudioBlob.sha256).where(AudioBlob.sha256.in_(orphaned))))
+    for sha256 in orphaned - kept:
+        storage.delete(sha256)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_orphaned_blobs(session):
+    session.info.pop("orphaned_audio_blobs", None)
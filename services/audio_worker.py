@@ -0,0 +1,170 @@
+"""
+Background analysis of uploaded audio.
+
+Uploads register their blob with queue_analysis(); once the upload commits,
+the blob is handed to a bounded thread pool that decodes it and stores the
+duration, sample rate, loudness and waveform peaks in audio_analysis. The
+pool is created per process on first use, so forked server workers each get
+their own. When the queue is full the blob stays pending and
+`flask audio analyze` picks it up later.
+"""
+
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.audio_analysis import AudioAnalysis
+from models.audio_blob import AudioBlob
+from services.audio_analysis import UnsupportedAudio, analyze_file
+from services.audio_storage import get_audio_storage
+
+_RESULT_FIELDS = ("duration_seconds", "sample_rate", "channels", "loudness_dbfs", "peak_dbfs", "peaks")
+
+
+class AudioAnalysisWorker:
+    """A thread pool with at most `queue_size` analyses waiting or running."""
+
+    def __init__(self, app, workers, queue_size):
+        self.app = app
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(queue_size, workers))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, sha256):
+        """Queue one blob; returns False when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="audio-analysis")
+            try:
+                self._executor.submit(self._run, sha256)
+            except RuntimeError:
+                # Interpreter shutting down
+                self._slots.release()
+                return False
+        return True
+
+    def _run(self, sha256):
+        try:
+            with self.app.app_context():
+                analyze_blob(sha256)
+        except Exception:
+            self.app.logger.exception("audio analysis of %s failed", sha256)
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def init_audio_worker(app):
+    """Attach the analysis worker to the app (threads start with the first upload)."""
+    worker = AudioAnalysisWorker(
+        app, app.config["AUDIO_ANALYSIS_WORKERS"], app.config["AUDIO_ANALYSIS_QUEUE_SIZE"]
+    )
+    app.extensions["audio_worker"] = worker
+    atexit.register(worker.shutdown, wait=False)
+    return worker
+
+
+def queue_analysis(sha256):
+    """
+    Make sure a blob has an analysis row and analyze it after the caller's
+    commit if it is still pending.
+    """
+    if db.session.get(AudioAnalysis, sha256) is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(AudioAnalysis(sha256=sha256, status="pending"))
+        except IntegrityError:
+            # Another upload of the same content got there first
+            pass
+    analysis = db.session.get(AudioAnalysis, sha256)
+    if analysis is not None and analysis.status == "pending":
+        db.session.info.setdefault("pending_audio_analysis", set()).add(sha256)
+    return analysis
+
+
+def analyze_blob(sha256):
+    """
+    Analyze one stored blob now and commit the result. Returns the
+    AudioAnalysis row, or None when the blob has been deleted meanwhile.
+    """
+    analysis = db.session.get(AudioAnalysis, sha256)
+    if analysis is None:
+        if db.session.get(AudioBlob, sha256) is None:
+            return None
+        analysis = AudioAnalysis(sha256=sha256)
+        db.session.add(analysis)
+    storage = get_audio_storage()
+    try:
+        if not storage.exists(sha256):
+            raise UnsupportedAudio("stored file is missing")
+        result = analyze_file(storage.path(sha256), ffmpeg=current_app.config["AUDIO_FFMPEG_BIN"])
+    except (UnsupportedAudio, OSError) as exc:
+        analysis.status = "failed"
+        analysis.error = str(exc)[:255]
+    else:
+        analysis.status = result["status"]
+        analysis.error = None
+        for field in _RESULT_FIELDS:
+            setattr(analysis, field, result[field])
+    analysis.analyzed_at = datetime.now(timezone.utc)
+    db.session.commit()
+    return analysis
+
+
+def analyze_pending(reanalyze=False):
+    """
+    Synchronously analyze every blob without a finished analysis (or all
+    blobs with reanalyze=True). Returns {status: count}.
+    """
+    query = select(AudioBlob.sha256).outerjoin(AudioAnalysis, AudioAnalysis.sha256 == AudioBlob.sha256)
+    if not reanalyze:
+        query = query.where((AudioAnalysis.sha256.is_(None)) | (AudioAnalysis.status == "pending"))
+    counts = {}
+    for sha256 in db.session.scalars(query.order_by(AudioBlob.created_at)).all():
+        analysis = analyze_blob(sha256)
+        if analysis is not None:
+            counts[analysis.status] = counts.get(analysis.status, 0) + 1
+    return counts
+
+
+def _run_inline(app, sha256):
+    try:
+        with app.app_context():
+            analyze_blob(sha256)
+    except Exception:
+        app.logger.exception("audio analysis of %s failed", sha256)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_pending_analysis(session):
+    pending = session.info.pop("pending_audio_analysis", None)
+    if not pending or not has_app_context():
+        return
+    app = current_app._get_current_object()
+    worker = app.extensions.get("audio_worker")
+    for sha256 in sorted(pending):
+        if worker is None or app.config["AUDIO_ANALYSIS_WORKERS"] <= 0:
+            # No pool configured: analyze now, in a session of its own
+            _run_inline(app, sha256)
+        elif not worker.submit(sha256):
+            app.logger.warning("audio analysis queue full; %s left pending", sha256)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_analysis(session):
+    session.info.pop("pending_audio_analysis", None)
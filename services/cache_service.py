@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU cache with hit/miss counters.
+
+    With max_bytes set, values must be bytes-like and the cache also evicts
+    until their total length fits.
+    """
+
+    def __init__(self, capacity=1024, max_bytes=None):
+        self.capacity = max(0, int(capacity))
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.capacity == 0:
+            return
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if self.max_bytes is not None:
+                previous = self._data.get(key)
+                self.bytes += len(value) - (len(previous) if previous is not None else 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                if self.max_bytes is not None:
+                    self.bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "capacity": self.capacity,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.max_bytes is not None:
+            stats.update({"max_bytes": self.max_bytes, "bytes": self.bytes})
+        return stats
+
+
+def get_cache(name, capacity, catalog_bound=True, max_bytes=None):
+    """
+    Return the app-wide cache registered under name, creating it on first use.
+
+    Catalog-bound caches are cleared whenever a catalog write is committed.
+    """
+    caches = current_app.extensions.setdefault("caches", {})
+    if name not in caches:
+        cache = LRUCache(capacity, max_bytes=max_bytes)
+        cache.catalog_bound = catalog_bound
+        caches[name] = cache
+    return caches[name]
+
+
+def cache_stats():
+    """Hit-rate metrics of every cache registered on the current app."""
+    return {name: cache.stats() for name, cache in current_app.extensions.get("caches", {}).items()}
+
+
+def clear_catalog_caches():
+    for cache in current_app.extensions.get("caches", {}).values():
+        if getattr(cache, "catalog_bound", True):
+            cache.clear()
@@ -0,0 +1,253 @@
+"""
+Newline-delimited JSON (NDJSON) import and export of the maqam catalog.
+
+One maqam per line. JSON text columns are written as nested JSON under their
+name without the "_json" suffix (regions_json -> "regions"), and audio
+references as "audio_urls". Maqamet are matched on name_en (trimmed and
+lower-cased in Python, see name_key) when importing.
+"""
+
+import json
+
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.orm import selectinload
+
+from extensions import db
+from models.jins import Jins
+from models.maqam import Maqam
+from models.maqam_audio import MaqamAudio
+from services.audio_storage import delete_audio
+from services.catalog_service import catalog_imported
+from services.change_feed_service import record_maqam_upserts
+from services.dedup_service import refresh_lsh_index
+from services.search_service import reindex_maqamet
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+
+TEXT_FIELDS = (
+    "name_en", "name_ar", "emotion", "emotion_ar", "usage", "usage_ar",
+    "description_en", "description_ar", "difficulty_label", "difficulty_label_ar",
+    "rarity_level", "rarity_level_ar",
+)
+NUMBER_FIELDS = ("difficulty_index",)
+JSON_FIELDS = (
+    "ajnas", "regions", "regions_ar", "related", "emotion_weights",
+    "historical_periods", "historical_periods_ar", "seasonal_usage", "seasonal_usage_ar",
+)
+REQUIRED_FIELDS = ("name_en", "name_ar")
+
+
+class CatalogImportError(ValueError):
+    """An import line could not be applied; nothing from the import is kept."""
+
+    def __init__(self, line_no, message):
+        super().__init__(f"line {line_no}: {message}")
+        self.line_no = line_no
+
+
+def maqam_record(m):
+    record = {field: getattr(m, field) for field in TEXT_FIELDS + NUMBER_FIELDS}
+    for field in JSON_FIELDS:
+        raw = getattr(m, f"{field}_json")
+        try:
+            record[field] = json.loads(raw) if raw else None
+        except (TypeError, ValueError):
+            record[field] = None
+    record["audio_urls"] = [a.url for a in m.audios]
+    return record
+
+
+def export_lines(batch_size=EXPORT_BATCH_SIZE):
+    """Yield the catalog as NDJSON lines, loading batch_size maqamet at a time."""
+    last_id = 0
+    while True:
+        batch = (
+            Maqam.query.options(selectinload(Maqam.audios))
+            .filter(Maqam.id > last_id)
+            .order_by(Maqam.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return
+        for m in batch:
+            yield json.dumps(maqam_record(m), ensure_ascii=False) + "\n"
+        last_id = batch[-1].id
+        db.session.expunge_all()
+
+
+def _parse_line(line_no, raw):
+    if isinstance(raw, bytes):
+        try:
+            raw = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            raise CatalogImportError(line_no, "not valid UTF-8")
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        raise CatalogImportError(line_no, "not valid JSON")
+    if not isinstance(record, dict):
+        raise CatalogImportError(line_no, "expected a JSON object")
+
+    missing = [f for f in REQUIRED_FIELDS if not isinstance(record.get(f), str) or not record[f].strip()]
+    if missing:
+        raise CatalogImportError(line_no, f"missing {', '.join(missing)}")
+    for field in TEXT_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise CatalogImportError(line_no, f"{field} must be a string")
+    for field in NUMBER_FIELDS:
+        value = record.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise CatalogImportError(line_no, f"{field} must be a number")
+    urls = record.get("audio_urls")
+    if urls is not None and not (isinstance(urls, list) and all(isinstance(u, str) and u for u in urls)):
+        raise CatalogImportError(line_no, "audio_urls must be a list of URLs")
+    return record
+
+
+def _column_values(record):
+    values = {field: record[field] for field in TEXT_FIELDS + NUMBER_FIELDS if field in record}
+    for field in JSON_FIELDS:
+        if field in record:
+            value = record[field]
+            values[f"{field}_json"] = json.dumps(value, ensure_ascii=False) if value is not None else None
+    return values
+
+
+def _grouped_by_columns(rows):
+    """Rows grouped by their key set, so each group is one executemany."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups.values()
+
+
+def name_key(name):
+    """Key a maqam is matched on when importing: its trimmed, lower-cased English name."""
+    return name.strip().lower()
+
+
+def _ids_by_key():
+    """
+    {name key: id} of the whole catalog, from the id and name columns only.
+    The keys are computed in Python: SQL lower() only folds ASCII on SQLite.
+    """
+    ids = {}
+    for maqam_id, name_en in db.session.execute(select(Maqam.id, Maqam.name_en).order_by(Maqam.id)):
+        ids.setdefault(name_key(name_en), maqam_id)
+    return ids
+
+
+def _write_maqamet(values_by_key, ids):
+    """Bulk insert new maqamet (adding their ids to `ids`) and bulk update existing ones."""
+    new_keys = [key for key in values_by_key if key not in ids]
+    for rows in _grouped_by_columns([dict(values_by_key[key], _key=key) for key in new_keys]):
+        keys = [row.pop("_key") for row in rows]
+        stmt = insert(Maqam).returning(Maqam.id, sort_by_parameter_order=True)
+        ids.update(zip(keys, db.session.scalars(stmt, rows).all()))
+
+    table = Maqam.__table__
+    updates = [dict(values, _id=ids[key]) for key, values in values_by_key.items() if key in ids]
+    for rows in _grouped_by_columns(updates):
+        columns = [c for c in rows[0] if c != "_id"]
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("_id"))
+            .values(version=table.c.version + 1, **{c: bindparam(c) for c in columns}),
+            rows,
+        )
+
+
+def _replace_audios(urls_by_id, stats):
+    existing = {}
+    for audio in MaqamAudio.query.filter(MaqamAudio.maqam_id.in_(list(urls_by_id))):
+        existing.setdefault(audio.maqam_id, []).append(audio)
+    for maqam_id, urls in urls_by_id.items():
+        wanted = list(dict.fromkeys(urls))
+        have = set()
+        for audio in existing.get(maqam_id, []):
+            if audio.url in wanted:
+                have.add(audio.url)
+            else:
+                delete_audio(audio)
+        for url in wanted:
+            if url not in have:
+                db.session.add(MaqamAudio(maqam_id=maqam_id, url=url))
+                stats["audios"] += 1
+
+
+def _import_chunk(records, ids, stats):
+    """
+    Upsert one chunk with executemany INSERT and UPDATE statements, then
+    bring the per-maqam derived rows of the written maqamet up to date:
+    normalized child rows, search index, change feed and LSH buckets.
+    Returns the ids written.
+    """
+    values_by_key, urls_by_key = {}, {}
+    for record in records:
+        key = name_key(record["name_en"])
+        if key in ids or key in values_by_key:
+            stats["updated"] += 1
+        else:
+            stats["created"] += 1
+        if key in values_by_key:
+            # Repeated in the chunk: later lines update the earlier ones
+            values_by_key[key].update(_column_values(record))
+        else:
+            values_by_key[key] = _column_values(record)
+        if "audio_urls" in record:
+            urls_by_key[key] = record["audio_urls"]
+
+    _write_maqamet(values_by_key, ids)
+    chunk_ids = sorted({ids[key] for key in values_by_key})
+    if urls_by_key:
+        _replace_audios({ids[key]: urls for key, urls in urls_by_key.items()}, stats)
+
+    written = Maqam.query.options(
+        selectinload(Maqam.regions), selectinload(Maqam.historical_periods), selectinload(Maqam.seasonal_usages),
+        selectinload(Maqam.emotion_weights), selectinload(Maqam.ajnas).selectinload(Jins.notes),
+    ).filter(Maqam.id.in_(chunk_ids)).all()
+    for m in written:
+        m.sync_normalized()
+    db.session.flush()
+    reindex_maqamet(written)
+    record_maqam_upserts(chunk_ids)
+    refresh_lsh_index(updated_ids=chunk_ids)
+    # The rows are written, the objects are no longer needed
+    db.session.expunge_all()
+    return chunk_ids
+
+
+def import_lines(lines, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Upsert NDJSON maqam records in chunks within the caller's transaction.
+
+    Raises CatalogImportError on the first invalid line; the caller should
+    roll back. A maqam repeated in the input is updated by its later lines.
+    Maqam objects are held one chunk at a time; the import also keeps the
+    id and name key of every maqam and the ids it wrote, and refreshes the
+    related graph once at the end, which loads the features of the whole
+    catalog. Returns counts of created and updated maqamet and added audio
+    references.
+    """
+    stats = {"created": 0, "updated": 0, "audios": 0}
+    ids, written, chunk = None, set(), []
+    for line_no, raw in enumerate(lines, start=1):
+        record = _parse_line(line_no, raw)
+        if record is None:
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            ids = _ids_by_key() if ids is None else ids
+            written.update(_import_chunk(chunk, ids, stats))
+            chunk = []
+    if chunk:
+        ids = _ids_by_key() if ids is None else ids
+        written.update(_import_chunk(chunk, ids, stats))
+    if written:
+        catalog_imported(sorted(written))
+    return stats
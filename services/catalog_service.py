@@ -0,0 +1,78 @@
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.catalog_state import CatalogState
+from services.cache_service import clear_catalog_caches
+from services.related_service import rebuild_related_graph, refresh_related
+from services.dedup_service import rebuild_lsh_index, refresh_lsh_index
+
+
+def catalog_changed(updated_ids=(), deleted_ids=()):
+    """
+    Keep derived catalog data in sync after maqamet were written.
+
+    Call this before committing the write (and before deleting the rows) so the
+    derived rows and the catalog version bump land in the same transaction as
+    the catalog change. Catalog-bound caches are cleared once it commits.
+    """
+    refresh_related(updated_ids=updated_ids, deleted_ids=deleted_ids)
+    refresh_lsh_index(updated_ids=updated_ids, deleted_ids=deleted_ids)
+    _bump_catalog_version()
+
+
+def catalog_imported(updated_ids):
+    """
+    Finish a chunked import that refreshed the LSH buckets of each chunk,
+    before committing it: one related-graph refresh for every maqam written.
+    """
+    refresh_related(updated_ids=updated_ids)
+    _bump_catalog_version()
+
+
+def catalog_rebuilt():
+    """Rebuild all derived catalog data after a bulk write (e.g. an import), before committing it."""
+    rebuild_related_graph()
+    rebuild_lsh_index()
+    _bump_catalog_version()
+
+
+def _bump_catalog_version():
+    bumped = CatalogState.query.filter_by(id=1).update(
+        {"version": CatalogState.version + 1}, synchronize_session=False
+    )
+    if not bumped:
+        db.session.add(CatalogState(id=1, version=1))
+    db.session.info["catalog_changed"] = True
+
+
+def current_catalog_version():
+    """
+    Catalog version shared by all workers.
+
+    The value is cached per process and re-read at most every
+    CATALOG_VERSION_POLL_SECONDS, so writes made by another worker become
+    visible after that delay; local writes are visible immediately.
+    """
+    state = current_app.extensions.setdefault("catalog_version", {"version": None, "checked_at": 0.0})
+    poll = current_app.config.get("CATALOG_VERSION_POLL_SECONDS", 2.0)
+    now = time.monotonic()
+    if state["version"] is None or now - state["checked_at"] >= poll:
+        version = db.session.query(CatalogState.version).filter_by(id=1).scalar()
+        state.update(version=version or 0, checked_at=now)
+    return state["version"]
+
+
+@event.listens_for(Session, "after_commit")
+def _after_catalog_commit(session):
+    if session.info.pop("catalog_changed", False) and has_app_context():
+        current_app.extensions.pop("catalog_version", None)
+        clear_catalog_caches()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_catalog_rollback(session):
+    session.info.pop("catalog_changed", None)
@@ -0,0 +1,165 @@
+import json
+from datetime import datetime, timezone
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.catalog_change import CatalogChange
+from models.catalog_state import CatalogState
+from models.contribution import MaqamContribution
+from models.maqam import Maqam
+from models.maqam_audio import MaqamAudio
+
+CHANGES_PAGE_SIZE = 100
+
+
+def _change_row(entity, entity_id, op, maqam_id):
+    return {
+        "entity": entity,
+        "entity_id": entity_id,
+        "op": op,
+        "maqam_id": maqam_id,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def _contribution_accepted(session, contrib):
+    history = inspect(contrib).attrs.status.history
+    return contrib.status == "accepted" and (contrib in session.new or history.has_changes())
+
+
+@event.listens_for(Session, "after_flush")
+def _record_catalog_changes(session, flush_context):
+    rows = []
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Maqam) and (obj in session.new or session.is_modified(obj, include_collections=False)):
+            rows.append(_change_row("maqam", obj.id, "upsert", obj.id))
+        elif isinstance(obj, MaqamAudio) and (obj in session.new or session.is_modified(obj)):
+            rows.append(_change_row("audio", obj.id, "upsert", obj.maqam_id))
+        elif isinstance(obj, MaqamContribution) and _contribution_accepted(session, obj):
+            rows.append(_change_row("contribution", obj.id, "upsert", obj.maqam_id))
+    for obj in session.deleted:
+        if isinstance(obj, Maqam):
+            rows.append(_change_row("maqam", obj.id, "delete", obj.id))
+        elif isinstance(obj, MaqamAudio):
+            rows.append(_change_row("audio", obj.id, "delete", obj.maqam_id))
+    _write_change_rows(session, rows)
+
+
+def _write_change_rows(session, rows):
+    if not rows:
+        return
+    conn = session.connection()
+    if not session.info.get("catalog_seq_locked"):
+        # Bumping the shared catalog row locks it until commit, so concurrent
+        # catalog writers commit their change rows in seq order
+        bumped = conn.execute(
+            CatalogState.__table__.update().where(CatalogState.id == 1).values(version=CatalogState.version + 1)
+        ).rowcount
+        if not bumped:
+            conn.execute(CatalogState.__table__.insert().values(id=1, version=1))
+        session.info["catalog_seq_locked"] = True
+    conn.execute(CatalogChange.__table__.insert(), rows)
+    session.info["catalog_changed"] = True
+
+
+def record_maqam_upserts(maqam_ids):
+    """Change rows for maqamet written with bulk statements, which the flush hook does not see."""
+    _write_change_rows(db.session, [_change_row("maqam", i, "upsert", i) for i in maqam_ids])
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _release_seq_lock(session):
+    session.info.pop("catalog_seq_locked", None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_seq_lock(session, previous_transaction):
+    # A rolled back savepoint undoes its catalog_state bump, so the next flush
+    # must take the lock again
+    session.info.pop("catalog_seq_locked", None)
+
+
+def _audio_dict(audio):
+    return {"id": audio.id, "maqam_id": audio.maqam_id, "url": audio.url}
+
+
+def _contribution_dict(contrib):
+    return {
+        "id": contrib.id,
+        "maqam_id": contrib.maqam_id,
+        "type": contrib.type,
+        "status": contrib.status,
+        "payload": json.loads(contrib.payload_json) if contrib.payload_json else None,
+        "reviewed_at": contrib.reviewed_at.isoformat() if contrib.reviewed_at else None,
+    }
+
+
+_ENTITIES = {
+    "maqam": (Maqam, lambda m: m.to_dict_full(), Maqam.full_load_options),
+    "audio": (MaqamAudio, _audio_dict, list),
+    "contribution": (MaqamContribution, _contribution_dict, list),
+}
+
+
+def changes_since(since, limit=CHANGES_PAGE_SIZE):
+    """
+    Catalog changes with seq > since, oldest first.
+
+    Each entity appears once per page, at its latest change, with its current
+    state ("upsert") or as a tombstone ("delete"). Returns the entries, the seq
+    to pass as the next since, and whether more changes follow.
+    """
+    records = (
+        CatalogChange.query
+        .filter(CatalogChange.seq > since)
+        .order_by(CatalogChange.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(records) > limit
+    records = records[:limit]
+    next_since = records[-1].seq if records else since
+
+    latest = {}
+    for rec in records:
+        latest.pop((rec.entity, rec.entity_id), None)
+        latest[(rec.entity, rec.entity_id)] = rec
+
+    current = {}
+    for entity, (model, _, options) in _ENTITIES.items():
+        ids = [eid for (ent, eid), rec in latest.items() if ent == entity and rec.op == "upsert"]
+        if ids:
+            for obj in model.query.options(*options()).filter(model.id.in_(ids)):
+                current[(entity, obj.id)] = obj
+
+    changes = []
+    for key, rec in latest.items():
+        entry = {"seq": rec.seq, "entity": rec.entity, "id": rec.entity_id, "maqam_id": rec.maqam_id}
+        obj = current.get(key)
+        if obj is None:
+            # Deleted (possibly by a change on a later page)
+            entry.update(op="delete", data=None)
+        else:
+            entry.update(op="upsert", data=_ENTITIES[rec.entity][1](obj))
+        changes.append(entry)
+    changes.sort(key=lambda c: c["seq"])
+    return changes, next_since, has_more
+
+
+def latest_change_seq():
+    return db.session.query(db.func.max(CatalogChange.seq)).scalar() or 0
+
+
+def record_baseline():
+    """Record an upsert for every maqam and audio (for catalogs that predate the feed)."""
+    rows = [_change_row("maqam", mid, "upsert", mid) for (mid,) in db.session.query(Maqam.id).order_by(Maqam.id)]
+    rows += [
+        _change_row("audio", aid, "upsert", mid)
+        for aid, mid in db.session.query(MaqamAudio.id, MaqamAudio.maqam_id).order_by(MaqamAudio.id)
+    ]
+    if rows:
+        db.session.execute(CatalogChange.__table__.insert(), rows)
@@ -0,0 +1,147 @@
+"""
+Contribution submission and review, shared by the per-item and batch endpoints.
+
+Batch operations validate every item on its own, persist the valid ones in a
+single bulk statement and report a result per item, so one bad payload does
+not discard the rest of a crowdsourcing session.
+"""
+
+import json
+from datetime import datetime
+
+from marshmallow import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models.contribution import MaqamContribution
+from models.maqam import Maqam
+from schemas import batch_contribution_schema, batch_review_schema
+from services.catalog_service import catalog_changed
+from services.merge_service import MergeConflict, apply_in_savepoint, is_mergeable
+
+# Largest number of items accepted by one batch request
+MAX_BATCH_SIZE = 500
+
+
+def contribution_row(maqam_id, validated, contributor_id, maqam_version=None):
+    """
+    Column values of a new pending contribution. A field_edit without a
+    base_version is based on maqam_version, the version it was proposed against.
+    """
+    payload = validated["payload"]
+    if validated["type"] == "field_edit" and payload.get("base_version") is None and maqam_version is not None:
+        payload = dict(payload, base_version=maqam_version)
+    return {
+        "maqam_id": maqam_id,
+        "type": validated["type"],
+        "payload_json": json.dumps(payload),
+        "status": "pending",
+        "contributor_id": contributor_id,
+    }
+
+
+def apply_review(contrib, status, reviewer=None):
+    """Record a review decision on a contribution (the caller commits)."""
+    contrib.status = status
+    contrib.reviewed_at = datetime.utcnow()
+    if reviewer:
+        contrib.reviewed_by = reviewer
+    if status == "accepted":
+        contrib.contributor_score = (contrib.contributor_score or 0) + 1
+
+
+def _validate_items(items, schema):
+    """Per-index validated items and per-index error results."""
+    valid, errors = {}, {}
+    for index, item in enumerate(items):
+        try:
+            valid[index] = schema.load(item)
+        except ValidationError as err:
+            errors[index] = {"index": index, "error": "Validation failed", "details": err.messages}
+    return valid, errors
+
+
+def submit_contributions(items, contributor_id):
+    """
+    Validate and store many contributions with one INSERT.
+
+    Returns one result per item, in order: {"index", "id", "status"} for stored
+    contributions and {"index", "error"[, "details"]} for rejected ones.
+    """
+    valid, results = _validate_items(items, batch_contribution_schema)
+
+    maqam_ids = {v["maqam_id"] for v in valid.values()}
+    versions = dict(
+        db.session.execute(select(Maqam.id, Maqam.version).where(Maqam.id.in_(maqam_ids))).all()
+    ) if maqam_ids else {}
+
+    indexes, rows = [], []
+    for index, validated in valid.items():
+        if validated["maqam_id"] not in versions:
+            results[index] = {"index": index, "error": "Maqam not found"}
+            continue
+        indexes.append(index)
+        rows.append(contribution_row(
+            validated["maqam_id"], validated, contributor_id, versions[validated["maqam_id"]]
+        ))
+
+    if rows:
+        stmt = insert(MaqamContribution).returning(MaqamContribution.id, sort_by_parameter_order=True)
+        ids = db.session.scalars(stmt, rows).all()
+        for index, contrib_id in zip(indexes, ids):
+            results[index] = {"index": index, "id": contrib_id, "status": "pending"}
+    return [results[i] for i in range(len(items))]
+
+
+def review_contributions(decisions, reviewer=None):
+    """
+    Apply many review decisions, flushed together with the caller's commit.
+
+    Contributions are loaded with one query. Accepted new_maqam and field_edit
+    contributions are merged into the catalog, each in its own savepoint so a
+    merge conflict or a database error only fails that decision, and the
+    derived catalog data is refreshed once for every maqam with an accepted
+    contribution. Returns one result per decision: {"index", "id", "status",
+    "contributor_score"} or {"index", "error"[, "details"]}.
+    """
+    valid, results = _validate_items(decisions, batch_review_schema)
+
+    ids = {v["id"] for v in valid.values()}
+    contribs = {
+        c.id: c for c in db.session.scalars(select(MaqamContribution).where(MaqamContribution.id.in_(ids)))
+    } if ids else {}
+
+    seen, accepted = set(), []
+    for index, validated in valid.items():
+        contrib = contribs.get(validated["id"])
+        if contrib is None:
+            results[index] = {"index": index, "error": "Contribution not found"}
+            continue
+        if contrib.id in seen:
+            results[index] = {"index": index, "error": "Contribution reviewed twice in this batch"}
+            continue
+        seen.add(contrib.id)
+        if validated["status"] == "accepted" and is_mergeable(contrib):
+            try:
+                apply_in_savepoint(contrib, before=lambda: apply_review(contrib, "accepted", reviewer))
+            except MergeConflict as exc:
+                results[index] = {"index": index, "id": contrib.id, "error": "Merge conflict", "details": str(exc)}
+                continue
+            except (SQLAlchemyError, ValueError) as exc:
+                results[index] = {"index": index, "id": contrib.id, "error": "Merge failed", "details": str(exc)}
+                continue
+        else:
+            apply_review(contrib, validated["status"], reviewer)
+        if contrib.status == "accepted":
+            accepted.append(contrib.maqam_id)
+        results[index] = {
+            "index": index,
+            "id": contrib.id,
+            "status": contrib.status,
+            "contributor_score": contrib.contributor_score,
+        }
+
+    if accepted:
+        catalog_changed(updated_ids=sorted({m for m in accepted if m is not None}))
+    return [results[i] for i in range(len(decisions))]
@@ -0,0 +1,174 @@
+import re
+import json
+import random
+import hashlib
+
+from sqlalchemy import and_, or_, select
+
+from extensions import db
+from models.maqam import Maqam
+from models.maqam_lsh_bucket import MaqamLshBucket
+from services.analysis_service import normalize_note
+from services.arabic_text import fold_arabic
+
+# MinHash / LSH parameters: 32 bands x 4 rows gives a ~0.42 Jaccard threshold
+NUM_PERM = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Exact Jaccard similarity at which a candidate is reported as a likely duplicate
+DUPLICATE_THRESHOLD = 0.5
+MAX_DUPLICATES = 5
+
+# Maqamet loaded at a time when the whole index is rebuilt
+REBUILD_BATCH_SIZE = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def _normalize_name(name):
+    return re.sub(r"[\W_]+", "", fold_arabic(name))
+
+
+def _char_ngrams(text, n=3):
+    if not text:
+        return set()
+    padded = f"^{text}$"
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+def maqam_shingles(name_en, name_ar, ajnas):
+    """Shingle set of a maqam: name trigrams plus jins names and note sets."""
+    shingles = {f"n:{g}" for g in _char_ngrams(_normalize_name(name_en))}
+    shingles |= {f"a:{g}" for g in _char_ngrams(_normalize_name(name_ar))}
+    for jins in ajnas or []:
+        if not isinstance(jins, dict):
+            continue
+        nm = jins.get("name")
+        if isinstance(nm, dict):
+            nm = nm.get("en") or nm.get("ar")
+        if isinstance(nm, str) and nm.strip():
+            shingles.add(f"j:{_normalize_name(nm)}")
+        notes = jins.get("notes")
+        if isinstance(notes, dict):
+            notes = notes.get("en", [])
+        note_set = sorted({normalize_note(n) for n in notes or [] if normalize_note(n)})
+        if note_set:
+            shingles.add("s:" + ",".join(note_set))
+    return shingles
+
+
+def _shingles_of(m):
+    try:
+        ajnas = json.loads(m.ajnas_json) if m.ajnas_json else []
+    except (TypeError, ValueError):
+        ajnas = []
+    return maqam_shingles(m.name_en, m.name_ar, ajnas)
+
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash_signature(shingles):
+    """MinHash signature of a shingle set under NUM_PERM universal hash permutations."""
+    hashes = [_hash64(s) for s in shingles]
+    if not hashes:
+        return []
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature):
+    """(band, bucket) keys of a signature; empty signatures are never indexed."""
+    if not signature:
+        return []
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(",".join(map(str, rows)).encode("ascii"), digest_size=8).hexdigest()
+        buckets.append((band, digest))
+    return buckets
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _index_rows(maqamet):
+    return [
+        {"band": band, "bucket": bucket, "maqam_id": m.id}
+        for m in maqamet
+        for band, bucket in band_buckets(minhash_signature(_shingles_of(m)))
+    ]
+
+
+def rebuild_lsh_index(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute LSH buckets for the whole catalog, batch_size maqamet at a time."""
+    MaqamLshBucket.query.delete(synchronize_session=False)
+    columns = (Maqam.id, Maqam.name_en, Maqam.name_ar, Maqam.ajnas_json)
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(*columns).where(Maqam.id > last_id).order_by(Maqam.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return
+        rows = _index_rows(batch)
+        if rows:
+            db.session.execute(MaqamLshBucket.__table__.insert(), rows)
+        last_id = batch[-1].id
+
+
+def refresh_lsh_index(updated_ids=(), deleted_ids=()):
+    """Re-bucket written maqamet and drop deleted ones from the index."""
+    ids = {i for i in list(updated_ids) + list(deleted_ids) if i is not None}
+    if not ids:
+        return
+    MaqamLshBucket.query.filter(MaqamLshBucket.maqam_id.in_(ids)).delete(synchronize_session=False)
+    updated = {i for i in updated_ids if i is not None} - set(deleted_ids)
+    if updated:
+        rows = _index_rows(Maqam.query.filter(Maqam.id.in_(updated)).all())
+        if rows:
+            db.session.execute(MaqamLshBucket.__table__.insert(), rows)
+
+
+def find_duplicates(name_en, name_ar, ajnas):
+    """
+    Catalog maqamet that look like near-duplicates of a proposal.
+
+    Only maqamet sharing at least one LSH bucket with the proposal are loaded,
+    then ranked by exact shingle Jaccard similarity.
+    """
+    shingles = maqam_shingles(name_en, name_ar, ajnas)
+    keys = band_buckets(minhash_signature(shingles))
+    if not keys:
+        return []
+
+    if db.session.query(MaqamLshBucket.maqam_id).first() is None:
+        if db.session.query(Maqam.id).first() is None:
+            return []
+        rebuild_lsh_index()
+
+    candidate_ids = {
+        row.maqam_id
+        for row in db.session.query(MaqamLshBucket.maqam_id).filter(
+            or_(*[and_(MaqamLshBucket.band == band, MaqamLshBucket.bucket == bucket) for band, bucket in keys])
+        ).distinct()
+    }
+    if not candidate_ids:
+        return []
+
+    duplicates = []
+    for m in Maqam.query.filter(Maqam.id.in_(candidate_ids)).all():
+        score = _jaccard(shingles, _shingles_of(m))
+        if score >= DUPLICATE_THRESHOLD:
+            duplicates.append({"maqam_id": m.id, "name_en": m.name_en, "similarity": round(score, 3)})
+    duplicates.sort(key=lambda d: d["similarity"], reverse=True)
+    return duplicates[:MAX_DUPLICATES]
@@ -0,0 +1,151 @@
+"""
+Flashcard decks compiled once per catalog version.
+
+Every maqam yields one card per topic (emotion, region, usage, ajnas). The
+JSON columns are decoded once when the decks are compiled, and each card is
+kept in its bilingual form and in the English-only and Arabic-only forms, so
+a request only filters by level and slices a page. The pages themselves are
+served as catalog snapshots (pre-serialized bytes with an ETag).
+"""
+
+import json
+from bisect import bisect_right
+
+from sqlalchemy import select
+
+from extensions import db
+from models.maqam import Maqam
+from services.cache_service import get_cache
+from services.catalog_service import current_catalog_version
+
+FLASHCARD_TOPICS = ("emotion", "region", "usage", "ajnas")
+FLASHCARD_LEVELS = ("beginner", "intermediate", "advanced")
+FLASHCARD_LANGS = ("en", "ar")
+
+
+def _json_list(value):
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def _jins_names(ajnas_json):
+    """(en, ar) names of the first two ajnas, "" where missing."""
+    names = []
+    for a in _json_list(ajnas_json)[:2]:
+        nm = a.get("name", {}) if isinstance(a, dict) else None
+        if isinstance(nm, dict):
+            names.append((nm.get("en", "") or "", nm.get("ar", "") or ""))
+        else:
+            names.append((str(nm) if nm else "", ""))
+    names += [("", "")] * (2 - len(names))
+    return names
+
+
+def _back(first, second):
+    return first + (f" / {second}" if second else "")
+
+
+def _cards(row):
+    """{topic: (bilingual card, back in Arabic)} of one maqam."""
+    regions_en = _json_list(row.regions_json)
+    regions_ar = _json_list(row.regions_ar_json)
+    usages_en = [u.strip() for u in (row.usage or "").split(",") if u.strip()]
+    usages_ar = [row.usage_ar.strip()] if row.usage_ar else []
+    (first_en, first_ar), (second_en, second_ar) = _jins_names(row.ajnas_json)
+    common = {
+        "name_en": row.name_en,
+        "name_ar": row.name_ar,
+        "emotion_en": row.emotion,
+        "emotion_ar": row.emotion_ar,
+    }
+    level = row.difficulty_label
+    return {
+        "emotion": (
+            dict(common, regions_en=regions_en, regions_ar=regions_ar,
+                 back=[row.emotion] if row.emotion else [], level=level),
+            [row.emotion_ar] if row.emotion_ar else [],
+        ),
+        "region": (
+            dict(common, usage_en=row.usage, usage_ar=row.usage_ar, regions_en=regions_en,
+                 regions_ar=regions_ar, back=regions_en, level=level),
+            regions_ar,
+        ),
+        "usage": (
+            dict(common, usage_en=", ".join(usages_en), usage_ar_list=usages_ar, regions_en=regions_en,
+                 regions_ar=regions_ar, back=usages_en, level=level),
+            usages_ar,
+        ),
+        "ajnas": (
+            {"name_en": row.name_en, "name_ar": row.name_ar,
+             "first_jins_en": first_en, "first_jins_ar": first_ar,
+             "second_jins_en": second_en, "second_jins_ar": second_ar,
+             "back": _back(first_en, second_en), "level": level},
+            _back(first_ar, second_ar),
+        ),
+    }
+
+
+def _localized(card, lang, back_ar):
+    """The card with only the fields of one language ("back" follows the language)."""
+    if lang == "en":
+        return {k: v for k, v in card.items() if "_ar" not in k}
+    card = {k: v for k, v in card.items() if "_en" not in k}
+    card["back"] = back_ar
+    return card
+
+
+class FlashcardDecks:
+    """
+    The cards of every topic, ordered by maqam id, in each language form
+    (None for bilingual cards), with the maqam ids and levels alongside for
+    filtering and keyset pagination.
+    """
+
+    def __init__(self, rows):
+        self.cards = {(topic, lang): [] for topic in FLASHCARD_TOPICS for lang in (None,) + FLASHCARD_LANGS}
+        self.ids = []
+        self.levels = []
+        for row in rows:
+            self.ids.append(row.id)
+            self.levels.append((row.difficulty_label or "").strip().lower())
+            for topic, (card, back_ar) in _cards(row).items():
+                self.cards[(topic, None)].append(card)
+                for lang in FLASHCARD_LANGS:
+                    self.cards[(topic, lang)].append(_localized(card, lang, back_ar))
+
+    def page(self, topic, level=None, lang=None, limit=None, after_id=None):
+        """
+        (cards, id of the last card when more follow) of one deck, for one
+        level (None for all) after a maqam id.
+        """
+        deck = self.cards[(topic, lang)]
+        start = bisect_right(self.ids, after_id) if after_id is not None else 0
+        picked, last_id = [], None
+        for index in range(start, len(deck)):
+            if level is not None and self.levels[index] != level:
+                continue
+            if limit is not None and len(picked) == limit:
+                return picked, last_id
+            picked.append(deck[index])
+            last_id = self.ids[index]
+        return picked, None
+
+
+_DECK_COLUMNS = (
+    Maqam.id, Maqam.name_en, Maqam.name_ar, Maqam.emotion, Maqam.emotion_ar, Maqam.usage, Maqam.usage_ar,
+    Maqam.regions_json, Maqam.regions_ar_json, Maqam.ajnas_json, Maqam.difficulty_label,
+)
+
+
+def get_flashcard_decks():
+    """The FlashcardDecks of the current catalog version."""
+    version = current_catalog_version()
+    cache = get_cache("flashcard_decks", 2)
+    decks = cache.get(version)
+    if decks is None:
+        decks = FlashcardDecks(db.session.execute(select(*_DECK_COLUMNS).order_by(Maqam.id)).all())
+        cache.put(version, decks)
+    return decks
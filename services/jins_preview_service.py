@@ -0,0 +1,217 @@
+"""
+Synthesized audio previews of ajnas, for maqamet without a recording.
+
+The notes of a jins (e.g. "E-half-flat" or "مي نصف مخفوضة") are mapped onto
+a 24-tone equal-tempered (quarter-tone) table and rendered with NumPy as a
+plucked tone per note. Previews are keyed by a digest of their pitches, so
+identical ajnas share one rendering; rendered WAV bytes are kept in a
+byte-bounded LRU and written to JINS_PREVIEW_DIR, where `flask catalog
+render-previews` can produce them ahead of time.
+"""
+
+import io
+import os
+import re
+import json
+import wave
+import hashlib
+import tempfile
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models.maqam import Maqam
+from services.cache_service import get_cache
+
+SAMPLE_RATE = 22050
+NOTE_SECONDS = 0.45
+FINAL_NOTE_SECONDS = 1.2
+# Bump when the synthesis changes so stored previews are re-rendered
+SYNTH_VERSION = 1
+
+# Quarter tones above C of each natural note, and accidental offsets
+_NATURALS = {"C": 0, "D": 4, "E": 8, "F": 10, "G": 14, "A": 18, "B": 22}
+_NATURALS_AR = {"دو": "C", "ري": "D", "مي": "E", "فا": "F", "صول": "G", "لا": "A", "سي": "B"}
+_ACCIDENTALS = {"": 0, "half-flat": -1, "flat": -2, "b": -2, "half-sharp": 1, "sharp": 2, "#": 2}
+_ACCIDENTALS_AR = {"": 0, "نصف مخفوضة": -1, "مخفوضة": -2, "نصف مرفوعة": 1, "مرفوعة": 2}
+_NOTE_EN = re.compile(r"^([A-G])(?:-?(half-flat|half-sharp|flat|sharp|b|#))?(\d)?$", re.IGNORECASE)
+
+# Frequencies of the 24 quarter tones of the octave starting at middle C (C4, A4 = 440 Hz)
+QUARTER_TONE_FREQUENCIES = 440.0 * 2 ** ((np.arange(24) - 18) / 24)
+
+# Relative strengths of the harmonics of the plucked tone
+_HARMONICS = np.array([1.0, 0.5, 0.3, 0.15, 0.08])
+
+
+class JinsNotFound(Exception):
+    """The maqam or jins does not exist, or its notes cannot be played."""
+
+
+def note_step(name):
+    """
+    Quarter tones above C of a note name, plus the octave when it is given
+    (e.g. "B-half-flat" -> (21, None), "G4" -> (14, 4)). Raises ValueError.
+    """
+    name = name.strip()
+    match = _NOTE_EN.match(name)
+    if match:
+        letter, accidental, octave = match.groups()
+        step = _NATURALS[letter.upper()] + _ACCIDENTALS[(accidental or "").lower()]
+        return step, int(octave) if octave else None
+    for natural, letter in _NATURALS_AR.items():
+        if name == natural or name.startswith(natural + " "):
+            accidental = name[len(natural):].strip()
+            if accidental in _ACCIDENTALS_AR:
+                return _NATURALS[letter] + _ACCIDENTALS_AR[accidental], None
+    raise ValueError(f"unknown note: {name!r}")
+
+
+def jins_pitches(notes):
+    """
+    Absolute pitches (quarter tones above C4) of a sequence of note names.
+    Notes without an octave are placed closest to the previous note, so a
+    descending jins such as G F E-half-flat D C stays descending.
+    """
+    pitches = []
+    for name in notes:
+        step, octave = note_step(name)
+        if octave is not None:
+            pitch = step + (octave - 4) * 24
+        elif not pitches:
+            pitch = step
+        else:
+            previous = pitches[-1]
+            pitch = min((step + 24 * k for k in range(-3, 4)), key=lambda p: abs(p - previous))
+        pitches.append(pitch)
+    return pitches
+
+
+def frequency(pitch):
+    octave, step = divmod(pitch, 24)
+    return float(QUARTER_TONE_FREQUENCIES[step] * 2.0 ** octave)
+
+
+def _tone(freq, seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    partials = np.arange(1, len(_HARMONICS) + 1)[:, None]
+    wave_ = (_HARMONICS[:, None] * np.sin(2 * np.pi * freq * partials * t)).sum(axis=0)
+    # Fast attack, exponential decay and a short release so notes join without clicks
+    attack, release = int(0.01 * SAMPLE_RATE), int(0.04 * SAMPLE_RATE)
+    envelope = np.exp(-3.0 * t)
+    envelope[:attack] *= np.linspace(0.0, 1.0, attack)
+    envelope[-release:] *= np.linspace(1.0, 0.0, release)
+    return wave_ * envelope
+
+
+def render_wav(pitches):
+    """Mono 16-bit WAV bytes playing the pitches in sequence."""
+    durations = [NOTE_SECONDS] * (len(pitches) - 1) + [FINAL_NOTE_SECONDS]
+    signal = np.concatenate([_tone(frequency(p), d) for p, d in zip(pitches, durations)])
+    signal *= 0.8 / max(float(np.max(np.abs(signal))), 1e-9)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((signal * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def preview_key(pitches):
+    payload = json.dumps({"v": SYNTH_VERSION, "rate": SAMPLE_RATE, "pitches": pitches})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _preview_path(key):
+    return os.path.join(current_app.config["JINS_PREVIEW_DIR"], f"{key}.wav")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".preview-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _parse_ajnas(ajnas_json):
+    try:
+        ajnas = json.loads(ajnas_json) if ajnas_json else []
+    except (TypeError, ValueError):
+        return []
+    return ajnas if isinstance(ajnas, list) else []
+
+
+def _ajnas_pitches(ajnas, index):
+    if not 0 <= index < len(ajnas) or not isinstance(ajnas[index], dict):
+        raise JinsNotFound("Jins not found")
+    notes = ajnas[index].get("notes") or {}
+    if isinstance(notes, dict):
+        notes = notes.get("en") or notes.get("ar")
+    if not notes:
+        raise JinsNotFound("Jins has no notes")
+    try:
+        return jins_pitches(notes)
+    except (AttributeError, TypeError, ValueError) as exc:
+        raise JinsNotFound(f"Jins notes cannot be played: {exc}")
+
+
+def preview_for_pitches(pitches):
+    """
+    (key, WAV bytes) for pitches from the memory cache, the preview
+    directory or a fresh rendering, which is stored in both.
+    """
+    key = preview_key(pitches)
+    cache = get_cache(
+        "jins_previews", current_app.config["JINS_PREVIEW_CACHE_SIZE"], catalog_bound=False,
+        max_bytes=current_app.config["JINS_PREVIEW_CACHE_BYTES"],
+    )
+    data = cache.get(key)
+    if data is not None:
+        return key, data
+    path = _preview_path(key)
+    if os.path.exists(path):
+        with open(path, "rb") as fh:
+            data = fh.read()
+    else:
+        data = render_wav(pitches)
+        _write_atomic(path, data)
+    cache.put(key, data)
+    return key, data
+
+
+def jins_preview(maqam_id, index):
+    """(key, WAV bytes) of the index-th jins of a maqam; raises JinsNotFound."""
+    ajnas_json = db.session.execute(select(Maqam.ajnas_json).where(Maqam.id == maqam_id)).first()
+    if ajnas_json is None:
+        raise JinsNotFound("Maqam not found")
+    return preview_for_pitches(_ajnas_pitches(_parse_ajnas(ajnas_json[0]), index))
+
+
+def render_all_previews():
+    """
+    Render the preview of every jins in the catalog that is not stored yet.
+    Returns {"rendered", "stored", "unplayable"} counts.
+    """
+    counts = {"rendered": 0, "stored": 0, "unplayable": 0}
+    for ajnas_json in db.session.scalars(select(Maqam.ajnas_json).order_by(Maqam.id)):
+        ajnas = _parse_ajnas(ajnas_json)
+        for index in range(len(ajnas)):
+            try:
+                pitches = _ajnas_pitches(ajnas, index)
+            except JinsNotFound:
+                counts["unplayable"] += 1
+                continue
+            if os.path.exists(_preview_path(preview_key(pitches))):
+                counts["stored"] += 1
+            else:
+                preview_for_pitches(pitches)
+                counts["rendered"] += 1
+    return counts
@@ -0,0 +1,134 @@
+"""
+Contributor leaderboard backed by the contributor_stat table.
+
+Every flush that accepts, un-accepts, re-scores or deletes a contribution
+applies the difference to its contributor's row in the same transaction, so
+the leaderboard is a top-N scan of the ranking index instead of an aggregate
+over every contribution.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.contribution import MaqamContribution
+from models.contributor_stat import ContributorStat
+
+LEADERBOARD_SIZE = 20
+
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def leaderboard(limit=LEADERBOARD_SIZE):
+    """Contributors ranked by accepted contributions, then by total score."""
+    return (
+        ContributorStat.query
+        .filter(ContributorStat.accepted_count > 0)
+        .order_by(ContributorStat.accepted_count.desc(), ContributorStat.total_score.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def rebuild_contributor_stats():
+    """Recompute every contributor's totals from the contributions table (the caller commits)."""
+    db.session.execute(delete(ContributorStat))
+    totals = (
+        select(
+            MaqamContribution.contributor_id,
+            func.count(MaqamContribution.id),
+            func.coalesce(func.sum(MaqamContribution.contributor_score), 0),
+            func.current_timestamp(),
+        )
+        .where(MaqamContribution.status == "accepted", MaqamContribution.contributor_id.isnot(None))
+        .group_by(MaqamContribution.contributor_id)
+    )
+    db.session.execute(
+        ContributorStat.__table__.insert().from_select(
+            ["contributor_id", "accepted_count", "total_score", "updated_at"], totals
+        )
+    )
+    return db.session.query(func.count(ContributorStat.contributor_id)).scalar()
+
+
+def _previous(state, attr):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+def _share(contributor_id, status, score):
+    """What one contribution adds to its contributor's totals."""
+    if contributor_id is None or status != "accepted":
+        return None
+    return contributor_id, 1, score or 0
+
+
+def _upsert(conn, contributor_id, count, score, now):
+    make_insert = _UPSERT_INSERTS.get(conn.dialect.name)
+    if make_insert is not None:
+        stmt = make_insert(ContributorStat.__table__).values(
+            contributor_id=contributor_id, accepted_count=count, total_score=score, updated_at=now,
+        )
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=["contributor_id"],
+            set_={
+                "accepted_count": ContributorStat.__table__.c.accepted_count + stmt.excluded.accepted_count,
+                "total_score": ContributorStat.__table__.c.total_score + stmt.excluded.total_score,
+                "updated_at": now,
+            },
+        ))
+        return
+    updated = conn.execute(
+        update(ContributorStat.__table__)
+        .where(ContributorStat.__table__.c.contributor_id == contributor_id)
+        .values(
+            accepted_count=ContributorStat.__table__.c.accepted_count + count,
+            total_score=ContributorStat.__table__.c.total_score + score,
+            updated_at=now,
+        )
+    ).rowcount
+    if not updated:
+        conn.execute(ContributorStat.__table__.insert().values(
+            contributor_id=contributor_id, accepted_count=count, total_score=score, updated_at=now,
+        ))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_contributor_stats(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0])
+
+    def apply(share, sign):
+        if share:
+            contributor_id, count, score = share
+            deltas[contributor_id][0] += sign * count
+            deltas[contributor_id][1] += sign * score
+
+    for obj in session.new:
+        if isinstance(obj, MaqamContribution):
+            apply(_share(obj.contributor_id, obj.status, obj.contributor_score), 1)
+    for obj in session.dirty:
+        if isinstance(obj, MaqamContribution) and session.is_modified(obj):
+            state = inspect(obj)
+            apply(_share(_previous(state, "contributor_id"), _previous(state, "status"),
+                         _previous(state, "contributor_score")), -1)
+            apply(_share(obj.contributor_id, obj.status, obj.contributor_score), 1)
+    for obj in session.deleted:
+        if isinstance(obj, MaqamContribution):
+            state = inspect(obj)
+            apply(_share(_previous(state, "contributor_id"), _previous(state, "status"),
+                         _previous(state, "contributor_score")), -1)
+
+    changed = {c: d for c, d in deltas.items() if d != [0, 0]}
+    if not changed:
+        return
+    conn = session.connection()
+    now = datetime.now(timezone.utc)
+    for contributor_id in sorted(changed):
+        count, score = changed[contributor_id]
+        _upsert(conn, contributor_id, count, score, now)
@@ -0,0 +1,168 @@
+"""
+Merge pipeline: applies accepted contributions to the maqam catalog.
+
+new_maqam contributions create the proposed maqam and field_edit
+contributions set one column. Maqam rows carry a version column checked on
+every UPDATE, so an edit racing another writer fails with MergeConflict at
+flush time instead of holding row locks while the review runs; a field edit
+proposed against an older version than the current one conflicts as well.
+"""
+
+import json
+from datetime import datetime
+
+from marshmallow import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+
+from extensions import db
+from models.contribution import MaqamContribution
+from models.maqam import EDITABLE_COLUMNS, Maqam
+from schemas import check_field_value, new_maqam_schema
+from services.catalog_service import catalog_changed
+
+MERGEABLE_TYPES = ("new_maqam", "field_edit")
+APPLY_BATCH_SIZE = 200
+
+
+class MergeConflict(Exception):
+    """A contribution cannot be applied to the current catalog."""
+
+
+def is_mergeable(contrib):
+    return contrib.type in MERGEABLE_TYPES and contrib.applied_at is None
+
+
+def _new_maqam(payload):
+    try:
+        data = new_maqam_schema.load(payload)
+    except ValidationError as err:
+        raise MergeConflict(f"invalid new_maqam payload: {err.messages}")
+    exists = db.session.scalar(
+        select(Maqam.id).where(func.lower(Maqam.name_en) == data["name_en"].strip().lower()).limit(1)
+    )
+    if exists is not None:
+        raise MergeConflict(f"a maqam named {data['name_en']!r} already exists")
+    maqam = Maqam(
+        name_en=data["name_en"],
+        name_ar=data["name_ar"],
+        emotion=data["emotion"],
+        usage=data["usage"],
+        regions_json=json.dumps(data["regions"]) if data["regions"] else None,
+        ajnas_json=json.dumps(data["ajnas"]) if data["ajnas"] else None,
+        description_en=data["description_en"],
+        description_ar=data["description_ar"],
+    )
+    db.session.add(maqam)
+    db.session.flush()
+    return maqam
+
+
+def _field_edit(contrib, payload):
+    field = payload.get("field")
+    if field not in EDITABLE_COLUMNS:
+        raise MergeConflict(f"field {field!r} cannot be edited")
+    maqam = db.session.get(Maqam, contrib.maqam_id) if contrib.maqam_id else None
+    if maqam is None:
+        raise MergeConflict("maqam no longer exists")
+    base_version = payload.get("base_version")
+    if base_version is not None and base_version != maqam.version:
+        raise MergeConflict(
+            f"maqam changed since the edit was proposed (version {base_version}, now {maqam.version})"
+        )
+    try:
+        value = check_field_value(field, payload.get("new_value"))
+    except ValidationError as err:
+        raise MergeConflict(f"invalid new_value: {err.messages}")
+    setattr(maqam, field, value)
+    return maqam
+
+
+def apply_contribution(contrib):
+    """
+    Merge one accepted contribution into the catalog and flush it.
+
+    Returns the affected maqam id. Raises MergeConflict when the contribution
+    does not fit the catalog (including values the database rejects on
+    flush) or the maqam was changed since; callers run this in a savepoint
+    so a conflict only discards this contribution.
+    """
+    try:
+        payload = json.loads(contrib.payload_json)
+    except (TypeError, ValueError):
+        raise MergeConflict("payload is not valid JSON")
+    if not isinstance(payload, dict):
+        raise MergeConflict("payload must be an object")
+
+    try:
+        if contrib.type == "new_maqam":
+            maqam = _new_maqam(payload)
+            contrib.maqam_id = maqam.id
+        elif contrib.type == "field_edit":
+            maqam = _field_edit(contrib, payload)
+        else:
+            raise MergeConflict(f"contributions of type {contrib.type!r} are not merged automatically")
+        contrib.applied_at = datetime.utcnow()
+        db.session.flush()
+    except StaleDataError:
+        raise MergeConflict("maqam was modified concurrently; retry")
+    except SQLAlchemyError as exc:
+        raise MergeConflict(f"contribution cannot be stored: {getattr(exc, 'orig', None) or exc}")
+    return maqam.id
+
+
+def apply_in_savepoint(contrib, before=None):
+    """
+    Run before() (e.g. recording the review) and merge contrib in a savepoint.
+
+    Returns the affected maqam id. On MergeConflict (or any other error) the
+    savepoint, and everything before() did, is rolled back and the error
+    re-raised.
+    """
+    savepoint = db.session.begin_nested()
+    try:
+        if before is not None:
+            before()
+        maqam_id = apply_contribution(contrib)
+    except Exception:
+        savepoint.rollback()
+        raise
+    savepoint.commit()
+    return maqam_id
+
+
+def apply_accepted(limit=None, batch_size=APPLY_BATCH_SIZE):
+    """
+    Merge every accepted contribution that has not been applied yet, oldest first.
+
+    Each batch is committed together with one refresh of the derived catalog
+    data. Returns {"applied": n, "conflicts": [{"id", "error"}, ...]}.
+    """
+    applied, conflicts, skipped = 0, [], set()
+    while limit is None or applied + len(conflicts) < limit:
+        size = batch_size if limit is None else min(batch_size, limit - applied - len(conflicts))
+        query = select(MaqamContribution).where(
+            MaqamContribution.status == "accepted",
+            MaqamContribution.applied_at.is_(None),
+            MaqamContribution.type.in_(MERGEABLE_TYPES),
+        )
+        if skipped:
+            query = query.where(MaqamContribution.id.notin_(skipped))
+        batch = db.session.scalars(
+            query.order_by(MaqamContribution.created_at, MaqamContribution.id).limit(size)
+        ).all()
+        if not batch:
+            break
+        updated = set()
+        for contrib in batch:
+            try:
+                updated.add(apply_in_savepoint(contrib))
+                applied += 1
+            except MergeConflict as exc:
+                skipped.add(contrib.id)
+                conflicts.append({"id": contrib.id, "error": str(exc)})
+        if updated:
+            catalog_changed(updated_ids=sorted(updated))
+        db.session.commit()
+    return {"applied": applied, "conflicts": conflicts}
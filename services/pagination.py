@@ -0,0 +1,43 @@
+import base64
+import json
+
+from flask import url_for
+
+
+def encode_cursor(position):
+    """Opaque, URL-safe cursor for a keyset position (a small JSON-able dict)."""
+    raw = json.dumps(position, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(position, dict):
+        raise ValueError("invalid cursor")
+    return position
+
+
+def parse_limit(value, default=None, maximum=200):
+    """Parse a ?limit= value; None means unlimited when there is no default."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("limit must be an integer") from exc
+    if not 1 <= limit <= maximum:
+        raise ValueError(f"limit must be between 1 and {maximum}")
+    return limit
+
+
+def next_page_headers(endpoint, args, next_cursor):
+    """X-Next-Cursor and Link: rel="next" headers for the page after this one."""
+    if not next_cursor:
+        return {}
+    url = url_for(endpoint, **{**{k: v for k, v in args.items() if v not in (None, "")}, "cursor": next_cursor})
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{url}>; rel="next"'}
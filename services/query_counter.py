@@ -0,0 +1,35 @@
+from flask import g, has_app_context
+from sqlalchemy import event
+
+from extensions import db
+
+
+def init_query_counter(app):
+    """
+    Count SQL statements issued while handling each request.
+
+    The count is available as query_count() during the request and, when
+    SQL_QUERY_COUNT_HEADER is enabled, returned in the X-SQL-Queries header.
+    """
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _count_statement)
+
+    @app.before_request
+    def _reset_query_count():
+        g.sql_statements = 0
+
+    @app.after_request
+    def _query_count_header(response):
+        if app.config.get("SQL_QUERY_COUNT_HEADER"):
+            response.headers["X-SQL-Queries"] = str(query_count())
+        return response
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and "sql_statements" in g:
+        g.sql_statements += 1
+
+
+def query_count():
+    """SQL statements issued so far in the current request."""
+    return g.get("sql_statements", 0)
@@ -0,0 +1,363 @@
+"""
+Quiz question generation and signed, stateless quiz tokens.
+
+Every question is derived from a maqam, a question kind and a random
+generator, so a quiz can be rebuilt from its seed and maqam ids. The facts
+and distractor pools are compiled once per catalog version (QuizCatalog),
+and a quiz only builds the questions it samples. A quiz token is a JWT
+(signed with JWT_SECRET, audience "quiz") carrying that descriptor plus an
+HMAC of each correct answer: any node can grade it without storing the
+quiz, and the answers never leave the server in the clear.
+"""
+
+import hmac
+import json
+import random
+import time
+import hashlib
+import uuid
+from datetime import datetime, timezone
+
+import jwt
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.maqam import Maqam
+from models.quiz_answer import QuizAnswer
+from services.cache_service import get_cache
+from services.catalog_service import current_catalog_version
+
+QUESTION_KINDS = ("emotion", "region", "usage", "ajnas")
+# Token audience, so quiz tokens and access tokens are never accepted for each other
+QUIZ_TOKEN_AUDIENCE = "quiz"
+# Hex digits of each answer HMAC kept in the token
+ANSWER_HASH_LENGTH = 12
+
+
+class QuizTokenError(Exception):
+    """A quiz token is tampered with, malformed or issued to another user."""
+
+
+class QuizTokenExpired(QuizTokenError):
+    """A quiz token is past its expiry."""
+
+
+def _json_list(value):
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def maqam_regions(regions_json):
+    return [r for r in _json_list(regions_json) if isinstance(r, str) and r]
+
+
+def maqam_usages(usage):
+    return [u.strip() for u in (usage or "").split(",") if u.strip()]
+
+
+def maqam_ajnas_names(ajnas_json):
+    names = []
+    for a in _json_list(ajnas_json):
+        nm = a.get("name") if isinstance(a, dict) else None
+        if isinstance(nm, dict):
+            nm = nm.get("en") or nm.get("ar")
+        if isinstance(nm, str) and nm:
+            names.append(nm)
+    return names
+
+
+class QuizFacts:
+    """
+    The answer of each question kind about one maqam (None when it has no
+    such question) and the explanation shown with graded answers.
+    """
+
+    __slots__ = ("id", "name_en", "answers", "explanation")
+
+    def __init__(self, maqam_id, name_en, answers, explanation):
+        self.id = maqam_id
+        self.name_en = name_en
+        self.answers = answers
+        self.explanation = explanation
+
+
+# Explanation of a question whose maqam is no longer in the catalog
+_MISSING_EXPLANATION = {"maqam_en": None, "emotion_en": None, "regions": [], "usage": None}
+
+
+class QuizCatalog:
+    """
+    Everything quiz generation needs from the catalog, compiled once per
+    catalog version: the facts per maqam, the distinct values of each kind
+    across the catalog (the distractor pools) and every (maqam, kind) pair
+    that has a question.
+    """
+
+    def __init__(self, rows):
+        self.facts = []
+        pools = {"region": {}, "usage": {}, "ajnas": {}}
+        for row in rows:
+            values = {
+                "region": maqam_regions(row.regions_json),
+                "usage": maqam_usages(row.usage),
+                "ajnas": maqam_ajnas_names(row.ajnas_json),
+            }
+            answers = {"emotion": row.emotion or None}
+            for kind, found in values.items():
+                pools[kind].update(dict.fromkeys(found))
+                answers[kind] = found[0] if found else None
+            explanation = {
+                "maqam_en": row.name_en,
+                "emotion_en": row.emotion,
+                "regions": _json_list(row.regions_json),
+                "usage": row.usage,
+            }
+            self.facts.append(QuizFacts(row.id, row.name_en, answers, explanation))
+        self.by_id = {f.id: f for f in self.facts}
+        self.pools = {kind: list(values) for kind, values in pools.items()}
+        self.slots = [(f, kind) for f in self.facts for kind in QUESTION_KINDS if f.answers[kind]]
+
+
+_CATALOG_COLUMNS = (Maqam.id, Maqam.name_en, Maqam.emotion, Maqam.usage, Maqam.regions_json, Maqam.ajnas_json)
+
+
+def get_quiz_catalog():
+    """The QuizCatalog of the current catalog version."""
+    version = current_catalog_version()
+    cache = get_cache("quiz_catalog", 2)
+    compiled = cache.get(version)
+    if compiled is None:
+        compiled = QuizCatalog(db.session.execute(select(*_CATALOG_COLUMNS).order_by(Maqam.id)).all())
+        cache.put(version, compiled)
+    return compiled
+
+
+def build_mcq_choices(correct, pool, k=3, rng=random):
+    pool = [p for p in pool if p and p != correct]
+    pool = list(dict.fromkeys(pool))
+    distractors = rng.sample(pool, k=min(k, len(pool)))
+    choices = [correct] + distractors
+    choices = list(dict.fromkeys(choices))
+    rng.shuffle(choices)
+    return choices
+
+
+def sample_choices(correct, pool, k=3, rng=random):
+    """
+    The correct answer and up to k distractors from a pool of distinct
+    values, shuffled. Draws k + 1 values instead of filtering the pool, so the
+    cost does not grow with the catalog.
+    """
+    picks = rng.sample(pool, k=min(k + 1, len(pool)))
+    choices = [correct] + [p for p in picks if p != correct][:k]
+    rng.shuffle(choices)
+    return choices
+
+
+_PROMPTS = {
+    "emotion": "What is the main emotion of {}?",
+    "region": "In which region is {} mainly used?",
+    "usage": "Select a typical usage of {}.",
+    "ajnas": "Which jins (ajnas) is part of {}?",
+}
+
+
+def build_question(facts, kind, pools, rng=random):
+    """The question of the given kind about a maqam's QuizFacts, or None when it lacks the data."""
+    answer = facts.answers[kind]
+    if not answer:
+        return None
+    question = {
+        "type": "open" if kind == "emotion" else "mcq",
+        "kind": kind,
+        "prompt": _PROMPTS[kind].format(facts.name_en),
+        "answer": answer,
+        "maqam_id": facts.id,
+    }
+    if kind != "emotion":
+        question["choices"] = sample_choices(answer, pools[kind], rng=rng)
+    return question
+
+
+def _question_rng(seed, index):
+    return random.Random(f"{seed}:{index}")
+
+
+def _normalize_answer(question_type, answer):
+    if question_type == "open":
+        return str(answer or "").strip().lower()
+    return "" if answer is None else str(answer)
+
+
+def answer_hash(seed, index, question_type, answer):
+    """Truncated HMAC of a normalized answer, bound to the quiz seed and question position."""
+    message = f"{seed}:{index}:{_normalize_answer(question_type, answer)}".encode("utf-8")
+    digest = hmac.new(current_app.config["JWT_SECRET"].encode("utf-8"), message, hashlib.sha256)
+    return digest.hexdigest()[:ANSWER_HASH_LENGTH]
+
+
+def is_correct(question, answer):
+    return _normalize_answer(question["type"], answer) == _normalize_answer(question["type"], question["answer"])
+
+
+def seeded_questions(quiz_catalog, count, seed):
+    """
+    Up to count questions drawn at random for a seed, without building the
+    rest of the bank. The question at each position is built with its own
+    generator, seeded by the quiz seed and position, so
+    regenerate_questions() rebuilds it exactly.
+    """
+    slots = quiz_catalog.slots
+    picked = random.Random(seed).sample(range(len(slots)), k=min(count, len(slots)))
+    return [
+        build_question(*slots[slot], quiz_catalog.pools, _question_rng(seed, position))
+        for position, slot in enumerate(picked)
+    ]
+
+
+def issue_quiz_token(questions, seed, lang, user_id):
+    """A signed descriptor of the quiz that expires after QUIZ_TTL_SECONDS."""
+    now = int(time.time())
+    payload = {
+        "aud": QUIZ_TOKEN_AUDIENCE,
+        # Identifies the attempt: its answers are stored under this quiz_ref, once
+        "jti": uuid.uuid4().hex,
+        "sub": user_id,
+        "iat": now,
+        "exp": now + current_app.config["QUIZ_TTL_SECONDS"],
+        "seed": seed,
+        "lang": lang,
+        "m": [q["maqam_id"] for q in questions],
+        "k": "".join(q["kind"][0] for q in questions),
+        "h": [answer_hash(seed, i, q["type"], q["answer"]) for i, q in enumerate(questions)],
+    }
+    return jwt.encode(payload, current_app.config["JWT_SECRET"], algorithm=current_app.config["JWT_ALG"])
+
+
+def decode_quiz_token(token, user_id):
+    """The descriptor of a quiz token issued to user_id; raises QuizTokenError (or QuizTokenExpired)."""
+    try:
+        payload = jwt.decode(
+            token, current_app.config["JWT_SECRET"], algorithms=[current_app.config["JWT_ALG"]],
+            audience=QUIZ_TOKEN_AUDIENCE,
+        )
+    except jwt.ExpiredSignatureError:
+        raise QuizTokenExpired("quiz expired")
+    except jwt.InvalidTokenError:
+        raise QuizTokenError("invalid quiz token")
+    kinds = {kind[0]: kind for kind in QUESTION_KINDS}
+    try:
+        descriptor = {
+            "jti": str(payload["jti"]) if payload.get("jti") else None,
+            "seed": payload["seed"],
+            "lang": payload.get("lang", "en"),
+            "questions": [
+                {"maqam_id": int(m), "kind": kinds[k], "answer_hash": h}
+                for m, k, h in zip(payload["m"], payload["k"], payload["h"], strict=True)
+            ],
+        }
+    except (KeyError, TypeError, ValueError):
+        raise QuizTokenError("invalid quiz token")
+    if payload.get("sub") != user_id:
+        raise QuizTokenError("quiz was issued to another user")
+    return descriptor
+
+
+def regenerate_questions(descriptor, quiz_catalog):
+    """
+    Rebuild a token's questions from the current catalog. A question whose
+    maqam has been deleted keeps only its kind, maqam id and answer hash.
+    """
+    questions = []
+    for index, item in enumerate(descriptor["questions"]):
+        facts = quiz_catalog.by_id.get(item["maqam_id"])
+        question = build_question(
+            facts, item["kind"], quiz_catalog.pools, _question_rng(descriptor["seed"], index)
+        ) if facts else None
+        if question is None:
+            question = {"type": "open" if item["kind"] == "emotion" else "mcq", "kind": item["kind"],
+                        "prompt": None, "choices": None, "answer": None, "maqam_id": item["maqam_id"]}
+        question["answer_hash"] = item["answer_hash"]
+        questions.append(question)
+    return questions
+
+
+def is_correct_hashed(seed, index, question, answer):
+    """Grade an answer against the HMAC carried in the token."""
+    return hmac.compare_digest(answer_hash(seed, index, question["type"], answer), question["answer_hash"])
+
+
+def grade_quiz(questions, answers, quiz_catalog, seed=None):
+    """
+    Grade answers against stored questions, or against the answer hashes of
+    regenerated token questions when seed is given. Explanations come from
+    the compiled catalog, so grading runs no query.
+
+    Returns (correct count, per-question details, quiz_answer rows without
+    user_id and quiz_ref).
+    """
+    correct_count, details, rows = 0, [], []
+    for idx, q in enumerate(questions):
+        user_answer = answers[idx] if idx < len(answers) else None
+        if seed is not None:
+            answered_correctly = is_correct_hashed(seed, idx, q, user_answer)
+        else:
+            answered_correctly = is_correct(q, user_answer)
+        correct_count += answered_correctly
+        facts = quiz_catalog.by_id.get(q.get("maqam_id"))
+        details.append({
+            "question": q["prompt"],
+            "question_type": q["type"],
+            "choices": q.get("choices"),
+            "user_answer": user_answer,
+            "correct_answer": q["answer"],
+            "is_correct": answered_correctly,
+            "explanation": facts.explanation if facts else _MISSING_EXPLANATION,
+        })
+        rows.append({
+            "position": idx,
+            "maqam_id": q.get("maqam_id"),
+            "kind": q.get("kind") or q["type"],
+            "user_answer": None if user_answer is None else str(user_answer)[:255],
+            "is_correct": answered_correctly,
+        })
+    return correct_count, details, rows
+
+
+class QuizAlreadyAnswered(Exception):
+    """Answers for this quiz were already recorded."""
+
+
+def _is_replay(exc):
+    """Whether an IntegrityError is a violation of the unique (quiz_ref, position) index."""
+    # SQLite reports the indexed columns, other databases the index name
+    message = str(exc.orig)
+    return "ux_quiz_answer_ref_position" in message or "quiz_answer.quiz_ref" in message
+
+
+def record_answers(user_id, quiz_ref, rows):
+    """
+    Store graded answers with one bulk INSERT (the caller commits). Raises
+    QuizAlreadyAnswered when the quiz was graded before, including by a
+    concurrent submission (caught by the unique (quiz_ref, position) index);
+    the caller then rolls back.
+    """
+    if not rows:
+        return
+    if db.session.scalar(select(QuizAnswer.id).where(QuizAnswer.quiz_ref == quiz_ref).limit(1)) is not None:
+        raise QuizAlreadyAnswered("quiz already answered")
+    now = datetime.now(timezone.utc)
+    try:
+        db.session.execute(
+            insert(QuizAnswer),
+            [dict(row, user_id=user_id, quiz_ref=quiz_ref, created_at=now) for row in rows],
+        )
+    except IntegrityError as exc:
+        if not _is_replay(exc):
+            raise
+        raise QuizAlreadyAnswered("quiz already answered")
@@ -0,0 +1,128 @@
+"""
+Storage for started quizzes between /learning/quiz/start and the answer.
+
+Quizzes expire after QUIZ_TTL_SECONDS and at most QUIZ_STORE_MAX_SIZE are
+kept; the oldest are dropped first. The "database" backend allocates ids
+from the quiz_session table's primary key, so any worker process or node
+sharing the database can answer a quiz another one started. The "memory"
+backend keeps quizzes in the process and only suits a single worker.
+"""
+
+import json
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from extensions import db
+from models.quiz_session import QuizSession
+
+
+class QuizStore:
+    """Interface of the quiz session backends."""
+
+    def create(self, quiz):
+        """
+        Store a quiz dict and return its new id (the quiz's "id" key is set to
+        it). The caller commits; until then other processes cannot see it.
+        """
+        raise NotImplementedError
+
+    def get(self, quiz_id):
+        """The quiz dict, or None when it is unknown or expired."""
+        raise NotImplementedError
+
+    def delete(self, quiz_id):
+        raise NotImplementedError
+
+
+class MemoryQuizStore(QuizStore):
+    """Per-process LRU of quizzes with a time-to-live."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._ids = itertools.count(1)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, quiz):
+        now = time.monotonic()
+        with self._lock:
+            quiz_id = next(self._ids)
+            quiz = dict(quiz, id=quiz_id)
+            self._data[quiz_id] = (now + self.ttl, quiz)
+            # Insertion order is expiry order, so expired quizzes are at the front
+            while self._data and (len(self._data) > self.max_size or next(iter(self._data.values()))[0] <= now):
+                self._data.popitem(last=False)
+        return quiz_id
+
+    def get(self, quiz_id):
+        with self._lock:
+            entry = self._data.get(quiz_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[quiz_id]
+                return None
+            return entry[1]
+
+    def delete(self, quiz_id):
+        with self._lock:
+            self._data.pop(quiz_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DatabaseQuizStore(QuizStore):
+    """Quizzes as quiz_session rows; writes are flushed and the caller commits."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+
+    def create(self, quiz):
+        now = datetime.utcnow()
+        session = QuizSession(
+            payload_json=json.dumps({k: v for k, v in quiz.items() if k != "id"}),
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl),
+        )
+        db.session.add(session)
+        db.session.flush()
+        # Ids only grow, so the size bound is a range delete on the primary key
+        db.session.execute(delete(QuizSession).where(
+            (QuizSession.id <= session.id - self.max_size) | (QuizSession.expires_at <= now)
+        ))
+        return session.id
+
+    def get(self, quiz_id):
+        payload = db.session.scalar(select(QuizSession.payload_json).where(
+            QuizSession.id == quiz_id, QuizSession.expires_at > datetime.utcnow()
+        ))
+        return dict(json.loads(payload), id=quiz_id) if payload is not None else None
+
+    def delete(self, quiz_id):
+        db.session.execute(delete(QuizSession).where(QuizSession.id == quiz_id))
+
+
+_BACKENDS = {"memory": MemoryQuizStore, "database": DatabaseQuizStore}
+
+
+def get_quiz_store():
+    """The quiz store configured by QUIZ_STORE_BACKEND for the current app."""
+    app = current_app._get_current_object()
+    key = (app.config["QUIZ_STORE_BACKEND"], app.config["QUIZ_TTL_SECONDS"], app.config["QUIZ_STORE_MAX_SIZE"])
+    cached = app.extensions.get("quiz_store")
+    if cached is None or cached[0] != key:
+        backend = _BACKENDS.get(key[0])
+        if backend is None:
+            raise RuntimeError(f"unknown QUIZ_STORE_BACKEND: {key[0]}")
+        cached = (key, backend(ttl=key[1], max_size=key[2]))
+        app.extensions["quiz_store"] = cached
+    return cached[1]
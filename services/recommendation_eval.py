@@ -0,0 +1,215 @@
+"""
+Offline evaluation and weight tuning for the recommendation engine.
+
+Features of every (scenario, maqam) pair are extracted once into a tensor;
+scoring a weight configuration is then a single tensor-vector product, so
+whole scenario sets (and large weight grids) are evaluated without re-running
+the engine per request.
+"""
+
+import json
+import math
+import time
+import itertools
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from schemas import recommendation_request_schema
+from services.recommendation_service import (
+    FEATURES, DEFAULT_WEIGHTS, HERITAGE_LEVELS, extract_features, normalize_request, rank_profiles,
+)
+
+METRICS = ("precision_at_k", "recall_at_k", "mrr", "ndcg_at_k")
+
+# Search space used when no grid file is given
+DEFAULT_GRID = {
+    "emotion_match": [0.2, 0.3, 0.4],
+    "usage": [0.15, 0.25, 0.35],
+    "region": [0.1, 0.2, 0.3],
+    "time_period": [0.05, 0.1, 0.2],
+    "season": [0.05, 0.1, 0.2],
+    "heritage": [0.1, 0.2, 0.3],
+}
+
+
+def load_scenarios(path):
+    """
+    Load a labelled scenario set.
+
+    Each scenario is {"id": ..., "request": {...RecommendationRequestSchema...},
+    "relevant": ["Maqam name", ...]} with relevant maqamet listed best first.
+    """
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    scenarios = data.get("scenarios", data) if isinstance(data, dict) else data
+    loaded = []
+    for idx, sc in enumerate(scenarios):
+        validated = recommendation_request_schema.load(sc.get("request", {}))
+        loaded.append({
+            "id": sc.get("id", str(idx)),
+            "params": normalize_request(validated),
+            "relevant": [str(r).strip().lower() for r in sc.get("relevant", [])],
+        })
+    return loaded
+
+
+class FeatureSet:
+    """Feature tensor of a scenario set against a catalog snapshot."""
+
+    def __init__(self, profiles, scenarios):
+        n_s, n_m, n_f = len(scenarios), len(profiles), len(FEATURES)
+        self.values = np.zeros((n_s, n_m, n_f))
+        self.evidence = np.zeros((n_s, n_m), dtype=bool)
+        for si, sc in enumerate(scenarios):
+            for mi, p in enumerate(profiles):
+                values, present = extract_features(p, sc["params"])
+                self.values[si, mi] = values
+                self.evidence[si, mi] = any(present)
+        self.active = np.array([any(sc["params"].values()) for sc in scenarios], dtype=bool)
+        self.preserve = np.array([sc["params"]["preserve"] for sc in scenarios], dtype=bool)
+        self.heritage = np.array([p.rarity_level in HERITAGE_LEVELS for p in profiles], dtype=bool)
+
+        names = [p.name_en.strip().lower() for p in profiles]
+        self.relevant = [[names.index(r) for r in sc["relevant"] if r in names] for sc in scenarios]
+
+
+def weight_vector(weights):
+    return np.array([weights[name] for name in FEATURES], dtype=float)
+
+
+def rank_matrix(fs, weights, k=3):
+    """Top-k catalog indices per scenario, mirroring the online engine's ordering."""
+    scores = np.clip(fs.values @ weight_vector(weights), 0.0, 1.0).round(2)
+    eligible = fs.evidence & (scores > 0) & fs.active[:, None]
+    ranked = np.argsort(np.where(eligible, -scores, np.inf), axis=1, kind="stable")
+
+    rankings = []
+    for si, order in enumerate(ranked):
+        order = [int(i) for i in order if eligible[si, i]]
+        if fs.preserve[si]:
+            first_heritage = next((i for i in order if fs.heritage[i]), None)
+            if first_heritage is not None:
+                order = [first_heritage] + [i for i in order if i != first_heritage]
+        rankings.append(order[:k])
+    return rankings
+
+
+def ranking_metrics(rankings, relevant, k=3):
+    """Mean precision@k, recall@k, MRR and nDCG@k over labelled scenarios."""
+    totals = dict.fromkeys(METRICS, 0.0)
+    labelled = 0
+    for ranked, rel in zip(rankings, relevant):
+        if not rel:
+            continue
+        labelled += 1
+        # Graded gains: the first listed relevant maqam is the most relevant
+        gains = {idx: len(rel) - pos for pos, idx in enumerate(rel)}
+        hits = [i for i in ranked[:k] if i in gains]
+        totals["precision_at_k"] += len(hits) / k
+        totals["recall_at_k"] += len(hits) / len(rel)
+        totals["mrr"] += next((1 / (pos + 1) for pos, i in enumerate(ranked) if i in gains), 0.0)
+        dcg = sum(gains.get(i, 0) / math.log2(pos + 2) for pos, i in enumerate(ranked[:k]))
+        ideal = sorted(gains.values(), reverse=True)[:k]
+        idcg = sum(g / math.log2(pos + 2) for pos, g in enumerate(ideal))
+        totals["ndcg_at_k"] += dcg / idcg if idcg else 0.0
+    return {name: round(total / labelled, 4) if labelled else 0.0 for name, total in totals.items()}
+
+
+def scenario_latencies(profiles, scenarios, weights, repeat=5):
+    """Best-of-repeat wall time (ms) of the online ranking path for each scenario."""
+    latencies = {}
+    for sc in scenarios:
+        best = math.inf
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            rank_profiles(profiles, sc["params"], weights)
+            best = min(best, time.perf_counter() - start)
+        latencies[sc["id"]] = round(best * 1000, 4)
+    return latencies
+
+
+def evaluate(profiles, scenarios, weights=None, k=3, repeat=5):
+    """Ranking metrics plus per-scenario latency for one weight configuration."""
+    weights = weights or DEFAULT_WEIGHTS
+    fs = FeatureSet(profiles, scenarios)
+    rankings = rank_matrix(fs, weights, k)
+    latencies = scenario_latencies(profiles, scenarios, weights, repeat)
+    timings = sorted(latencies.values())
+    names = [p.name_en for p in profiles]
+    return {
+        "scenarios": len(scenarios),
+        "catalog_size": len(profiles),
+        "k": k,
+        "weights": weights,
+        "metrics": ranking_metrics(rankings, fs.relevant, k),
+        "latency_ms": {
+            "p50": round(statistics.median(timings), 4) if timings else 0.0,
+            "p95": round(timings[int(0.95 * (len(timings) - 1))], 4) if timings else 0.0,
+            "max": round(timings[-1], 4) if timings else 0.0,
+            "per_scenario": latencies,
+        },
+        "rankings": {sc["id"]: [names[i] for i in ranked] for sc, ranked in zip(scenarios, rankings)},
+    }
+
+
+def expand_grid(grid, base=None):
+    """Every weight configuration of a {feature: [values]} grid, other weights from base."""
+    base = dict(base or DEFAULT_WEIGHTS)
+    unknown = set(grid) - set(base)
+    if unknown:
+        raise ValueError(f"unknown recommendation weights: {', '.join(sorted(unknown))}")
+    keys = sorted(grid)
+    return [dict(base, **dict(zip(keys, combo))) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+_WORKER = {}
+
+
+def _init_worker(fs, k):
+    _WORKER["fs"] = fs
+    _WORKER["k"] = k
+
+
+def _evaluate_chunk(configs):
+    fs, k = _WORKER["fs"], _WORKER["k"]
+    return [ranking_metrics(rank_matrix(fs, cfg, k), fs.relevant, k) for cfg in configs]
+
+
+def grid_search(profiles, scenarios, grid=None, base=None, objective="ndcg_at_k", k=3, workers=None, chunk_size=64):
+    """
+    Evaluate every configuration of a weight grid across a process pool.
+
+    Returns the best configuration (ties keep the earliest grid entry) and a
+    leaderboard of the top configurations.
+    """
+    if objective not in METRICS:
+        raise ValueError(f"objective must be one of {', '.join(METRICS)}")
+    configs = expand_grid(grid or DEFAULT_GRID, base)
+    fs = FeatureSet(profiles, scenarios)
+    chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        _init_worker(fs, k)
+        for chunk in chunks:
+            results.extend(_evaluate_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(fs, k)) as pool:
+            for chunk_metrics in pool.map(_evaluate_chunk, chunks):
+                results.extend(chunk_metrics)
+    elapsed = time.perf_counter() - start
+
+    order = sorted(range(len(configs)), key=lambda i: (-results[i][objective], i))
+    best = order[0]
+    return {
+        "objective": objective,
+        "configurations": len(configs),
+        "elapsed_seconds": round(elapsed, 3),
+        "baseline": ranking_metrics(rank_matrix(fs, dict(base or DEFAULT_WEIGHTS), k), fs.relevant, k),
+        "weights": configs[best],
+        "metrics": results[best],
+        "leaderboard": [{"weights": configs[i], "metrics": results[i]} for i in order[:10]],
+    }
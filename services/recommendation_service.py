@@ -0,0 +1,226 @@
+import json
+
+from flask import current_app
+
+from models.maqam import Maqam
+
+# Scoring features, in the column order used by the offline evaluation harness
+FEATURES = [
+    "emotion_weight",    # value of the requested mood in emotion_weights_json (0-1)
+    "emotion_match",     # fallback: requested mood appears in the primary emotion
+    "usage",             # event matches one of the usages
+    "region",            # region matches
+    "time_period",       # historical period matches
+    "season",            # seasonal usage matches
+    "heritage",          # preserve_heritage and the maqam is at risk / locally rare
+    "beginner",          # simple_for_beginners and the maqam is beginner level
+    "beginner_penalty",  # simple_for_beginners and the maqam is not beginner level
+    "advanced_ok",       # no beginner constraint and the maqam is intermediate/advanced
+]
+
+DEFAULT_WEIGHTS = {
+    "emotion_weight": 1.0,
+    "emotion_match": 0.3,
+    "usage": 0.25,
+    "region": 0.2,
+    "time_period": 0.1,
+    "season": 0.1,
+    "heritage": 0.2,
+    "beginner": 0.15,
+    "beginner_penalty": -0.05,
+    "advanced_ok": 0.05,
+}
+
+# Evidence label and human-readable reason emitted when a feature fires
+_EVIDENCE = {
+    "emotion_weight": ("emotion_weight", "emotion alignment"),
+    "emotion_match": ("emotion_match", "emotion alignment"),
+    "usage": ("usage_match", "usage match"),
+    "region": ("region_match", "region match"),
+    "time_period": ("time_period_match", "period match"),
+    "season": ("season_match", "season match"),
+    "heritage": ("heritage_boost", "heritage boost"),
+    "beginner": ("beginner_path", "beginner-friendly"),
+    "advanced_ok": ("advanced_ok", None),
+}
+
+HERITAGE_LEVELS = ("at_risk", "locally_rare")
+
+
+def normalize_request(validated):
+    """Lower-cased, stripped scoring parameters from a validated recommendation request."""
+    return {
+        "mood": (validated.get("mood") or "").lower().strip(),
+        "event": (validated.get("event") or "").lower().strip(),
+        "region": (validated.get("region") or "").lower().strip(),
+        "time_period": (validated.get("time_period") or "").lower().strip(),
+        "season": (validated.get("season") or "").lower().strip(),
+        "preserve": bool(validated.get("preserve_heritage", False)),
+        "simple_for_beginners": bool(validated.get("simple_for_beginners", False)),
+    }
+
+
+def load_weights(path=None):
+    """Default weights, overridden by a JSON weights file (flat or {"weights": {...}})."""
+    weights = dict(DEFAULT_WEIGHTS)
+    if not path:
+        return weights
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    overrides = data.get("weights", data)
+    unknown = set(overrides) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"unknown recommendation weights: {', '.join(sorted(unknown))}")
+    weights.update({k: float(v) for k, v in overrides.items()})
+    return weights
+
+
+def active_weights():
+    """Weights used by the online engine, loaded once from RECOMMENDATION_WEIGHTS_FILE."""
+    weights = current_app.extensions.get("recommendation_weights")
+    if weights is None:
+        weights = load_weights(current_app.config.get("RECOMMENDATION_WEIGHTS_FILE"))
+        current_app.extensions["recommendation_weights"] = weights
+    return weights
+
+
+def _json_list(s):
+    try:
+        value = json.loads(s) if s else []
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+class MaqamProfile:
+    """Pre-decoded scoring view of a maqam."""
+
+    def __init__(self, m):
+        self.id = m.id
+        self.name_en = m.name_en or m.name_ar or f"Maqam {m.id}"
+        self.name_ar = m.name_ar
+        self.emotion = m.emotion
+        self.emotion_ar = m.emotion_ar
+        self.usage = m.usage
+        self.usage_ar = m.usage_ar
+        self.rarity_level = m.rarity_level
+        self.difficulty_label = m.difficulty_label
+        self.regions = _json_list(m.regions_json)
+        self.regions_ar = _json_list(m.regions_ar_json)
+
+        self.usages_l = [u.strip().lower() for u in (m.usage or "").split(",") if u.strip()]
+        self.regions_l = [str(r).lower() for r in self.regions]
+        self.periods_l = [str(h).lower() for h in _json_list(m.historical_periods_json)]
+        self.seasons_l = [str(s).lower() for s in _json_list(m.seasonal_usage_json)]
+        self.emotion_weights = None
+        if m.emotion_weights_json:
+            try:
+                weights = json.loads(m.emotion_weights_json)
+                if isinstance(weights, dict):
+                    self.emotion_weights = weights
+            except (TypeError, ValueError):
+                pass
+        self.difficulty_l = (m.difficulty_label or "").lower()
+
+
+def load_profiles():
+    return [MaqamProfile(m) for m in Maqam.query.all()]
+
+
+def extract_features(profile, params):
+    """
+    Feature values (in FEATURES order) of a maqam for a scenario, and whether
+    any evidence-bearing feature fired. Independent of the weights.
+    """
+    values = [0.0] * len(FEATURES)
+    present = [False] * len(FEATURES)
+    mood = params["mood"]
+
+    if mood:
+        if profile.emotion_weights is not None:
+            values[0] = min(float(profile.emotion_weights.get(mood, 0.0)), 1.0)
+            present[0] = True
+        elif profile.emotion and mood in profile.emotion.lower():
+            values[1] = 1.0
+            present[1] = True
+
+    checks = [
+        (2, params["event"] and any(params["event"] in u for u in profile.usages_l)),
+        (3, params["region"] and params["region"] in profile.regions_l),
+        (4, params["time_period"] and params["time_period"] in profile.periods_l),
+        (5, params["season"] and params["season"] in profile.seasons_l),
+        (6, params["preserve"] and profile.rarity_level in HERITAGE_LEVELS),
+    ]
+    if params["simple_for_beginners"]:
+        if profile.difficulty_l == "beginner":
+            checks.append((7, True))
+        else:
+            values[8] = 1.0
+    else:
+        checks.append((9, profile.difficulty_l in ("intermediate", "advanced")))
+
+    for idx, fired in checks:
+        if fired:
+            values[idx] = 1.0
+            present[idx] = True
+    return values, present
+
+
+def rank_profiles(profiles, params, weights=None, limit=3):
+    """Score maqam profiles against normalized parameters and return the top recommendations."""
+    if not any(params.values()):
+        return []
+    weights = weights or DEFAULT_WEIGHTS
+    weight_vector = [weights[name] for name in FEATURES]
+
+    candidates = []
+    for p in profiles:
+        values, present = extract_features(p, params)
+        if not any(present):
+            continue
+        score = sum(v * w for v, w in zip(values, weight_vector))
+        score = max(0.0, min(score, 1.0))
+        if score <= 0:
+            continue
+
+        evidence, reason_parts = [], []
+        for name, fired in zip(FEATURES, present):
+            if not fired:
+                continue
+            label, reason = _EVIDENCE[name]
+            evidence.append(label)
+            if reason:
+                reason_parts.append(reason)
+
+        candidates.append({
+            "maqam": p.name_en,
+            "maqam_ar": p.name_ar,
+            "emotion": p.emotion,
+            "emotion_ar": p.emotion_ar,
+            "usage": p.usage,
+            "usage_ar": p.usage_ar,
+            "regions": p.regions,
+            "regions_ar": p.regions_ar,
+            "confidence": round(score, 2),
+            "reason": "; ".join(reason_parts or ["context match"]),
+            "rarity_level": p.rarity_level,
+            "difficulty_label": p.difficulty_label,
+            "evidence": evidence,
+        })
+
+    candidates.sort(key=lambda c: c["confidence"], reverse=True)
+
+    top = candidates[:limit]
+    if params["preserve"]:
+        heritage = [c for c in candidates if c.get("rarity_level") in HERITAGE_LEVELS]
+        if heritage:
+            seen = set()
+            top = []
+            for c in heritage[:1] + candidates:
+                if c["maqam"] in seen:
+                    continue
+                seen.add(c["maqam"])
+                top.append(c)
+                if len(top) == limit:
+                    break
+    return top
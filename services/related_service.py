@@ -0,0 +1,214 @@
+import json
+import heapq
+
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models.maqam import Maqam
+from models.maqam_relation import MaqamRelation
+from services.analysis_service import normalize_note
+
+# Number of neighbours materialized per maqam
+RELATED_TOP_N = 5
+
+# Contribution of each similarity signal to the final score
+SIMILARITY_WEIGHTS = {
+    "emotion": 1.0,   # same primary emotion
+    "regions": 1.0,   # Jaccard overlap of regions
+    "ajnas": 0.75,    # Jaccard overlap of jins names
+    "notes": 0.75,    # Jaccard overlap of the full note set
+    "curated": 1.5,   # explicitly listed in related_json
+}
+
+
+def _json_list(s):
+    try:
+        value = json.loads(s) if s else []
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Features:
+    """Pre-decoded similarity features of a single maqam."""
+    __slots__ = ("id", "name", "emotion", "regions", "ajnas", "notes", "curated_ids", "curated_names")
+
+    def __init__(self, m):
+        self.id = m.id
+        self.name = (m.name_en or "").strip().lower()
+        self.emotion = (m.emotion or "").strip().lower()
+        self.regions = frozenset(str(r).strip().lower() for r in _json_list(m.regions_json) if r)
+
+        ajnas_names, notes = set(), set()
+        for jins in _json_list(m.ajnas_json):
+            if not isinstance(jins, dict):
+                continue
+            nm = jins.get("name")
+            if isinstance(nm, dict):
+                nm = nm.get("en") or nm.get("ar")
+            if isinstance(nm, str) and nm.strip():
+                ajnas_names.add(nm.strip().lower())
+            jins_notes = jins.get("notes")
+            if isinstance(jins_notes, dict):
+                jins_notes = jins_notes.get("en", [])
+            for n in jins_notes or []:
+                normalized = normalize_note(n)
+                if normalized:
+                    notes.add(normalized)
+        self.ajnas = frozenset(ajnas_names)
+        self.notes = frozenset(notes)
+
+        curated = _json_list(m.related_json)
+        self.curated_ids = frozenset(c for c in curated if isinstance(c, int))
+        self.curated_names = frozenset(c.strip().lower() for c in curated if isinstance(c, str))
+
+    def curates(self, other):
+        return other.id in self.curated_ids or (other.name and other.name in self.curated_names)
+
+
+def similarity(a, b):
+    """Symmetric similarity score between two maqam feature sets."""
+    w = SIMILARITY_WEIGHTS
+    score = 0.0
+    if a.emotion and a.emotion == b.emotion:
+        score += w["emotion"]
+    score += w["regions"] * _jaccard(a.regions, b.regions)
+    score += w["ajnas"] * _jaccard(a.ajnas, b.ajnas)
+    score += w["notes"] * _jaccard(a.notes, b.notes)
+    if a.curates(b) or b.curates(a):
+        score += w["curated"]
+    return round(score, 4)
+
+
+def _load_features(exclude=()):
+    columns = (Maqam.id, Maqam.name_en, Maqam.emotion, Maqam.regions_json, Maqam.ajnas_json, Maqam.related_json)
+    return {row.id: _Features(row) for row in db.session.query(*columns).all() if row.id not in exclude}
+
+
+def _top_neighbours(owner, features):
+    """Top-N (score, id) pairs for a single maqam, best first."""
+    scored = []
+    for other in features.values():
+        if other.id == owner.id:
+            continue
+        score = similarity(owner, other)
+        if score > 0:
+            scored.append((score, -other.id))
+    best = heapq.nlargest(RELATED_TOP_N, scored)
+    return [(score, -neg_id) for score, neg_id in best]
+
+
+def _replace_rows(owner_ids, neighbours_by_owner):
+    if not owner_ids:
+        return
+    MaqamRelation.query.filter(MaqamRelation.maqam_id.in_(owner_ids)).delete(synchronize_session=False)
+    rows = [
+        {"maqam_id": owner_id, "related_id": related_id, "rank": rank, "score": score}
+        for owner_id in owner_ids
+        for rank, (score, related_id) in enumerate(neighbours_by_owner.get(owner_id, []))
+    ]
+    if rows:
+        db.session.execute(MaqamRelation.__table__.insert(), rows)
+
+
+def rebuild_related_graph(exclude=()):
+    """Recompute the whole related-maqamet graph (O(N^2), used for cold starts)."""
+    features = _load_features(exclude)
+    MaqamRelation.query.delete(synchronize_session=False)
+    neighbours = {mid: _top_neighbours(f, features) for mid, f in features.items()}
+    _replace_rows(list(features), neighbours)
+
+
+def refresh_related(updated_ids=(), deleted_ids=()):
+    """
+    Incrementally update the graph after maqamet were written or deleted.
+
+    Updated maqamet get their neighbour list recomputed. Every other maqam only
+    compares itself against the changed ones and merges the result into its
+    stored top-N; a full recompute is needed only when a stored neighbour lost
+    score (or was deleted) from an already full list.
+    """
+    deleted_ids = {i for i in deleted_ids if i is not None}
+    updated_ids = {i for i in updated_ids if i is not None} - deleted_ids
+    if not updated_ids and not deleted_ids:
+        return
+
+    stored = {}
+    for rel in db.session.query(MaqamRelation.maqam_id, MaqamRelation.related_id, MaqamRelation.score):
+        stored.setdefault(rel.maqam_id, {})[rel.related_id] = rel.score
+    if not stored:
+        rebuild_related_graph(exclude=deleted_ids)
+        return
+
+    if deleted_ids:
+        MaqamRelation.query.filter(
+            MaqamRelation.maqam_id.in_(deleted_ids) | MaqamRelation.related_id.in_(deleted_ids)
+        ).delete(synchronize_session=False)
+
+    features = _load_features(exclude=deleted_ids)
+    updated_ids &= set(features)
+    changed = deleted_ids | updated_ids
+
+    new_lists = {mid: _top_neighbours(features[mid], features) for mid in updated_ids}
+
+    for owner_id, owner in features.items():
+        if owner_id in updated_ids:
+            continue
+        current = stored.get(owner_id, {})
+        touched = {rid: s for rid, s in current.items() if rid in changed}
+        new_scores = {mid: similarity(owner, features[mid]) for mid in updated_ids}
+        if not touched and not any(s > 0 for s in new_scores.values()):
+            continue
+
+        lost_ground = any(
+            rid in deleted_ids or new_scores.get(rid, 0.0) < old for rid, old in touched.items()
+        )
+        if len(current) >= RELATED_TOP_N and lost_ground:
+            new_lists[owner_id] = _top_neighbours(owner, features)
+            continue
+
+        merged = [(s, -rid) for rid, s in current.items() if rid not in changed]
+        merged += [(s, -mid) for mid, s in new_scores.items() if s > 0]
+        best = heapq.nlargest(RELATED_TOP_N, merged)
+        new_lists[owner_id] = [(s, -neg_id) for s, neg_id in best]
+
+    _replace_rows(list(new_lists), new_lists)
+
+
+def related_maqamet(base, related_options=()):
+    """
+    Return the (relation, maqam) neighbours of a maqam, best first.
+
+    related_options are loader options for the related Maqam rows, e.g. to
+    eager-load what the caller serializes from each of them. When the graph
+    has never been built for this database (fresh seed), the neighbours are
+    scored on the fly and returned as unsaved relations: reads never write,
+    and `flask catalog rebuild` (or catalog_rebuilt) materializes the graph.
+    """
+    relations = (
+        MaqamRelation.query
+        .options(joinedload(MaqamRelation.related).options(*related_options))
+        .filter(MaqamRelation.maqam_id == base.id)
+        .order_by(MaqamRelation.rank)
+        .all()
+    )
+    if relations or db.session.query(MaqamRelation.maqam_id).first() is not None:
+        return relations
+
+    features = _load_features()
+    owner = features.get(base.id)
+    neighbours = _top_neighbours(owner, features) if owner else []
+    related = {
+        m.id: m for m in Maqam.query.options(*related_options).filter(Maqam.id.in_([i for _, i in neighbours]))
+    }
+    return [
+        MaqamRelation(maqam_id=base.id, related_id=related_id, rank=rank, score=score, related=related[related_id])
+        for rank, (score, related_id) in enumerate(neighbours)
+        if related_id in related
+    ]
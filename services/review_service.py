@@ -0,0 +1,148 @@
+"""
+Spaced repetition of what each learner studies, per (user, maqam, topic).
+
+Every graded quiz question and every completed activity (mapped to its
+topic by ACTIVITY_TOPICS) is one review of an item. An SM-2 step updates
+the item's ease, interval and due date from the grade (0-5, 3 and above
+counting as recalled); a failed item comes back after LAPSE_MINUTES.
+Updates read and write only the items reviewed, and the due queue is a
+range scan on the (user_id, due_at) index.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from extensions import db
+from models.maqam import Maqam
+from models.review_state import ReviewState
+
+# The quiz question kinds, plus the skills the other learning games practice
+REVIEW_TOPICS = ("emotion", "region", "usage", "ajnas", "audio", "clues", "notes")
+
+# Topic practiced by each activity name the learning plan suggests or the web
+# client reports; games without a topic in their name default to the topic
+# their endpoint defaults to
+ACTIVITY_TOPICS = {
+    "flashcards_emotion": "emotion",
+    "flashcards_region": "region",
+    "flashcards_usage": "usage",
+    "flashcards_ajnas": "ajnas",
+    "quiz_emotion": "emotion",
+    "quiz_region": "region",
+    "quiz_usage": "usage",
+    "quiz_ajnas": "ajnas",
+    "mcq": "emotion",
+    "mcq_emotion": "emotion",
+    "mcq_region": "region",
+    "mcq_usage": "usage",
+    "matching": "emotion",
+    "matching_emotion": "emotion",
+    "matching_region": "region",
+    "matching_usage": "usage",
+    "odd_one_out": "emotion",
+    "audio_recognition": "audio",
+    "audio_mcq": "audio",
+    "clue_game": "clues",
+    "order_jins": "notes",
+    "order_notes": "notes",
+}
+
+# SM-2 grades: a correct quiz answer is recalled after hesitation, a wrong one is a lapse
+GRADE_CORRECT = 4
+GRADE_WRONG = 1
+# Grade of a completed activity unless the client reports one
+GRADE_ACTIVITY = 4
+MIN_EASE = 1.3
+LAPSE_MINUTES = 10
+
+
+def activity_topic(activity):
+    """The topic an activity practices (e.g. "flashcards_region" -> "region"), or None when unknown."""
+    return ACTIVITY_TOPICS.get((activity or "").strip().lower())
+
+
+def schedule(state, grade, now):
+    """Apply one SM-2 review with a 0-5 grade to a ReviewState."""
+    if grade >= 3:
+        if state.repetitions == 0:
+            interval = 1.0
+        elif state.repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(state.interval_days * state.ease, 2)
+        state.repetitions += 1
+        state.interval_days = interval
+        state.due_at = now + timedelta(days=interval)
+    else:
+        state.repetitions = 0
+        state.interval_days = 0.0
+        state.lapses += 1
+        state.due_at = now + timedelta(minutes=LAPSE_MINUTES)
+    miss = 5 - grade
+    state.ease = max(MIN_EASE, state.ease + 0.1 - miss * (0.08 + miss * 0.02))
+    state.reviews += 1
+    state.last_grade = grade
+    state.last_reviewed_at = now
+    return state
+
+
+def record_reviews(user_id, reviews, now=None):
+    """
+    Schedule (maqam_id, topic, grade) reviews of one user, loading only the
+    items reviewed with a single query (the caller commits). Reviews of an
+    unknown topic or without a maqam are ignored.
+    """
+    reviews = [(m, t, g) for m, t, g in reviews if m is not None and t in REVIEW_TOPICS]
+    if not reviews:
+        return
+    now = now or datetime.utcnow()
+    states = {
+        (s.maqam_id, s.topic): s
+        for s in db.session.scalars(select(ReviewState).where(
+            ReviewState.user_id == user_id,
+            ReviewState.maqam_id.in_({m for m, _, _ in reviews}),
+        ))
+    }
+    for maqam_id, topic, grade in reviews:
+        state = states.get((maqam_id, topic))
+        if state is None:
+            state = ReviewState(user_id=user_id, maqam_id=maqam_id, topic=topic,
+                                repetitions=0, interval_days=0.0, ease=2.5, lapses=0, reviews=0)
+            db.session.add(state)
+            states[(maqam_id, topic)] = state
+        schedule(state, grade, now)
+
+
+def record_quiz_reviews(user_id, rows, now=None):
+    """Schedule the questions graded by quiz_service.grade_quiz (their kind is the topic)."""
+    record_reviews(user_id, [
+        (row["maqam_id"], row["kind"], GRADE_CORRECT if row["is_correct"] else GRADE_WRONG) for row in rows
+    ], now)
+
+
+def due_reviews(user_id, limit, topic=None, now=None):
+    """
+    The user's next `limit` items due by now, earliest first, with the
+    maqam names; items of deleted maqamet are skipped.
+    """
+    query = (
+        select(ReviewState, Maqam.name_en, Maqam.name_ar)
+        .join(Maqam, Maqam.id == ReviewState.maqam_id)
+        .where(ReviewState.user_id == user_id, ReviewState.due_at <= (now or datetime.utcnow()))
+    )
+    if topic:
+        query = query.where(ReviewState.topic == topic)
+    rows = db.session.execute(query.order_by(ReviewState.due_at).limit(limit)).all()
+    return [{
+        "maqam_id": state.maqam_id,
+        "name_en": name_en,
+        "name_ar": name_ar,
+        "topic": state.topic,
+        "due_at": state.due_at.isoformat(),
+        "interval_days": state.interval_days,
+        "ease": round(state.ease, 2),
+        "repetitions": state.repetitions,
+        "lapses": state.lapses,
+        "last_grade": state.last_grade,
+    } for state, name_en, name_ar in rows]
@@ -0,0 +1,269 @@
+"""
+Full-text search over maqam names, bilingual descriptions and ajnas names.
+
+On SQLite the catalog is indexed in an FTS5 table (maqam_fts) holding
+normalized text: Arabic is folded (diacritics, alef/ya/ta-marbuta) before
+indexing and querying, and a transliteration column lets Latin queries match
+Arabic-only names. The table is kept in sync from a flush hook. Other
+databases fall back to scoring the (small) catalog in Python.
+"""
+
+import json
+import re
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models.maqam import Maqam
+from services.arabic_text import fold_arabic, has_arabic, transliterate
+
+SEARCH_LIMIT = 20
+SNIPPET_WORDS = 16
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = "<mark>", "</mark>"
+
+# Indexed columns and their bm25 weights (names count most)
+FTS_COLUMNS = ("name_en", "name_ar", "description_en", "description_ar", "ajnas", "translit")
+_BM25_WEIGHTS = (10.0, 10.0, 2.0, 2.0, 4.0, 6.0)
+
+# Columns whose changes require re-indexing a maqam
+_INDEXED_SOURCES = ("name_en", "name_ar", "description_en", "description_ar", "ajnas_json")
+
+
+def _is_sqlite(bind):
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(conn):
+    """Create the FTS5 table if missing (SQLite only)."""
+    if not _is_sqlite(conn):
+        return
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS maqam_fts USING fts5("
+        "maqam_id UNINDEXED, " + ", ".join(FTS_COLUMNS) + ", tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+
+
+def _ajnas_names(ajnas_json):
+    try:
+        ajnas = json.loads(ajnas_json) if ajnas_json else []
+    except (TypeError, ValueError):
+        return []
+    names = []
+    for jins in ajnas if isinstance(ajnas, list) else []:
+        name = jins.get("name") if isinstance(jins, dict) else jins
+        values = name.values() if isinstance(name, dict) else [name]
+        names.extend(str(v) for v in values if v)
+    return names
+
+
+def search_document(m):
+    """Normalized FTS column values of a maqam."""
+    ajnas = _ajnas_names(m.ajnas_json)
+    return {
+        "name_en": fold_arabic(m.name_en),
+        "name_ar": fold_arabic(m.name_ar),
+        "description_en": fold_arabic(m.description_en),
+        "description_ar": fold_arabic(m.description_ar),
+        "ajnas": fold_arabic(" ".join(ajnas)),
+        "translit": transliterate(" ".join([m.name_ar or "", *ajnas])),
+    }
+
+
+def _index_rows(conn, maqamet):
+    rows = [{"maqam_id": m.id, **search_document(m)} for m in maqamet]
+    if rows:
+        conn.execute(
+            text(f"INSERT INTO maqam_fts (maqam_id, {', '.join(FTS_COLUMNS)}) "
+                 f"VALUES (:maqam_id, {', '.join(':' + c for c in FTS_COLUMNS)})"),
+            rows,
+        )
+
+
+def _delete_rows(conn, ids):
+    for maqam_id in ids:
+        conn.execute(text("DELETE FROM maqam_fts WHERE maqam_id = :id"), {"id": maqam_id})
+
+
+def rebuild_search_index():
+    """Re-index the whole catalog (SQLite only)."""
+    conn = db.session.connection()
+    if not _is_sqlite(conn):
+        return
+    create_search_index(conn)
+    conn.execute(text("DELETE FROM maqam_fts"))
+    _index_rows(conn, Maqam.query.all())
+
+
+def reindex_maqamet(rows):
+    """Re-index maqamet written with bulk statements (rows need id and the indexed columns)."""
+    conn = db.session.connection()
+    if not _is_sqlite(conn):
+        return
+    _delete_rows(conn, [m.id for m in rows])
+    _index_rows(conn, rows)
+
+
+@event.listens_for(Maqam.__table__, "after_create")
+def _create_with_catalog(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Maqam.__table__, "after_drop")
+def _drop_with_catalog(target, connection, **kw):
+    if _is_sqlite(connection):
+        connection.execute(text("DROP TABLE IF EXISTS maqam_fts"))
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session, flush_context):
+    changed, deleted = [], []
+    for obj in session.new:
+        if isinstance(obj, Maqam):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Maqam) and any(
+            inspect(obj).attrs[col].history.has_changes() for col in _INDEXED_SOURCES
+        ):
+            changed.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Maqam):
+            deleted.append(obj.id)
+    if not changed and not deleted:
+        return
+
+    conn = session.connection()
+    if not _is_sqlite(conn):
+        return
+    _delete_rows(conn, deleted + [m.id for m in changed])
+    _index_rows(conn, changed)
+
+
+def _query_terms(q):
+    return re.findall(r"\w+", fold_arabic(q))
+
+
+def _term_variants(term):
+    """A term and its form with/without the Arabic article, so حسين also finds الحسين."""
+    if not has_arabic(term):
+        return [term]
+    if term.startswith("ال") and len(term) > 3:
+        return [term, term[2:]]
+    return [term, "ال" + term]
+
+
+def _any_prefix(words):
+    return "(" + " OR ".join(f'"{w}"*' for w in words) + ")"
+
+
+def _match_expression(terms, latin):
+    """FTS5 MATCH expression: every term as a prefix, or the transliterated Arabic query."""
+    expr = " AND ".join(_any_prefix(_term_variants(t)) for t in terms)
+    if latin:
+        expr = f"({expr}) OR translit : ({' AND '.join(_any_prefix([t]) for t in latin)})"
+    return expr
+
+
+def _search_fts(terms, latin, limit):
+    weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+    rows = db.session.execute(text(
+        f"SELECT maqam_id, bm25(maqam_fts, 0.0, {weights}) AS rank "
+        "FROM maqam_fts WHERE maqam_fts MATCH :expr ORDER BY rank, maqam_id LIMIT :limit"
+    ), {"expr": _match_expression(terms, latin), "limit": limit}).all()
+    return [(row.maqam_id, -row.rank) for row in rows]
+
+
+def _search_scan(terms, latin, limit):
+    """Portable fallback: score every maqam's normalized document in Python."""
+    variants = [_term_variants(t) for t in terms]
+    results = []
+    for m in Maqam.query.all():
+        words = {col: re.findall(r"\w+", value) for col, value in search_document(m).items()}
+        every_word = [w for col_words in words.values() for w in col_words]
+        matched = all(any(w.startswith(v) for v in vs for w in every_word) for vs in variants)
+        if latin and not matched:
+            matched = all(any(w.startswith(t) for w in words["translit"]) for t in latin)
+        if not matched:
+            continue
+        needles = [v for vs in variants for v in vs] + latin
+        score = sum(
+            weight * sum(1 for w in words[col] if any(w.startswith(n) for n in needles))
+            for col, weight in zip(FTS_COLUMNS, _BM25_WEIGHTS)
+        )
+        results.append((m.id, float(score)))
+    results.sort(key=lambda r: (-r[1], r[0]))
+    return results[:limit]
+
+
+# A word, including any Arabic diacritics inside it
+_WORD = re.compile(r"[\w\u064B-\u0652\u0670\u0640]+")
+
+
+def _highlight(value, needles, window=None):
+    """
+    Wrap words of the original text that start with a (folded) search term in
+    <mark> tags. With window, return only that many words around the first
+    match. Returns None when nothing matches.
+    """
+    if not value:
+        return None
+    spans = [w.span() for w in _WORD.finditer(value) if fold_arabic(w.group()).startswith(needles)]
+    if not spans:
+        return None
+
+    start, end = 0, len(value)
+    if window:
+        words = [w.span() for w in _WORD.finditer(value)]
+        first = next(i for i, span in enumerate(words) if span == spans[0])
+        lo, hi = max(0, first - window // 2), min(len(words), first + window // 2 + 1)
+        start, end = words[lo][0], words[hi - 1][1]
+        spans = [span for span in spans if start <= span[0] < end]
+
+    parts, pos = [], start
+    for a, b in spans:
+        parts.append(value[pos:a] + HIGHLIGHT_OPEN + value[a:b] + HIGHLIGHT_CLOSE)
+        pos = b
+    parts.append(value[pos:end])
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(value) else "")
+
+
+def _highlights(m, needles):
+    values = {
+        "name_en": _highlight(m.name_en, needles),
+        "name_ar": _highlight(m.name_ar, needles),
+        "description_en": _highlight(m.description_en, needles, window=SNIPPET_WORDS),
+        "description_ar": _highlight(m.description_ar, needles, window=SNIPPET_WORDS),
+        "ajnas": _highlight(", ".join(_ajnas_names(m.ajnas_json)), needles),
+    }
+    return {field: value for field, value in values.items() if value}
+
+
+def search_maqamet(q, limit=SEARCH_LIMIT):
+    """Ranked search results: [{"maqam": {...}, "score": float, "highlights": {...}}]."""
+    terms = _query_terms(q)
+    if not terms:
+        return []
+    latin = transliterate(q).split() if has_arabic(q) else []
+    if _is_sqlite(db.session.connection()):
+        hits = _search_fts(terms, latin, limit)
+    else:
+        hits = _search_scan(terms, latin, limit)
+    if not hits:
+        return []
+
+    needles = tuple(v for t in terms for v in _term_variants(t))
+    maqamet = {
+        m.id: m
+        for m in Maqam.query.filter(
+            Maqam.id.in_([maqam_id for maqam_id, _ in hits])
+        )
+    }
+    return [
+        {
+            "maqam": maqamet[maqam_id].to_dict_basic(),
+            "score": round(score, 6),
+            "highlights": _highlights(maqamet[maqam_id], needles),
+        }
+        for maqam_id, score in hits
+        if maqam_id in maqamet
+    ]
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+from services.cache_service import get_cache
+from services.catalog_service import current_catalog_version
+
+
+class Snapshot:
+    """A catalog view serialized once: JSON bytes, their gzip form and a strong ETag."""
+
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag", "headers")
+
+    def __init__(self, body, version, headers=None):
+        self.body = body
+        self.headers = headers or {}
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.etag = f"v{version}-{hashlib.sha256(body).hexdigest()[:20]}"
+        # A strong ETag names one representation, so the gzip body gets its own
+        self.gzip_etag = f"{self.etag}-gz"
+
+
+def _cache_control():
+    max_age = int(current_app.config.get("CATALOG_SNAPSHOT_MAX_AGE", 0))
+    if max_age > 0:
+        return f"public, max-age={max_age}, must-revalidate"
+    return "public, no-cache"
+
+
+def snapshot_response(name, params, build):
+    """
+    Serve a catalog view from its snapshot for the current catalog version.
+
+    name and params identify the view; build() returns the JSON-serializable
+    payload, or a (payload, headers) tuple, and only runs when no snapshot
+    exists for this catalog version.
+    A matching If-None-Match is answered with 304 straight from the snapshot.
+    """
+    version = current_catalog_version()
+    cache = get_cache("catalog_snapshots", current_app.config.get("CATALOG_SNAPSHOT_CACHE_SIZE", 256))
+    key = (name, tuple(sorted(params.items())), version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        payload, headers = build(), None
+        if isinstance(payload, tuple):
+            payload, headers = payload
+        snapshot = Snapshot(current_app.json.dumps(payload).encode("utf-8"), version, headers)
+        cache.put(key, snapshot)
+
+    gzipped = bool(request.accept_encodings["gzip"])
+    etag = snapshot.gzip_etag if gzipped else snapshot.etag
+    response = current_app.response_class(mimetype="application/json")
+    response.headers.update(snapshot.headers)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = _cache_control()
+    # Also on 304s, so caches keep the two encodings apart
+    response.vary.add("Accept-Encoding")
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    if gzipped:
+        response.set_data(snapshot.gzipped)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response.set_data(snapshot.body)
+    return response
@@ -1,6 +1,7 @@
 from extensions import db
 from models.user_stat import UserStat
 from models.activity_log import ActivityLog
+from services.review_service import GRADE_ACTIVITY, activity_topic, record_reviews
 
 
 def get_or_create_user_stat(user_id: str) -> UserStat:
@@ -24,11 +25,12 @@ def compute_level(best_score: float, activities: int) -> str:
     return "beginner"
 
 
-def record_activity(user_id: str, maqam_id: int, activity: str):
-    """Persist a single activity completion and bump counters."""
+def record_activity(user_id: str, maqam_id: int, activity: str, grade: int = GRADE_ACTIVITY):
+    """Persist a single activity completion, bump counters and schedule its review."""
     stat = get_or_create_user_stat(user_id)
     log = ActivityLog(user_id=user_id, maqam_id=maqam_id, activity=activity)
     db.session.add(log)
+    record_reviews(user_id, [(maqam_id, activity_topic(activity), grade)])
     stat.activities = (stat.activities or 0) + 1
     stat.level = compute_level(stat.best_score, stat.activities)
     db.session.commit()
@@ -0,0 +1,1601 @@
+"""
+Test suite for the Knowledge service.
+
+Tests cover:
+- Related maqamet graph (materialized similarity neighbours) and catalog write hooks
+- Duplicate detection of proposed maqamet (MinHash / LSH)
+- Normalized child tables and serialization of the JSON columns
+- SQL query counts of the catalog endpoints
+- Catalog snapshots, cursor pagination and sparse fieldsets
+- Change feed
+- Full-text search
+- NDJSON catalog import / export
+- Contributions: batch submission and review, review queue, leaderboard and merge pipeline
+- Audio storage, streaming and analysis
+- Jins audio previews
+"""
+
+import os
+import sys
+import json
+import pytest
+
+# Set up test environment
+TEST_DB_PATH = os.path.join(os.path.dirname(__file__), "test_knowledge.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+os.environ["TESTING"] = "1"
+os.environ["ALLOW_WEAK_SECRETS"] = "1"
+
+# Ensure project root is on path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app import create_app
+from extensions import db
+from models import Maqam, MaqamRelation, MaqamRegion, MaqamEmotionWeight, Jins, JinsNote
+from services.auth_service import issue_token
+
+
+@pytest.fixture(scope="function")
+def app():
+    """Create and configure a test application instance."""
+    application = create_app()
+    application.config.update({
+        "TESTING": True,
+        "AUDIO_ANALYSIS_WORKERS": 0,
+    })
+    with application.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_test_data()
+    yield application
+    # Cleanup
+    with application.app_context():
+        db.session.remove()
+        try:
+            db.engine.dispose()
+        except Exception:
+            pass
+        db.drop_all()
+    if os.path.exists(TEST_DB_PATH):
+        try:
+            os.remove(TEST_DB_PATH)
+        except PermissionError:
+            pass
+
+
+def seed_test_data():
+    """Seed database with a small catalog."""
+    rast = Maqam(
+        name_ar="راست",
+        name_en="Rast",
+        emotion="joy",
+        usage="weddings",
+        ajnas_json=json.dumps([{"name": {"en": "Rast"}, "notes": {"en": ["C", "D", "E-half-flat", "F"]}}]),
+        regions_json=json.dumps(["Tunis", "Sfax"]),
+        emotion_weights_json=json.dumps({"joy": 0.6}),
+        difficulty_label="beginner",
+        rarity_level="common",
+    )
+    dhail = Maqam(
+        name_ar="الذيل",
+        name_en="Al Dhail",
+        emotion="joy",
+        usage="Malouf",
+        ajnas_json=json.dumps([{"name": {"en": "Dhail Rast"}, "notes": {"en": ["G", "F", "E-half-flat", "D", "C"]}}]),
+        regions_json=json.dumps(["Tunis"]),
+        emotion_weights_json=json.dumps({"joy": 0.9}),
+        difficulty_label="intermediate",
+        rarity_level="common",
+    )
+    hijaz = Maqam(
+        name_ar="حجاز",
+        name_en="Hijaz",
+        emotion="longing",
+        usage="storytelling",
+        ajnas_json=json.dumps([{"name": {"en": "Hijaz"}, "notes": {"en": ["D", "Eb", "F#", "G"]}}]),
+        regions_json=json.dumps(["Gafsa"]),
+        difficulty_label="advanced",
+        rarity_level="at_risk",
+    )
+    sika = Maqam(
+        name_ar="سيكاه",
+        name_en="Sika",
+        emotion="sadness",
+        usage="religious",
+        ajnas_json=json.dumps([{"name": {"en": "Sika"}, "notes": {"en": ["E-half-flat", "F", "G"]}}]),
+        regions_json=json.dumps(["Sahel"]),
+        difficulty_label="advanced",
+        rarity_level="locally_rare",
+    )
+    db.session.add_all([rast, dhail, hijaz, sika])
+    db.session.commit()
+
+
+@pytest.fixture()
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+def admin_headers(app):
+    """Authorization header for an admin token."""
+    with app.app_context():
+        token = issue_token(sub="admin@test", role="admin", email="admin@test")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def related_names(client, name):
+    res = client.get(f"/knowledge/maqam/{name}/related")
+    assert res.status_code == 200
+    return [r["name"]["en"] for r in res.get_json()["related"]]
+
+
+# =============================================================================
+# Related Maqamet Graph Tests
+# =============================================================================
+
+class TestRelatedGraph:
+    """Tests for the materialized related-maqamet graph."""
+
+    def test_related_scored_without_graph_and_ranked(self, client, app):
+        """Without a graph, reads score on the fly and write nothing; shared emotion and region rank first."""
+        names = related_names(client, "Rast")
+        assert names[0] == "Al Dhail"
+        assert "Rast" not in names
+        with app.app_context():
+            assert MaqamRelation.query.count() == 0
+
+    def test_catalog_rebuild_command_materializes_graph(self, client, app):
+        """`flask catalog rebuild` stores the same ranking the reads computed."""
+        on_the_fly = related_names(client, "Rast")
+        result = app.test_cli_runner().invoke(args=["catalog", "rebuild"])
+        assert result.exit_code == 0
+        with app.app_context():
+            assert MaqamRelation.query.count() > 0
+        assert related_names(client, "Rast") == on_the_fly
+
+    def test_related_includes_similarity_score(self, client):
+        """Each neighbour carries its similarity score."""
+        res = client.get("/knowledge/maqam/rast/related")
+        related = res.get_json()["related"]
+        scores = [r["similarity"] for r in related]
+        assert scores == sorted(scores, reverse=True)
+        assert all(s > 0 for s in scores)
+
+    def test_related_unknown_maqam(self, client):
+        """Unknown maqam returns 404."""
+        res = client.get("/knowledge/maqam/Nope/related")
+        assert res.status_code == 404
+
+    def test_update_refreshes_neighbours(self, client, app):
+        """Editing a maqam updates its own and other maqamet's neighbours."""
+        assert related_names(client, "Sika")[0] != "Hijaz"
+        res = client.put(
+            "/knowledge/maqam/3",
+            json={"emotion": "sadness", "regions_json": json.dumps(["Sahel"])},
+            headers=admin_headers(app),
+        )
+        assert res.status_code == 200
+        assert related_names(client, "Sika")[0] == "Hijaz"
+        assert related_names(client, "Hijaz")[0] == "Sika"
+
+    def test_delete_removes_edges(self, client, app):
+        """Deleting a maqam drops it from every neighbour list."""
+        assert "Al Dhail" in related_names(client, "Rast")
+        res = client.delete("/knowledge/maqam/2", headers=admin_headers(app))
+        assert res.status_code == 200
+        assert "Al Dhail" not in related_names(client, "Rast")
+        with app.app_context():
+            assert MaqamRelation.query.filter(
+                (MaqamRelation.maqam_id == 2) | (MaqamRelation.related_id == 2)
+            ).count() == 0
+
+    def test_incremental_matches_full_rebuild(self, client, app):
+        """Incremental refresh yields the same graph as a full rebuild."""
+        from services.related_service import rebuild_related_graph
+
+        related_names(client, "Rast")
+        client.put("/knowledge/maqam/1", json={"emotion": "longing"}, headers=admin_headers(app))
+        with app.app_context():
+            incremental = sorted(
+                (r.maqam_id, r.related_id, r.rank) for r in MaqamRelation.query.all()
+            )
+            rebuild_related_graph()
+            db.session.commit()
+            full = sorted(
+                (r.maqam_id, r.related_id, r.rank) for r in MaqamRelation.query.all()
+            )
+        assert incremental == full
+
+
+# =============================================================================
+# Duplicate Detection Tests
+# =============================================================================
+
+class TestDuplicateDetection:
+    """Tests for MinHash/LSH near-duplicate detection of proposals."""
+
+    def test_near_duplicate_proposal_flagged(self, client, app):
+        """A proposal mirroring an existing maqam is attached to it."""
+        res = client.post(
+            "/knowledge/maqam",
+            json={
+                "name_en": "Rast ",
+                "name_ar": "راست",
+                "ajnas": [{"name": {"en": "Rast"}, "notes": {"en": ["C", "D", "E-half-flat", "F"]}}],
+            },
+            headers=admin_headers(app),
+        )
+        assert res.status_code == 201
+        duplicates = res.get_json()["duplicates"]
+        assert duplicates[0]["name_en"] == "Rast"
+        assert duplicates[0]["similarity"] >= 0.5
+
+        # Reviewers see the same hints in the moderation queue
+        queue = client.get("/knowledge/contributions?type=new_maqam", headers=admin_headers(app)).get_json()
+        assert [item["duplicates"] for item in queue] == [duplicates]
+
+    def test_distinct_proposal_not_flagged(self, client, app):
+        """A genuinely new maqam has no likely duplicates."""
+        res = client.post(
+            "/knowledge/maqam",
+            json={
+                "name_en": "Mezmoum",
+                "name_ar": "مزموم",
+                "ajnas": [{"name": {"en": "Mezmoum"}, "notes": {"en": ["F", "G", "A", "Bb"]}}],
+            },
+            headers=admin_headers(app),
+        )
+        assert res.status_code == 201
+        assert res.get_json()["duplicates"] == []
+
+    def test_index_follows_catalog_edits(self, client, app):
+        """Renaming a maqam re-buckets it in the LSH index."""
+        from services.dedup_service import find_duplicates
+
+        client.put("/knowledge/maqam/4", json={"name_en": "Sikah Tunsi", "name_ar": "سيكاه تونسي"},
+                   headers=admin_headers(app))
+        with app.app_context():
+            found = find_duplicates("Sikah Tunsi", "سيكاه تونسي",
+                                    [{"name": {"en": "Sika"}, "notes": {"en": ["E-half-flat", "F", "G"]}}])
+        assert [d["maqam_id"] for d in found] == [4]
+
+    def test_minhash_estimates_jaccard(self):
+        """Signature agreement approximates exact Jaccard similarity."""
+        from services.dedup_service import minhash_signature, NUM_PERM
+
+        a = {f"t{i}" for i in range(100)}
+        b = {f"t{i}" for i in range(50, 150)}
+        sig_a, sig_b = minhash_signature(a), minhash_signature(b)
+        estimate = sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+        assert abs(estimate - 1 / 3) < 0.15
+
+
+# =============================================================================
+# Normalized Child Table Tests
+# =============================================================================
+
+class TestNormalizedTables:
+    """Tests for the child tables mirrored from the maqam JSON columns."""
+
+    def test_rows_written_on_insert(self, app):
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            assert [r.key for r in rast.regions] == ["tunis", "sfax"]
+            assert [(w.emotion, w.weight) for w in rast.emotion_weights] == [("joy", 0.6)]
+            assert [n.note_en for n in rast.ajnas[0].notes] == ["C", "D", "E-half-flat", "F"]
+
+    def test_full_dict_matches_stored_json(self, client, app):
+        """Serialization returns the JSON columns as stored, whatever their shape."""
+        stored = {
+            "ajnas_json": json.dumps([
+                {"name": {"en": "Rast", "ar": "راست"}, "notes": {"en": ["C", "D"]}, "tonic": "C"},
+                "Bayati",
+                {"name": "Sikah"},
+            ]),
+            "emotion_weights_json": json.dumps({"Joy": 0.5, "calm": "0.2"}),
+            "regions_json": json.dumps(["Tunis", None]),
+            "historical_periods_json": json.dumps(["Hafsid"]),
+            "seasonal_usage_json": json.dumps(["Ramadan"]),
+        }
+        with app.app_context():
+            db.session.add(Maqam(name_ar="مقام", name_en="Odd", **stored))
+            db.session.commit()
+        # Output of to_dict_full before the child tables existed
+        baseline = {
+            "name": {"ar": "مقام", "en": "Odd"},
+            "emotion": {"en": None, "ar": None},
+            "usage": {"en": [], "ar": []},
+            "regions": {"en": ["Tunis", None], "ar": []},
+            "rarity_level": {"en": None, "ar": None},
+            "difficulty_label": {"en": None, "ar": None},
+            "ajnas": [
+                {"name": {"en": "Rast", "ar": "راست"}, "notes": {"en": ["C", "D"]}, "tonic": "C"},
+                "Bayati",
+                {"name": "Sikah"},
+            ],
+            "descriptions": {"ar": None, "en": None},
+            "related": None,
+            "difficulty_index": None,
+            "emotion_weights": {"Joy": 0.5, "calm": "0.2"},
+            "historical_periods": {"en": ["Hafsid"], "ar": []},
+            "seasonal_usage": {"en": ["Ramadan"], "ar": []},
+            "audio_urls": [],
+        }
+        data = client.get("/knowledge/maqam/by-name/Odd").get_json()
+        assert {k: v for k, v in data.items() if k in baseline} == baseline
+        assert set(data) - set(baseline) == {"id", "created_at", "version"}
+
+    def test_region_filter_ordered_by_mood(self, client):
+        res = client.get("/knowledge/maqam?region=TUNIS&mood=joy")
+        assert res.status_code == 200
+        assert [m["name"]["en"] for m in res.get_json()] == ["Al Dhail", "Rast"]
+
+    def test_update_resyncs_rows(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        res = client.put(
+            f"/knowledge/maqam/{rast_id}",
+            json={"regions_json": json.dumps(["Gafsa"]), "emotion_weights_json": json.dumps({"joy": 1.0})},
+            headers=admin_headers(app),
+        )
+        assert res.status_code == 200
+        assert res.get_json()["regions"]["en"] == ["Gafsa"]
+
+        names = [m["name"]["en"] for m in client.get("/knowledge/maqam?region=gafsa&mood=joy").get_json()]
+        assert names == ["Rast", "Hijaz"]
+        assert "Rast" not in [m["name"]["en"] for m in client.get("/knowledge/maqam?region=sfax").get_json()]
+
+    def test_delete_removes_rows(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        res = client.delete(f"/knowledge/maqam/{rast_id}", headers=admin_headers(app))
+        assert res.status_code == 200
+        with app.app_context():
+            assert MaqamRegion.query.filter_by(maqam_id=rast_id).count() == 0
+            assert Jins.query.filter_by(maqam_id=rast_id).count() == 0
+
+    def test_backfill_migration(self, app):
+        """The data migration rebuilds rows for catalogs written before the tables existed."""
+        from migrations import run_data_migrations, schema_migration
+
+        with app.app_context():
+            db.session.execute(schema_migration.delete())
+            for model in (JinsNote, Jins, MaqamRegion, MaqamEmotionWeight):
+                db.session.query(model).delete()
+            db.session.commit()
+
+            run_data_migrations()
+            db.session.expire_all()
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            assert [r.name_en for r in rast.regions] == ["Tunis", "Sfax"]
+            assert rast.ajnas[0].name_en == "Rast"
+            assert MaqamEmotionWeight.query.count() == 2
+
+
+# =============================================================================
+# Query Count Tests
+# =============================================================================
+
+def add_maqamet(app, count):
+    """Add maqamet, each with an audio and a contribution."""
+    from models import MaqamAudio, MaqamContribution
+
+    with app.app_context():
+        for i in range(count):
+            m = Maqam(
+                name_ar=f"مقام {i}",
+                name_en=f"Extra {i}",
+                emotion="joy",
+                ajnas_json=json.dumps([{"name": {"en": f"Jins {i}"}, "notes": {"en": ["C", "D"]}}]),
+                regions_json=json.dumps(["Tunis"]),
+                emotion_weights_json=json.dumps({"joy": 0.5}),
+                historical_periods_json=json.dumps(["modern"]),
+                seasonal_usage_json=json.dumps(["summer"]),
+            )
+            db.session.add(m)
+            db.session.flush()
+            db.session.add(MaqamAudio(maqam_id=m.id, url=f"/static/audio/{i}.mp3"))
+            db.session.add(MaqamContribution(
+                maqam_id=m.id, contributor_id="learner@test", type="fact",
+                payload_json=json.dumps({"text": "note"}), status="pending",
+            ))
+        db.session.commit()
+
+
+def query_count(client, url):
+    res = client.get(url)
+    assert res.status_code == 200
+    return int(res.headers["X-SQL-Queries"])
+
+
+class TestQueryCounts:
+    """Catalog serialization costs a constant number of SQL statements."""
+
+    @pytest.fixture(autouse=True)
+    def _count_queries(self, app):
+        app.config["SQL_QUERY_COUNT_HEADER"] = True
+
+    @pytest.mark.parametrize("url", [
+        "/knowledge/maqam",
+        "/knowledge/maqam?region=tunis&mood=joy",
+        "/knowledge/regions",
+        "/knowledge/maqam/Rast/related",
+    ])
+    def test_constant_queries(self, client, app, url):
+        from services.related_service import rebuild_related_graph
+        with app.app_context():
+            rebuild_related_graph()
+            db.session.commit()
+        before = query_count(client, url)
+        add_maqamet(app, 6)
+        with app.app_context():
+            rebuild_related_graph()
+            db.session.commit()
+        assert query_count(client, url) == before
+
+    def test_contribution_list_constant(self, client, app):
+        add_maqamet(app, 1)
+        with app.app_context():
+            maqam_id = Maqam.query.filter_by(name_en="Extra 0").first().id
+        assert query_count(client, f"/knowledge/maqam/{maqam_id}/contributions") <= 2
+
+    def test_search_loads_hits_once(self, client):
+        """Search reads its hits and their maqam rows; serialization loads no child rows."""
+        assert query_count(client, "/knowledge/search?q=rast") == 2
+
+
+# =============================================================================
+# Catalog Snapshot Tests
+# =============================================================================
+
+class TestCatalogSnapshots:
+    """Tests for the pre-serialized catalog views."""
+
+    @pytest.fixture(autouse=True)
+    def _config(self, app):
+        app.config["SQL_QUERY_COUNT_HEADER"] = True
+        app.config["CATALOG_VERSION_POLL_SECONDS"] = 60
+
+    def test_etag_and_cache_control(self, client):
+        res = client.get("/knowledge/maqam")
+        assert res.status_code == 200
+        assert res.headers["ETag"].startswith('"v')
+        assert res.headers["Cache-Control"] == "public, no-cache"
+        assert len(res.get_json()) == 4
+
+    def test_not_modified_without_queries(self, client):
+        etag = client.get("/knowledge/regions").headers["ETag"]
+        res = client.get("/knowledge/regions", headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.data == b""
+        assert res.headers["X-SQL-Queries"] == "0"
+
+    def test_gzip_encoding(self, client):
+        import gzip
+
+        plain = client.get("/knowledge/maqam")
+        res = client.get("/knowledge/maqam", headers={"Accept-Encoding": "gzip"})
+        assert res.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in res.headers["Vary"]
+        assert gzip.decompress(res.data) == plain.data
+        # One strong ETag per encoding, and each only validates its own encoding
+        gz_etag = res.headers["ETag"]
+        assert gz_etag != plain.headers["ETag"] and gz_etag.endswith('-gz"')
+        res = client.get("/knowledge/maqam", headers={"Accept-Encoding": "gzip", "If-None-Match": gz_etag})
+        assert res.status_code == 304 and res.headers["ETag"] == gz_etag
+        assert "Accept-Encoding" in res.headers["Vary"]
+        res = client.get("/knowledge/maqam", headers={"If-None-Match": gz_etag})
+        assert res.status_code == 200 and res.data == plain.data
+
+    def test_knowledge_write_changes_etag(self, client, app):
+        etag = client.get("/knowledge/maqam").headers["ETag"]
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        client.put(f"/knowledge/maqam/{rast_id}", json={"emotion": "calm"}, headers=admin_headers(app))
+
+        res = client.get("/knowledge/maqam", headers={"If-None-Match": etag})
+        assert res.status_code == 200
+        assert res.headers["ETag"] != etag
+        assert "calm" in [m["emotion"]["en"] for m in res.get_json()]
+
+
+# =============================================================================
+# Pagination and Sparse Fieldset Tests
+# =============================================================================
+
+def collect_pages(client, url):
+    """Follow X-Next-Cursor until the last page; return the pages."""
+    pages = []
+    while url:
+        res = client.get(url)
+        assert res.status_code == 200
+        pages.append(res.get_json())
+        link = res.headers.get("Link")
+        url = link[1:link.index(">")] if link else None
+    return pages
+
+
+class TestCatalogPagination:
+    """Tests for limit/cursor pagination, fields= and lang= on the catalog listing."""
+
+    def test_keyset_pages_cover_catalog(self, client):
+        pages = collect_pages(client, "/knowledge/maqam?limit=3&fields=id")
+        assert [len(p) for p in pages] == [3, 1]
+        ids = [m["id"] for page in pages for m in page]
+        assert ids == sorted(ids) and len(set(ids)) == 4
+
+    def test_next_cursor_header(self, client):
+        res = client.get("/knowledge/maqam?limit=2")
+        cursor = res.headers["X-Next-Cursor"]
+        assert f"cursor={cursor}" in res.headers["Link"]
+        last = client.get(f"/knowledge/maqam?limit=2&cursor={cursor}")
+        assert "X-Next-Cursor" not in last.headers
+
+    def test_pages_follow_mood_order(self, client):
+        pages = collect_pages(client, "/knowledge/maqam?mood=joy&limit=1&fields=name")
+        names = [m["name"]["en"] for page in pages for m in page]
+        assert names[:2] == ["Al Dhail", "Rast"]
+        assert sorted(names) == ["Al Dhail", "Hijaz", "Rast", "Sika"]
+
+    def test_sparse_fields(self, client):
+        data = client.get("/knowledge/maqam?fields=id,name,regions").get_json()
+        assert set(data[0]) == {"id", "name", "regions"}
+        assert data[0]["name"]["en"] == "Rast"
+
+    def test_lang_drops_other_language(self, client):
+        data = client.get("/knowledge/maqam?fields=name,ajnas&lang=ar").get_json()
+        assert data[0]["name"] == {"ar": "راست"}
+        assert data[0]["ajnas"][0]["name"] == {"ar": None}
+
+    @pytest.mark.parametrize("query", ["limit=0", "limit=abc", "cursor=%%%", "fields=id,bogus", "lang=fr"])
+    def test_invalid_parameters(self, client, query):
+        res = client.get(f"/knowledge/maqam?{query}")
+        assert res.status_code == 400
+        assert "error" in res.get_json()
+
+
+# =============================================================================
+# Change Feed Tests
+# =============================================================================
+
+def feed(client, since=0, **params):
+    res = client.get("/knowledge/changes", query_string={"since": since, **params})
+    assert res.status_code == 200
+    return res.get_json()
+
+
+class TestChangeFeed:
+    """Tests for the delta-sync change feed."""
+
+    def test_inserts_recorded(self, client):
+        data = feed(client)
+        names = [c["data"]["name"]["en"] for c in data["changes"] if c["entity"] == "maqam"]
+        assert names == ["Rast", "Al Dhail", "Hijaz", "Sika"]
+        assert all(c["op"] == "upsert" for c in data["changes"])
+        assert data["has_more"] is False
+
+    def test_update_returns_only_changed_maqam(self, client, app):
+        since = feed(client)["next_since"]
+        with app.app_context():
+            hijaz_id = Maqam.query.filter_by(name_en="Hijaz").first().id
+        client.put(f"/knowledge/maqam/{hijaz_id}", json={"description_en": "Edited"}, headers=admin_headers(app))
+
+        data = feed(client, since)
+        assert [(c["entity"], c["id"], c["op"]) for c in data["changes"]] == [("maqam", hijaz_id, "upsert")]
+        assert data["changes"][0]["data"]["descriptions"]["en"] == "Edited"
+        assert data["next_since"] > since
+        assert feed(client, data["next_since"])["changes"] == []
+
+    def test_delete_and_audio_tombstones(self, client, app):
+        from models import MaqamAudio
+
+        with app.app_context():
+            sika = Maqam.query.filter_by(name_en="Sika").first()
+            sika_id = sika.id
+            db.session.add(MaqamAudio(maqam_id=sika_id, url="/static/audio/sika.mp3"))
+            db.session.commit()
+        since = feed(client)["next_since"]
+        client.delete(f"/knowledge/maqam/{sika_id}", headers=admin_headers(app))
+
+        ops = {(c["entity"], c["op"]) for c in feed(client, since)["changes"]}
+        assert ops == {("maqam", "delete"), ("audio", "delete")}
+
+    def test_contribution_acceptance_recorded(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        res = client.post(
+            f"/knowledge/maqam/{rast_id}/contributions",
+            json={"type": "anecdote", "payload": {"text": "Heard at a wedding"}},
+            headers=admin_headers(app),
+        )
+        contrib_id = res.get_json()["id"]
+        since = feed(client)["next_since"]
+        client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": "accepted"},
+                    headers=admin_headers(app))
+
+        entries = [c for c in feed(client, since)["changes"] if c["entity"] == "contribution"]
+        assert [(c["id"], c["data"]["status"]) for c in entries] == [(contrib_id, "accepted")]
+
+    def test_paginated(self, client):
+        first = feed(client, limit=3)
+        assert len(first["changes"]) == 3 and first["has_more"] is True
+        rest = feed(client, first["next_since"], limit=3)
+        assert len(rest["changes"]) == 1 and rest["has_more"] is False
+
+    def test_invalid_since(self, client):
+        assert client.get("/knowledge/changes?since=-1").status_code == 400
+        assert client.get("/knowledge/changes?since=x").status_code == 400
+
+
+# =============================================================================
+# Search Tests
+# =============================================================================
+
+def search(client, q):
+    res = client.get("/knowledge/search", query_string={"q": q})
+    assert res.status_code == 200
+    return res.get_json()["results"]
+
+
+class TestSearch:
+    """Tests for /knowledge/search."""
+
+    def test_latin_name_ranked_and_highlighted(self, client):
+        results = search(client, "hij")
+        assert results[0]["maqam"]["name"]["en"] == "Hijaz"
+        assert results[0]["highlights"]["name_en"] == "<mark>Hijaz</mark>"
+
+    def test_arabic_folding_and_article(self, client):
+        # Diacritics in the query are ignored; "ذيل" finds "الذيل"
+        assert search(client, "سِيكاه")[0]["maqam"]["name"]["en"] == "Sika"
+        result = search(client, "ذيل")[0]
+        assert result["maqam"]["name"]["en"] == "Al Dhail"
+        assert result["highlights"]["name_ar"] == "<mark>الذيل</mark>"
+
+    def test_transliteration_matches_arabic_only_name(self, client, app):
+        with app.app_context():
+            db.session.add(Maqam(name_ar="محير", name_en="Unlisted"))
+            db.session.commit()
+        assert [r["maqam"]["name"]["en"] for r in search(client, "mhir")] == ["Unlisted"]
+
+    def test_index_follows_edits(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        client.put(f"/knowledge/maqam/{rast_id}", json={"description_en": "Played at zardas festivals"},
+                   headers=admin_headers(app))
+        result = search(client, "zardas")[0]
+        assert result["maqam"]["id"] == rast_id
+        assert "<mark>zardas</mark>" in result["highlights"]["description_en"]
+
+        client.delete(f"/knowledge/maqam/{rast_id}", headers=admin_headers(app))
+        assert search(client, "zardas") == []
+
+    def test_fallback_scan_matches_fts(self, app):
+        from services.search_service import _query_terms, _search_fts, _search_scan
+
+        with app.app_context():
+            for q in ["rast", "hijaz", "ذيل", "sika"]:
+                terms = _query_terms(q)
+                assert {i for i, _ in _search_scan(terms, [], 20)} == {i for i, _ in _search_fts(terms, [], 20)}
+
+    def test_query_required(self, client):
+        assert client.get("/knowledge/search").status_code == 400
+
+
+# =============================================================================
+# NDJSON Import / Export Tests
+# =============================================================================
+
+def ndjson(*records):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+
+class TestCatalogImportExport:
+    """Tests for NDJSON catalog export and import."""
+
+    def test_export_streams_one_maqam_per_line(self, client):
+        res = client.get("/knowledge/export")
+        assert res.status_code == 200
+        assert res.mimetype == "application/x-ndjson"
+        records = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        assert [r["name_en"] for r in records] == ["Rast", "Al Dhail", "Hijaz", "Sika"]
+        assert records[0]["regions"] == ["Tunis", "Sfax"]
+        assert records[0]["ajnas"][0]["name"] == {"en": "Rast"}
+
+    def test_import_requires_admin(self, client):
+        res = client.post("/knowledge/import", data=ndjson({"name_en": "X", "name_ar": "س"}))
+        assert res.status_code == 401
+
+    def test_import_upserts(self, client, app):
+        body = ndjson(
+            {"name_en": "rast", "name_ar": "راست", "description_en": "Updated by import"},
+            {"name_en": "Nahawand", "name_ar": "نهاوند", "regions": ["Bizerte"],
+             "ajnas": [{"name": {"en": "Nahawand"}, "notes": {"en": ["C", "D", "Eb", "F"]}}],
+             "audio_urls": ["/static/audio/nahawand.mp3"]},
+        )
+        res = client.post("/knowledge/import", data=body, headers=admin_headers(app),
+                          content_type="application/x-ndjson")
+        assert res.status_code == 200
+        assert res.get_json() == {"created": 1, "updated": 1, "audios": 1}
+
+        rast = client.get("/knowledge/maqam/by-name/Rast").get_json()
+        assert rast["descriptions"]["en"] == "Updated by import"
+        assert rast["regions"]["en"] == ["Tunis", "Sfax"]
+        nahawand = client.get("/knowledge/maqam?region=bizerte").get_json()
+        assert [m["audio_urls"] for m in nahawand] == [["/static/audio/nahawand.mp3"]]
+        assert search(client, "nahawand")[0]["maqam"]["name"]["en"] == "Nahawand"
+
+    def test_invalid_line_imports_nothing(self, client, app):
+        body = ndjson({"name_en": "Kurd", "name_ar": "كرد"}) + "{not json\n"
+        res = client.post("/knowledge/import", data=body, headers=admin_headers(app))
+        assert res.status_code == 400
+        assert res.get_json()["line"] == 2
+        with app.app_context():
+            assert Maqam.query.filter_by(name_en="Kurd").count() == 0
+
+    def test_chunked_import(self, app):
+        from services.catalog_io_service import import_lines
+
+        lines = [json.dumps({"name_en": f"Bulk {i}", "name_ar": f"م {i}", "audio_urls": [f"/a/{i}.mp3"]})
+                 for i in range(7)]
+        with app.app_context():
+            stats = import_lines(lines, chunk_size=3)
+            db.session.commit()
+            assert stats == {"created": 7, "updated": 0, "audios": 7}
+            assert Maqam.query.count() == 11
+
+    def test_chunked_import_refreshes_derived_rows(self, app, monkeypatch):
+        """Per-maqam derived rows are written per chunk, the related graph is refreshed once."""
+        from models import CatalogChange, MaqamLshBucket, MaqamRelation
+        from services import catalog_service
+        from services.catalog_io_service import import_lines
+
+        def full_rebuild(*args, **kwargs):
+            raise AssertionError("import must not rebuild the whole catalog")
+
+        refreshes = []
+
+        def refresh_related(updated_ids=(), deleted_ids=()):
+            refreshes.append(sorted(updated_ids))
+            return related_refresh(updated_ids=updated_ids, deleted_ids=deleted_ids)
+
+        related_refresh = catalog_service.refresh_related
+        monkeypatch.setattr(catalog_service, "catalog_rebuilt", full_rebuild)
+        monkeypatch.setattr(catalog_service, "rebuild_lsh_index", full_rebuild)
+        monkeypatch.setattr(catalog_service, "refresh_related", refresh_related)
+        lines = [json.dumps({"name_en": f"Bulk {i}", "name_ar": f"م {i}", "emotion": "joy",
+                             "regions": ["Tunis"]}) for i in range(7)]
+        lines.append(json.dumps({"name_en": "rast", "name_ar": "راست", "usage": "imported"}))
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").one()
+            rast_id, rast_version = rast.id, rast.version
+            stats = import_lines(lines, chunk_size=3)
+            db.session.commit()
+            assert stats == {"created": 7, "updated": 1, "audios": 0}
+            rast = db.session.get(Maqam, rast_id)
+            assert rast.usage == "imported" and rast.version == rast_version + 1
+            bulk_ids = {m.id for m in Maqam.query.filter(Maqam.name_en.like("Bulk %"))}
+            assert {r.maqam_id for r in MaqamLshBucket.query.filter(MaqamLshBucket.maqam_id.in_(bulk_ids))} == bulk_ids
+            assert {r.maqam_id for r in MaqamRelation.query.filter(MaqamRelation.maqam_id.in_(bulk_ids))} == bulk_ids
+            changed = {c.maqam_id for c in CatalogChange.query.filter_by(entity="maqam", op="upsert")}
+            assert bulk_ids | {rast.id} <= changed
+            assert refreshes == [sorted(bulk_ids | {rast.id})]
+
+    def test_import_matches_names_like_python(self, app):
+        """Padded and non-ASCII names match the same maqam across lines and chunks."""
+        from models import MaqamAudio
+        from services.catalog_io_service import import_lines
+
+        lines = [
+            json.dumps({"name_en": " Rast ", "name_ar": "راست", "audio_urls": ["/a/rast.mp3"]}),
+            json.dumps({"name_en": "Émir", "name_ar": "أمير"}),
+            json.dumps({"name_en": "ÉMIR ", "name_ar": "أمير", "usage": "second"}),
+        ]
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").one().id
+            stats = import_lines(lines, chunk_size=2)
+            stats2 = import_lines(lines[1:2], chunk_size=2)
+            db.session.commit()
+            assert stats == {"created": 1, "updated": 2, "audios": 1}
+            assert stats2["updated"] == 1
+            emir = Maqam.query.filter(Maqam.name_ar == "أمير").all()
+            assert len(emir) == 1 and emir[0].usage == "second"
+            assert [a.url for a in MaqamAudio.query.filter_by(maqam_id=rast_id)] == ["/a/rast.mp3"]
+
+    def test_cli_round_trip(self, app, tmp_path):
+        runner = app.test_cli_runner()
+        out = tmp_path / "catalog.ndjson"
+        assert runner.invoke(args=["catalog", "export", "-o", str(out)]).exit_code == 0
+        assert len(out.read_text(encoding="utf-8").splitlines()) == 4
+
+        result = runner.invoke(args=["catalog", "import", str(out)])
+        assert result.exit_code == 0
+        assert "0 created, 4 updated" in result.output
+
+
+# =============================================================================
+# Batch Contribution Tests
+# =============================================================================
+
+def learner_headers(app):
+    with app.app_context():
+        token = issue_token(sub="learner@test", role="learner", email="learner@test")
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestBatchContributions:
+    """Tests for batch contribution submission and review."""
+
+    def maqam_ids(self, app):
+        with app.app_context():
+            return [m.id for m in Maqam.query.order_by(Maqam.id)]
+
+    def test_submit_reports_per_item_results(self, client, app):
+        rast_id, dhail_id = self.maqam_ids(app)[:2]
+        items = [
+            {"maqam_id": rast_id, "type": "note", "payload": {"text": "a"}},
+            {"maqam_id": dhail_id, "payload": {"text": "missing type"}},
+            {"maqam_id": 9999, "type": "note", "payload": {}},
+            {"maqam_id": dhail_id, "type": "usage", "payload": {"usage": "weddings"}},
+        ]
+        res = client.post("/knowledge/contributions/batch", json={"contributions": items},
+                          headers=learner_headers(app))
+        assert res.status_code == 200
+        body = res.get_json()
+        assert (body["created"], body["failed"]) == (2, 2)
+        results = body["results"]
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert "type" in results[1]["details"]
+        assert results[2]["error"] == "Maqam not found"
+
+        stored = client.get(f"/knowledge/maqam/{dhail_id}/contributions").get_json()
+        assert [(c["id"], c["payload"], c["contributor_id"]) for c in stored] == [
+            (results[3]["id"], {"usage": "weddings"}, "learner@test")
+        ]
+
+    def test_batch_limits(self, client, app):
+        headers = learner_headers(app)
+        assert client.post("/knowledge/contributions/batch", json={"contributions": []},
+                           headers=headers).status_code == 400
+        from services.contribution_service import MAX_BATCH_SIZE
+        items = [{"maqam_id": 1, "type": "note", "payload": {}}] * (MAX_BATCH_SIZE + 1)
+        assert client.post("/knowledge/contributions/batch", json={"contributions": items},
+                           headers=headers).status_code == 400
+
+    def test_review_batch(self, client, app):
+        rast_id = self.maqam_ids(app)[0]
+        items = [{"maqam_id": rast_id, "type": "note", "payload": {"n": i}} for i in range(3)]
+        res = client.post("/knowledge/contributions/batch", json={"contributions": items},
+                          headers=learner_headers(app))
+        ids = [r["id"] for r in res.get_json()["results"]]
+        since = feed(client)["next_since"]
+
+        reviews = [
+            {"id": ids[0], "status": "accepted"},
+            {"id": ids[1], "status": "rejected"},
+            {"id": ids[0], "status": "rejected"},
+            {"id": 9999, "status": "accepted"},
+            {"id": ids[2], "status": "maybe"},
+        ]
+        assert client.post("/knowledge/contributions/review/batch", json={"reviews": reviews},
+                           headers=learner_headers(app)).status_code == 403
+        res = client.post("/knowledge/contributions/review/batch", json={"reviews": reviews},
+                          headers=admin_headers(app))
+        body = res.get_json()
+        assert (body["reviewed"], body["failed"]) == (2, 3)
+        assert body["results"][0] == {"index": 0, "id": ids[0], "status": "accepted", "contributor_score": 1}
+        assert "error" in body["results"][2]
+
+        statuses = {c["id"]: c["status"] for c in client.get(f"/knowledge/maqam/{rast_id}/contributions").get_json()}
+        assert statuses == {ids[0]: "accepted", ids[1]: "rejected", ids[2]: "pending"}
+        changes = feed(client, since)["changes"]
+        assert [(c["entity"], c["id"]) for c in changes if c["entity"] == "contribution"] == [("contribution", ids[0])]
+
+
+# =============================================================================
+# Contributor Leaderboard Tests
+# =============================================================================
+
+def aggregate_leaderboard():
+    """The leaderboard computed directly from the contributions."""
+    from sqlalchemy import func
+    from models import MaqamContribution
+
+    rows = (
+        db.session.query(MaqamContribution.contributor_id, func.count(MaqamContribution.id),
+                         func.sum(MaqamContribution.contributor_score))
+        .filter(MaqamContribution.status == "accepted")
+        .group_by(MaqamContribution.contributor_id)
+    )
+    return {c: (n, s) for c, n, s in rows}
+
+
+class TestContributorLeaderboard:
+    """Tests for the incrementally maintained contributor_stat table."""
+
+    def contribute(self, app, contributors):
+        from models import MaqamContribution
+
+        with app.app_context():
+            maqam_id = Maqam.query.first().id
+            contribs = [MaqamContribution(maqam_id=maqam_id, type="note", payload_json="{}", contributor_id=c)
+                        for c in contributors]
+            db.session.add_all(contribs)
+            db.session.commit()
+            return [c.id for c in contribs]
+
+    def review(self, client, app, contrib_id, status):
+        res = client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": status},
+                          headers=admin_headers(app))
+        assert res.status_code == 200
+
+    def test_reviews_update_leaderboard(self, client, app):
+        ids = self.contribute(app, ["a@test", "a@test", "b@test", "c@test"])
+        for contrib_id in ids[:3]:
+            self.review(client, app, contrib_id, "accepted")
+        self.review(client, app, ids[3], "rejected")
+
+        body = client.get("/knowledge/top-contributors").get_json()
+        assert body["contributors"] == [
+            {"contributor_id": "a@test", "total_contributions": 2, "total_score": 2},
+            {"contributor_id": "b@test", "total_contributions": 1, "total_score": 1},
+        ]
+
+    def test_unaccept_and_reaccept(self, client, app):
+        ids = self.contribute(app, ["a@test", "b@test"])
+        self.review(client, app, ids[0], "accepted")
+        self.review(client, app, ids[0], "accepted")
+        self.review(client, app, ids[1], "accepted")
+        self.review(client, app, ids[1], "rejected")
+        res = client.post("/knowledge/contributions/review/batch", headers=admin_headers(app),
+                          json={"reviews": [{"id": ids[1], "status": "accepted"}]})
+        assert res.status_code == 200
+
+        with app.app_context():
+            from models import ContributorStat
+
+            stats = {s.contributor_id: (s.accepted_count, s.total_score) for s in ContributorStat.query}
+            assert stats == aggregate_leaderboard() == {"a@test": (1, 2), "b@test": (1, 2)}
+
+    def test_backfill_command(self, client, app):
+        from models import ContributorStat, MaqamContribution
+
+        ids = self.contribute(app, ["a@test", "b@test", "b@test"])
+        with app.app_context():
+            # Rows written behind the ORM's back are only picked up by a rebuild
+            db.session.query(MaqamContribution).filter(MaqamContribution.id.in_(ids)).update(
+                {"status": "accepted", "contributor_score": 3}, synchronize_session=False)
+            db.session.commit()
+            assert ContributorStat.query.count() == 0
+
+        result = app.test_cli_runner().invoke(args=["contributions", "backfill-stats"])
+        assert result.exit_code == 0
+        assert "2 contributors" in result.output
+        with app.app_context():
+            stats = {s.contributor_id: (s.accepted_count, s.total_score) for s in ContributorStat.query}
+            assert stats == aggregate_leaderboard() == {"a@test": (1, 3), "b@test": (2, 6)}
+
+
+# =============================================================================
+# Review Queue Tests
+# =============================================================================
+
+class TestReviewQueue:
+    """Tests for the cross-maqam contribution review queue."""
+
+    @pytest.fixture(autouse=True)
+    def _contributions(self, app):
+        from models import MaqamContribution
+
+        with app.app_context():
+            maqam_ids = [m.id for m in Maqam.query.order_by(Maqam.id)]
+            db.session.add_all([
+                MaqamContribution(
+                    maqam_id=maqam_ids[i % len(maqam_ids)], type="note" if i % 3 else "usage",
+                    payload_json=json.dumps({"n": i}), contributor_id=f"user{i % 2}@test",
+                    status="accepted" if i % 5 == 4 else "pending",
+                )
+                for i in range(15)
+            ])
+            db.session.commit()
+
+    def pages(self, client, app, url):
+        items = []
+        while url:
+            res = client.get(url, headers=admin_headers(app))
+            assert res.status_code == 200
+            items.extend(res.get_json())
+            cursor = res.headers.get("X-Next-Cursor")
+            url = res.headers["Link"].split(">")[0].lstrip("<") if cursor else None
+        return items
+
+    def test_pending_pages_oldest_first(self, client, app):
+        items = self.pages(client, app, "/knowledge/contributions?limit=4")
+        assert len(items) == 12 and not any("payload" in i for i in items)
+        assert [i["id"] for i in items] == sorted(i["id"] for i in items)
+        assert {i["status"] for i in items} == {"pending"}
+        assert set(items[0]) == {"id", "maqam_id", "maqam_name", "type", "status", "contributor_id", "duplicates",
+                                 "created_at"}
+
+    def test_filters_and_payload(self, client, app):
+        items = self.pages(client, app, "/knowledge/contributions?type=usage&contributor=user0@test"
+                                        "&include_payload=1&limit=1")
+        assert [i["payload"]["n"] for i in items] == [0, 6, 12]
+        accepted = self.pages(client, app, "/knowledge/contributions?status=accepted")
+        assert [i["contributor_id"] for i in accepted] == ["user0@test", "user1@test", "user0@test"]
+
+    def test_every_page_keeps_duplicate_hints(self, client, app):
+        from models import MaqamContribution
+
+        hints = [[{"maqam_id": 1, "name_en": "Rast", "similarity": 0.8}], [], [{"maqam_id": 2, "similarity": 0.6}]]
+        with app.app_context():
+            db.session.add_all([
+                MaqamContribution(type="new_maqam", payload_json=json.dumps({"n": i}), status="pending",
+                                  duplicates_json=json.dumps(hint) if hint else None)
+                for i, hint in enumerate(hints)
+            ])
+            db.session.commit()
+        for extra in ("", "&include_payload=1"):
+            items = self.pages(client, app, f"/knowledge/contributions?type=new_maqam&limit=1{extra}")
+            assert [i["duplicates"] for i in items] == hints
+
+    def test_admin_only_and_invalid_params(self, client, app):
+        assert client.get("/knowledge/contributions", headers=learner_headers(app)).status_code == 403
+        for query in ["status=maybe", "limit=0", "cursor=garbage"]:
+            res = client.get(f"/knowledge/contributions?{query}", headers=admin_headers(app))
+            assert res.status_code == 400
+
+    def test_queue_uses_index(self, app):
+        from sqlalchemy import text
+
+        with app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM maqam_contribution WHERE status = 'pending' "
+                "ORDER BY created_at, id LIMIT 51"
+            )).all()
+        assert "ix_maqam_contribution_status_created" in " ".join(str(r) for r in plan)
+
+    def test_field_edit_contribution(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        body = {"maqam_id": rast_id, "field": "description_en", "new_value": "Bright", "notes": "From a master class"}
+        res = client.post("/knowledge/contributions", json=body, headers=learner_headers(app))
+        assert res.status_code == 201
+        items = self.pages(client, app, "/knowledge/contributions?type=field_edit&include_payload=1")
+        assert items[0]["payload"] == {
+            "field": "description_en", "new_value": "Bright", "notes": "From a master class", "base_version": 1,
+        }
+
+        bad = dict(body, field="id")
+        assert client.post("/knowledge/contributions", json=bad, headers=learner_headers(app)).status_code == 400
+        missing = dict(body, maqam_id=9999)
+        assert client.post("/knowledge/contributions", json=missing, headers=learner_headers(app)).status_code == 404
+
+
+# =============================================================================
+# Merge Pipeline Tests
+# =============================================================================
+
+class TestMergePipeline:
+    """Tests for applying accepted contributions to the catalog."""
+
+    def rast_id(self, app):
+        with app.app_context():
+            return Maqam.query.filter_by(name_en="Rast").first().id
+
+    def propose_edit(self, client, app, field, value):
+        res = client.post("/knowledge/contributions", headers=learner_headers(app),
+                          json={"maqam_id": self.rast_id(app), "field": field, "new_value": value})
+        assert res.status_code == 201
+        return res.get_json()["id"]
+
+    def test_accepted_new_maqam_created(self, client, app):
+        res = client.post("/knowledge/maqam", headers=learner_headers(app), json={
+            "name_en": "Mhayyer Sika", "name_ar": "محير سيكاه", "regions": ["Kairouan"],
+            "ajnas": [{"name": {"en": "Sika"}, "notes": {"en": ["E-half-flat", "F", "G"]}}],
+        })
+        contrib_id = res.get_json()["id"]
+        res = client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": "accepted"},
+                          headers=admin_headers(app))
+        assert res.status_code == 200
+        body = res.get_json()
+        assert body["applied"] is True
+        maqam = client.get(f"/knowledge/maqam/{body['maqam_id']}").get_json()
+        assert maqam["regions"]["en"] == ["Kairouan"]
+        assert maqam["version"] == 1
+        assert search(client, "mhayyer")[0]["maqam"]["id"] == body["maqam_id"]
+
+    def test_accepted_field_edit_bumps_version(self, client, app):
+        contrib_id = self.propose_edit(client, app, "regions_json", ["Tunis", "Sfax", "Bizerte"])
+        res = client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": "accepted"},
+                          headers=admin_headers(app))
+        assert res.get_json()["applied"] is True
+        rast = client.get(f"/knowledge/maqam/{self.rast_id(app)}").get_json()
+        assert rast["regions"]["en"] == ["Tunis", "Sfax", "Bizerte"]
+        assert rast["version"] == 2
+        assert [m["name"]["en"] for m in client.get("/knowledge/maqam?region=bizerte").get_json()] == ["Rast"]
+
+    def test_rejected_edit_not_applied(self, client, app):
+        contrib_id = self.propose_edit(client, app, "description_en", "Never applied")
+        client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": "rejected"},
+                    headers=admin_headers(app))
+        assert client.get(f"/knowledge/maqam/{self.rast_id(app)}").get_json()["version"] == 1
+
+    def test_stale_update_rejected(self, client, app):
+        rast_id = self.rast_id(app)
+        res = client.put(f"/knowledge/maqam/{rast_id}", json={"description_en": "First", "version": 1},
+                         headers=admin_headers(app))
+        assert res.status_code == 200 and res.get_json()["version"] == 2
+        res = client.put(f"/knowledge/maqam/{rast_id}", json={"description_en": "Second"},
+                         headers={**admin_headers(app), "If-Match": '"1"'})
+        assert res.status_code == 409
+        assert res.get_json()["current_version"] == 2
+
+    def test_concurrent_write_conflicts(self, app):
+        from sqlalchemy import text
+        from models import MaqamContribution
+        from services.merge_service import MergeConflict, apply_contribution
+
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            contrib = MaqamContribution(maqam_id=rast.id, type="field_edit", status="accepted",
+                                        payload_json=json.dumps({"field": "emotion", "new_value": "calm"}))
+            db.session.add(contrib)
+            db.session.commit()
+            assert rast.version == 1
+            # Another worker updates the row after this session loaded it
+            with db.engine.begin() as conn:
+                conn.execute(text("UPDATE maqam SET version = version + 1 WHERE id = :id"), {"id": rast.id})
+            with pytest.raises(MergeConflict):
+                apply_contribution(contrib)
+            db.session.rollback()
+
+    def test_invalid_values_rejected_on_submission(self, client, app):
+        rast_id = self.rast_id(app)
+        for field, value in (("name_en", None), ("difficulty_index", "hard"), ("emotion", "x" * 51)):
+            res = client.post("/knowledge/contributions", headers=learner_headers(app),
+                              json={"maqam_id": rast_id, "field": field, "new_value": value})
+            assert res.status_code == 400
+            assert "new_value" in res.get_json()["details"]
+        res = client.post("/knowledge/contributions/batch", headers=learner_headers(app), json={"contributions": [
+            {"maqam_id": rast_id, "type": "field_edit", "payload": {"field": "name_en", "new_value": None}},
+            {"maqam_id": rast_id, "type": "field_edit", "payload": {"field": "difficulty_index", "new_value": 2}},
+        ]})
+        results = res.get_json()["results"]
+        assert "payload" in results[0]["details"] and results[1]["status"] == "pending"
+
+    def test_invalid_stored_edits_conflict(self, client, app):
+        """Edits stored before values were validated conflict instead of failing the request."""
+        from models import MaqamContribution
+
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            edits = [MaqamContribution(maqam_id=rast.id, type="field_edit", status="pending",
+                                       payload_json=json.dumps({"field": field, "new_value": value}))
+                     for field, value in (("name_en", None), ("difficulty_index", "hard"))]
+            db.session.add_all(edits)
+            db.session.commit()
+            ids = [c.id for c in edits]
+        res = client.post(f"/knowledge/contributions/{ids[0]}/review", json={"status": "accepted"},
+                          headers=admin_headers(app))
+        assert res.status_code == 409
+        res = client.post("/knowledge/contributions/review/batch", headers=admin_headers(app),
+                          json={"reviews": [{"id": i, "status": "accepted"} for i in ids]})
+        assert res.status_code == 200
+        assert [r["error"] for r in res.get_json()["results"]] == ["Merge conflict", "Merge conflict"]
+        assert client.get(f"/knowledge/maqam/{self.rast_id(app)}").get_json()["name"]["en"] == "Rast"
+
+    def test_stale_edit_conflicts(self, client, app):
+        """An edit proposed against an older version does not overwrite newer changes."""
+        contrib_id = self.propose_edit(client, app, "description_en", "Proposed")
+        res = client.put(f"/knowledge/maqam/{self.rast_id(app)}", json={"description_en": "Newer"},
+                         headers=admin_headers(app))
+        assert res.get_json()["version"] == 2
+        res = client.post(f"/knowledge/contributions/{contrib_id}/review", json={"status": "accepted"},
+                          headers=admin_headers(app))
+        assert res.status_code == 409
+        assert "version 1, now 2" in res.get_json()["details"]
+        assert client.get(f"/knowledge/maqam/{self.rast_id(app)}").get_json()["descriptions"]["en"] == "Newer"
+
+    def test_batch_review_isolates_conflicts(self, client, app):
+        proposals = [{"name_en": "Rast", "name_ar": "راست"}, {"name_en": "Asbahan", "name_ar": "أصبهان"}]
+        ids = [client.post("/knowledge/maqam", json=p, headers=learner_headers(app)).get_json()["id"]
+               for p in proposals]
+        edit_id = self.propose_edit(client, app, "usage", "weddings,festivals")
+        res = client.post("/knowledge/contributions/review/batch", headers=admin_headers(app),
+                          json={"reviews": [{"id": i, "status": "accepted"} for i in ids + [edit_id]]})
+        body = res.get_json()
+        assert (body["reviewed"], body["failed"]) == (2, 1)
+        assert body["results"][0]["error"] == "Merge conflict"
+
+        names = [m["name"]["en"] for m in client.get("/knowledge/maqam").get_json()]
+        assert names.count("Rast") == 1 and "Asbahan" in names
+        rast = client.get(f"/knowledge/maqam/{self.rast_id(app)}").get_json()
+        assert rast["usage"]["en"] == ["weddings", "festivals"]
+        queue = client.get("/knowledge/contributions?type=new_maqam", headers=admin_headers(app)).get_json()
+        assert [c["id"] for c in queue] == [ids[0]]
+
+    def test_batch_review_isolates_database_errors(self, client, app, monkeypatch):
+        from sqlalchemy.exc import SQLAlchemyError
+        from services import merge_service
+
+        failing = self.propose_edit(client, app, "description_en", "Fails")
+        passing = self.propose_edit(client, app, "usage", "weddings")
+        apply_contribution = merge_service.apply_contribution
+
+        def flaky(contrib):
+            if contrib.id == failing:
+                contrib.maqam_name = "half-applied"
+                raise SQLAlchemyError("storage unavailable")
+            return apply_contribution(contrib)
+
+        monkeypatch.setattr(merge_service, "apply_contribution", flaky)
+        res = client.post("/knowledge/contributions/review/batch", headers=admin_headers(app),
+                          json={"reviews": [{"id": failing, "status": "accepted"}, {"id": passing, "status": "accepted"}]})
+        assert res.status_code == 200
+        results = res.get_json()["results"]
+        assert results[0]["error"] == "Merge failed" and results[1]["status"] == "accepted"
+        statuses = {c["id"]: c["status"] for c in
+                    client.get(f"/knowledge/maqam/{self.rast_id(app)}/contributions").get_json()}
+        assert statuses[failing] == "pending"
+
+    def test_apply_accepted_command(self, app):
+        from models import MaqamContribution
+
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            db.session.add_all([
+                MaqamContribution(maqam_id=rast.id, type="field_edit", status="accepted",
+                                  payload_json=json.dumps({"field": "rarity_level", "new_value": "at_risk"})),
+                MaqamContribution(type="new_maqam", status="accepted",
+                                  payload_json=json.dumps({"name_en": "Hsin", "name_ar": "حسين"})),
+                MaqamContribution(type="new_maqam", status="accepted",
+                                  payload_json=json.dumps({"name_en": "Sika", "name_ar": "سيكاه"})),
+                MaqamContribution(maqam_id=rast.id, type="note", status="accepted", payload_json="{}"),
+            ])
+            db.session.commit()
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["contributions", "apply-accepted"])
+        assert result.exit_code == 0
+        assert "Applied 2 contributions, 1 conflicts." in result.output
+        with app.app_context():
+            assert Maqam.query.filter_by(name_en="Rast").first().rarity_level == "at_risk"
+            assert Maqam.query.filter_by(name_en="Hsin").count() == 1
+        assert "Applied 0 contributions, 1 conflicts." in runner.invoke(args=["contributions", "apply-accepted"]).output
+
+
+# =============================================================================
+# Audio Storage Tests
+# =============================================================================
+
+def upload(client, app, maqam_id, data, filename):
+    import io
+
+    return client.post(f"/knowledge/maqam/{maqam_id}/audio", headers=admin_headers(app),
+                       data={"audio": (io.BytesIO(data), filename)}, content_type="multipart/form-data")
+
+
+class TestAudioStorage:
+    """Tests for content-addressed audio uploads."""
+
+    @pytest.fixture(autouse=True)
+    def _storage(self, app, tmp_path):
+        app.config["AUDIO_STORAGE_DIR"] = str(tmp_path / "audio")
+        self.root = tmp_path / "audio"
+
+    def ids(self, app):
+        with app.app_context():
+            return [m.id for m in Maqam.query.order_by(Maqam.id)]
+
+    def stored_files(self):
+        return sorted(p.name for p in self.root.rglob("*") if p.is_file())
+
+    def test_identical_uploads_stored_once(self, client, app):
+        import hashlib
+        from models import AudioBlob, MaqamAudio
+
+        rast_id, dhail_id = self.ids(app)[:2]
+        clip = b"ID3" + bytes(range(256)) * 40
+        first = upload(client, app, rast_id, clip, "rast take.mp3")
+        second = upload(client, app, dhail_id, clip, "copy.mp3")
+        assert (first.status_code, second.status_code) == (201, 201)
+        sha256 = hashlib.sha256(clip).hexdigest()
+        assert first.get_json()["sha256"] == second.get_json()["sha256"] == sha256
+        assert self.stored_files() == [sha256]
+
+        again = upload(client, app, rast_id, clip, "again.mp3")
+        assert again.status_code == 200 and again.get_json()["id"] == first.get_json()["id"]
+        with app.app_context():
+            assert db.session.get(AudioBlob, sha256).refcount == 2
+            assert MaqamAudio.query.count() == 2
+
+        res = client.get(first.get_json()["audio_url"])
+        assert res.status_code == 200 and res.data == clip and res.mimetype == "audio/mpeg"
+        rast = client.get(f"/knowledge/maqam/{rast_id}").get_json()
+        assert rast["audio_urls"] == [first.get_json()["audio_url"]]
+
+    def test_deletes_release_blobs(self, client, app):
+        from models import AudioBlob
+
+        rast_id, dhail_id = self.ids(app)[:2]
+        shared = upload(client, app, rast_id, b"shared clip", "a.wav").get_json()
+        upload(client, app, dhail_id, b"shared clip", "b.wav")
+        own = upload(client, app, rast_id, b"rast only", "c.wav").get_json()
+
+        client.delete(f"/knowledge/maqam/audio/{shared['id']}", headers=admin_headers(app))
+        with app.app_context():
+            assert db.session.get(AudioBlob, shared["sha256"]).refcount == 1
+        assert len(self.stored_files()) == 2
+
+        client.delete(f"/knowledge/maqam/{rast_id}", headers=admin_headers(app))
+        with app.app_context():
+            assert db.session.get(AudioBlob, own["sha256"]) is None
+        assert self.stored_files() == [shared["sha256"]]
+        assert client.get(own["audio_url"]).status_code == 404
+
+        client.delete(f"/knowledge/maqam/{dhail_id}", headers=admin_headers(app))
+        assert self.stored_files() == []
+
+    def test_import_replacing_recordings_releases_blobs(self, client, app):
+        from models import AudioBlob
+
+        rast_id = self.ids(app)[0]
+        own = upload(client, app, rast_id, b"replaced clip", "r.wav").get_json()
+        body = ndjson({"name_en": "Rast", "name_ar": "راست", "audio_urls": ["/static/audio/rast.mp3"]})
+        res = client.post("/knowledge/import", data=body, headers=admin_headers(app))
+        assert res.status_code == 200
+        with app.app_context():
+            assert db.session.get(AudioBlob, own["sha256"]) is None
+        assert own["sha256"] not in self.stored_files()
+
+    def test_gc_removes_unreferenced_files(self, client, app):
+        rast_id = self.ids(app)[0]
+        kept = upload(client, app, rast_id, b"kept", "k.mp3").get_json()["sha256"]
+        with app.app_context():
+            import io
+            from services.audio_storage import get_audio_storage
+
+            get_audio_storage().put(io.BytesIO(b"never committed"))
+        runner = app.test_cli_runner()
+        assert "Removed 0" in runner.invoke(args=["audio", "gc"]).output
+        assert "Removed 1" in runner.invoke(args=["audio", "gc", "--grace", "-1"]).output
+        assert self.stored_files() == [kept]
+
+
+# =============================================================================
+# Audio Streaming Tests
+# =============================================================================
+
+class TestAudioStreaming:
+    """Tests for range requests and caching on the audio endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def _storage(self, app, tmp_path):
+        app.config["AUDIO_STORAGE_DIR"] = str(tmp_path / "audio")
+
+    @pytest.fixture()
+    def clip(self, client, app):
+        with app.app_context():
+            rast_id = Maqam.query.filter_by(name_en="Rast").first().id
+        data = bytes(range(256)) * 1024
+        body = upload(client, app, rast_id, data, "rast.ogg").get_json()
+        return data, body["sha256"], body["audio_url"]
+
+    def test_range_request(self, client, clip):
+        data, sha256, url = clip
+        res = client.get(url, headers={"Range": "bytes=100000-100099"})
+        assert res.status_code == 206
+        assert res.data == data[100000:100100]
+        assert res.headers["Content-Range"] == f"bytes 100000-100099/{len(data)}"
+
+        res = client.get(url, headers={"Range": "bytes=-10"})
+        assert res.status_code == 206 and res.data == data[-10:]
+
+    def test_immutable_content_etag(self, client, app, clip):
+        _, sha256, url = clip
+        res = client.get(url)
+        assert res.headers["ETag"] == f'"{sha256}"'
+        assert res.headers["Accept-Ranges"] == "bytes"
+        cache_control = res.headers["Cache-Control"]
+        assert "immutable" in cache_control and "public" in cache_control and "no-cache" not in cache_control
+        assert f"max-age={app.config['AUDIO_CACHE_MAX_AGE']}" in cache_control
+
+        res = client.get(url, headers={"If-None-Match": f'"{sha256}"'})
+        assert res.status_code == 304 and res.data == b""
+
+    def test_accel_redirect_offload(self, client, app, clip):
+        _, sha256, url = clip
+        app.config["AUDIO_ACCEL_REDIRECT_PREFIX"] = "/_audio/"
+        res = client.get(url)
+        assert res.status_code == 200 and res.data == b""
+        assert res.headers["X-Accel-Redirect"] == f"/_audio/{sha256[:2]}/{sha256}"
+        assert res.mimetype == "audio/ogg"
+
+    def test_unknown_digest(self, client):
+        assert client.get("/knowledge/audio/" + "0" * 64).status_code == 404
+        assert client.get("/knowledge/audio/..%2Fapp.py").status_code == 404
+
+    def test_import_static_clips(self, client, app):
+        import hashlib
+        from models import MaqamAudio
+
+        with app.app_context():
+            rast = Maqam.query.filter_by(name_en="Rast").first()
+            db.session.add_all([
+                MaqamAudio(maqam_id=rast.id, url="http://localhost:8000/static/audio/ALDHAIL.mp3"),
+                MaqamAudio(maqam_id=rast.id, url="/static/audio/missing.mp3"),
+                MaqamAudio(maqam_id=rast.id, url="https://example.org/clip.mp3"),
+            ])
+            db.session.commit()
+            with open(os.path.join(app.static_folder, "audio", "ALDHAIL.mp3"), "rb") as fh:
+                sha256 = hashlib.sha256(fh.read()).hexdigest()
+
+        result = app.test_cli_runner().invoke(args=["audio", "import-static"])
+        assert "Moved 1 audio clips into storage; 1 referenced files were not found." in result.output
+        with app.app_context():
+            urls = [a.url for a in MaqamAudio.query.order_by(MaqamAudio.id)]
+        assert urls == [f"/knowledge/audio/{sha256}", "/static/audio/missing.mp3", "https://example.org/clip.mp3"]
+        res = client.get(urls[0], headers={"Range": "bytes=0-3"})
+        assert res.status_code == 206 and res.mimetype == "audio/mpeg"
+
+
+# =============================================================================
+# Audio Analysis Tests
+# =============================================================================
+
+def sine_wav(seconds=1.5, rate=16000, channels=2, amplitude=0.5):
+    import io
+    import wave
+    import numpy as np
+
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (amplitude * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(tone, channels).tobytes())
+    return buf.getvalue()
+
+
+class TestAudioAnalysis:
+    """Tests for background analysis of uploaded clips."""
+
+    @pytest.fixture(autouse=True)
+    def _storage(self, app, tmp_path):
+        app.config["AUDIO_STORAGE_DIR"] = str(tmp_path / "audio")
+
+    def rast_id(self, app):
+        with app.app_context():
+            return Maqam.query.filter_by(name_en="Rast").first().id
+
+    def test_wav_upload_is_analyzed(self, client, app):
+        body = upload(client, app, self.rast_id(app), sine_wav(), "rast.wav").get_json()
+        assert body["analysis"]["status"] == "done"
+
+        res = client.get(body["analysis"]["url"])
+        assert res.status_code == 200
+        analysis = res.get_json()
+        assert analysis["duration_seconds"] == 1.5
+        assert (analysis["sample_rate"], analysis["channels"]) == (16000, 2)
+        # A sine at half scale: RMS is 3 dB below its peak
+        assert analysis["peak_dbfs"] == pytest.approx(-6.02, abs=0.05)
+        assert analysis["loudness_dbfs"] == pytest.approx(-9.03, abs=0.05)
+        peaks = analysis["peaks"]
+        assert peaks["buckets"] == 512 and len(peaks["data"]) == 1024
+        assert -64 <= min(peaks["data"]) <= -63 and 63 <= max(peaks["data"]) <= 64
+
+        assert client.get(body["analysis"]["url"], headers={"If-None-Match": res.headers["ETag"]}).status_code == 304
+
+    def test_undecodable_clip_fails_without_breaking_upload(self, client, app):
+        res = upload(client, app, self.rast_id(app), b"not audio at all", "noise.mp3")
+        assert res.status_code == 201
+        analysis = client.get(res.get_json()["analysis"]["url"]).get_json()
+        assert analysis["status"] == "failed" and analysis["peaks"] is None
+
+    def test_mp3_duration_from_frame_headers(self, app):
+        from services.audio_analysis import analyze_file
+
+        result = analyze_file(os.path.join(app.static_folder, "audio", "ALDHAIL.mp3"), ffmpeg=None)
+        assert result["status"] == "partial"
+        assert result["duration_seconds"] > 1 and result["sample_rate"] in (32000, 44100, 48000)
+
+    def test_background_pool_and_cli_backlog(self, client, app):
+        from models import AudioAnalysis
+
+        app.config["AUDIO_ANALYSIS_WORKERS"] = 2
+        body = upload(client, app, self.rast_id(app), sine_wav(seconds=0.5), "short.wav").get_json()
+        worker = app.extensions["audio_worker"]
+        worker.shutdown(wait=True)
+        assert client.get(body["analysis"]["url"]).get_json()["status"] == "done"
+
+        with app.app_context():
+            db.session.get(AudioAnalysis, body["sha256"]).status = "pending"
+            db.session.commit()
+        result = app.test_cli_runner().invoke(args=["audio", "analyze"])
+        assert "Analyzed 1 audio clips: 1 done." in result.output
+
+    def test_analysis_removed_with_blob(self, client, app):
+        from models import AudioAnalysis
+
+        body = upload(client, app, self.rast_id(app), sine_wav(), "rast.wav").get_json()
+        client.delete(f"/knowledge/maqam/audio/{body['id']}", headers=admin_headers(app))
+        with app.app_context():
+            assert db.session.get(AudioAnalysis, body["sha256"]) is None
+        assert client.get(body["analysis"]["url"]).status_code == 404
+
+
+# =============================================================================
+# Jins Preview Tests
+# =============================================================================
+
+class TestJinsPreview:
+    """Tests for synthesized jins previews."""
+
+    @pytest.fixture(autouse=True)
+    def _previews(self, app, tmp_path):
+        app.config["JINS_PREVIEW_DIR"] = str(tmp_path / "previews")
+        self.root = tmp_path / "previews"
+
+    def rast_id(self, app):
+        with app.app_context():
+            return Maqam.query.filter_by(name_en="Rast").first().id
+
+    def test_preview_plays_quarter_tone_notes(self, client, app):
+        import io
+        import wave
+        import numpy as np
+        from services.jins_preview_service import NOTE_SECONDS
+
+        res = client.get(f"/knowledge/maqam/{self.rast_id(app)}/jins/0/preview.wav")
+        assert res.status_code == 200 and res.mimetype == "audio/wav"
+        with wave.open(io.BytesIO(res.data)) as wav:
+            rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(float)
+
+        def pitch(index):
+            note = samples[int(index * NOTE_SECONDS * rate):int((index + 1) * NOTE_SECONDS * rate)]
+            spectrum = np.abs(np.fft.rfft(note, n=rate * 4))
+            return np.argmax(spectrum) / 4
+
+        # C, D, E-half-flat, F
+        assert [pitch(i) for i in range(4)] == pytest.approx([261.6, 293.7, 320.2, 349.2], abs=0.5)
+
+    def test_preview_cached_and_conditional(self, client, app):
+        url = f"/knowledge/maqam/{self.rast_id(app)}/jins/0/preview.wav"
+        first = client.get(url)
+        second = client.get(url)
+        assert first.data == second.data
+        assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+        with app.app_context():
+            from services.cache_service import cache_stats
+            stats = cache_stats()["jins_previews"]
+        assert stats["hits"] >= 1 and stats["bytes"] == len(first.data)
+        assert len(list(self.root.glob("*.wav"))) == 1
+
+    def test_missing_jins(self, client, app):
+        assert client.get(f"/knowledge/maqam/{self.rast_id(app)}/jins/9/preview.wav").status_code == 404
+        assert client.get("/knowledge/maqam/9999/jins/0/preview.wav").status_code == 404
+
+    def test_render_previews_command(self, app):
+        runner = app.test_cli_runner()
+        first = runner.invoke(args=["catalog", "render-previews"]).output
+        stored = len(list(self.root.glob("*.wav")))
+        assert stored > 0 and f"Rendered {stored} jins previews" in first
+        assert "Rendered 0 jins previews" in runner.invoke(args=["catalog", "render-previews"]).output
+
+    def test_byte_bounded_cache(self):
+        from services.cache_service import LRUCache
+
+        cache = LRUCache(capacity=10, max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.put("c", b"1234")
+        assert cache.get("a") is None and cache.get("c") == b"1234"
+        cache.put("huge", b"x" * 11)
+        assert cache.get("huge") is None and cache.stats()["bytes"] == 8
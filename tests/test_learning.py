@@ -216,3 +216,361 @@ def test_contribution_submission(client):
     assert res.status_code in (201, 200)
     body = res.get_json()
     assert "status" in body
+
+
+def test_flashcards_snapshot_etag(client):
+    res = client.get("/learning/flashcards?topic=region")
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+
+    res = client.get("/learning/flashcards?topic=region", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    # Different parameters are a different view
+    res = client.get("/learning/flashcards?topic=emotion", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+
+    res = client.get("/learning/flashcards?topic=unknown")
+    assert res.status_code == 400
+
+
+def test_flashcards_level_lang_and_pages(app, client):
+    with app.app_context():
+        seed_quiz_catalog()
+        for maqam in Maqam.query.filter(Maqam.name_en.in_(["Rast", "Dhail"])):
+            maqam.difficulty_label = "intermediate"
+        db.session.commit()
+
+    res = client.get("/learning/flashcards?topic=region")
+    assert res.get_json()["level"] == "all" and res.get_json()["count"] == 4
+
+    body = client.get("/learning/flashcards?topic=region&level=Intermediate").get_json()
+    assert [c["name_en"] for c in body["cards"]] == ["Rast", "Dhail"]
+    assert body["level"] == "intermediate"
+    assert client.get("/learning/flashcards?level=expert").status_code == 400
+
+    card = client.get("/learning/flashcards?topic=ajnas&lang=en&level=intermediate").get_json()["cards"][0]
+    assert card["back"] == "Rast" and not any(k.endswith("_ar") for k in card)
+    card = client.get("/learning/flashcards?topic=emotion&lang=ar").get_json()["cards"][0]
+    assert card["name_ar"] == "سيكاه" and not any(k.endswith("_en") for k in card)
+    assert client.get("/learning/flashcards?lang=fr").status_code == 400
+
+    res = client.get("/learning/flashcards?topic=usage&limit=3")
+    assert res.get_json()["count"] == 3 and "rel=\"next\"" in res.headers["Link"]
+    res = client.get(f"/learning/flashcards?topic=usage&limit=3&cursor={res.headers['X-Next-Cursor']}")
+    assert [c["name_en"] for c in res.get_json()["cards"]] == ["Dhail"]
+    assert "X-Next-Cursor" not in res.headers
+    assert client.get("/learning/flashcards?cursor=bogus").status_code == 400
+
+    # Decks are compiled once per catalog version, with a single query
+    app.config["SQL_QUERY_COUNT_HEADER"] = True
+    res = client.get("/learning/flashcards?topic=usage&level=beginner")
+    assert res.headers["X-SQL-Queries"] == "0"
+
+
+def test_quiz_answered_from_another_process(app, client):
+    headers = auth_header(client)
+    quiz = client.post("/learning/quiz/start", json={"lang": "en"}, headers=headers).get_json()
+
+    # A second worker process: a fresh app sharing the database, not the memory
+    other = create_app()
+    other.config.update({"TESTING": True})
+    res = other.test_client().post(f"/learning/quiz/{quiz['quiz_id']}/answer",
+                                   json={"answers": [None] * quiz["count"]}, headers=headers)
+    assert res.status_code == 200 and res.get_json()["total"] == quiz["count"]
+
+
+def test_quiz_store_expiry_and_bound(app, client):
+    from models import QuizSession
+
+    headers = auth_header(client)
+    app.config.update({"QUIZ_TTL_SECONDS": -1})
+    expired = client.post("/learning/quiz/start", json={}, headers=headers).get_json()["quiz_id"]
+    assert client.post(f"/learning/quiz/{expired}/answer", json={"answers": []}, headers=headers).status_code == 404
+
+    app.config.update({"QUIZ_TTL_SECONDS": 3600, "QUIZ_STORE_MAX_SIZE": 2})
+    ids = [client.post("/learning/quiz/start", json={}, headers=headers).get_json()["quiz_id"] for _ in range(4)]
+    assert len(set(ids)) == 4 and expired not in ids
+    with app.app_context():
+        assert sorted(q.id for q in QuizSession.query) == ids[-2:]
+
+
+def test_database_quiz_store_leaves_commit_to_caller(app):
+    from models import QuizSession
+    from services.quiz_store import DatabaseQuizStore
+
+    with app.app_context():
+        store = DatabaseQuizStore(ttl=60, max_size=10)
+        db.session.add(Maqam(name_en="Unrelated", name_ar="غير"))
+        quiz_id = store.create({"questions": []})
+        assert store.get(quiz_id) == {"questions": [], "id": quiz_id}
+        db.session.rollback()
+        assert Maqam.query.filter_by(name_en="Unrelated").count() == 0
+        assert QuizSession.query.count() == 0
+
+
+def test_memory_quiz_store():
+    import time
+    from services.quiz_store import MemoryQuizStore
+
+    store = MemoryQuizStore(ttl=3600, max_size=2)
+    ids = [store.create({"questions": [n]}) for n in range(3)]
+    assert ids == [1, 2, 3] and len(store) == 2
+    assert store.get(1) is None and store.get(3) == {"id": 3, "questions": [2]}
+
+    store = MemoryQuizStore(ttl=0.01, max_size=10)
+    quiz_id = store.create({})
+    time.sleep(0.02)
+    assert store.get(quiz_id) is None
+
+
+def seed_quiz_catalog():
+    for name, region, usage in (("Rast", "sfax", "weddings"), ("Mhayer", "sousse", "Sufi"), ("Dhail", "bizerte", "Malouf")):
+        db.session.add(Maqam(name_en=name, name_ar=name, emotion="joy", usage=usage,
+                             regions_json=json.dumps([region]), ajnas_json=json.dumps([{"name": {"en": name}}])))
+    db.session.commit()
+
+
+def test_stateless_quiz_token(app, client):
+    headers = auth_header(client)
+    with app.app_context():
+        seed_quiz_catalog()
+    res = client.post("/learning/quiz/start", json={"stateless": True}, headers=headers)
+    quiz = res.get_json()
+    assert isinstance(quiz["quiz_id"], str) and all("answer" not in q for q in quiz["questions"])
+    with app.app_context():
+        from models import QuizSession
+        assert QuizSession.query.count() == 0
+
+    # Grade on another node: a fresh app that only shares the secret and the catalog
+    other = create_app()
+    other.config.update({"TESTING": True})
+    first = quiz["questions"][0]
+    answers = [q["choices"][0] if q["type"] == "mcq" else "JOY " for q in quiz["questions"]]
+    res = other.test_client().post(f"/learning/quiz/{quiz['quiz_id']}/answer", json={"answers": answers},
+                                   headers=headers)
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body["total"] == quiz["count"]
+    details = body["details"]
+    assert details[0]["question"] == first["prompt"] and details[0]["choices"] == first.get("choices")
+    expected = [
+        d["user_answer"].strip().lower() == d["correct_answer"].lower() if d["question_type"] == "open"
+        else d["user_answer"] == d["correct_answer"]
+        for d in details
+    ]
+    assert [d["is_correct"] for d in details] == expected and any(expected)
+    assert body["correct"] == sum(expected)
+
+
+def test_quiz_token_tampering_and_expiry(app, client):
+    import jwt
+
+    headers = auth_header(client)
+    token = client.post("/learning/quiz/start", json={"stateless": True}, headers=headers).get_json()["quiz_id"]
+    header, payload, signature = token.split(".")
+    forged = f"{header}.{payload[:-2]}AA.{signature}"
+    assert client.post(f"/learning/quiz/{forged}/answer", json={"answers": []}, headers=headers).status_code == 400
+
+    # A quiz token is not an access token, and an access token is not a quiz token
+    assert client.get("/learning/activity-log", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    access = headers["Authorization"].split()[1]
+    assert client.post(f"/learning/quiz/{access}/answer", json={"answers": []}, headers=headers).status_code == 400
+
+    with app.app_context():
+        expired = jwt.encode({**jwt.decode(token, options={"verify_signature": False}), "exp": 1},
+                             app.config["JWT_SECRET"], algorithm=app.config["JWT_ALG"])
+    res = client.post(f"/learning/quiz/{expired}/answer", json={"answers": []}, headers=headers)
+    assert res.status_code == 404 and res.get_json()["error"] == "quiz expired"
+
+
+def test_quiz_catalog_compiled_once_per_version(app, client):
+    from services.catalog_service import catalog_changed
+    from services.quiz_service import get_quiz_catalog, seeded_questions
+
+    with app.app_context():
+        seed_quiz_catalog()
+        catalog_changed()
+        db.session.commit()
+        compiled = get_quiz_catalog()
+        assert get_quiz_catalog() is compiled
+        assert set(compiled.pools["region"]) == {"tunis", "sfax", "sousse", "bizerte"}
+        questions = seeded_questions(compiled, 5, seed=42)
+        assert len(questions) == 5 and questions == seeded_questions(compiled, 5, seed=42)
+        for q in questions:
+            if q["type"] == "mcq":
+                assert q["answer"] in q["choices"] and len(set(q["choices"])) == len(q["choices"]) >= 2
+
+        db.session.add(Maqam(name_en="Nawa", name_ar="نوى", regions_json=json.dumps(["gabes"])))
+        catalog_changed()
+        db.session.commit()
+        assert "gabes" in get_quiz_catalog().pools["region"]
+
+
+def test_quiz_grading_bulk_records_answers(app, client):
+    from models import QuizAnswer
+
+    headers = auth_header(client)
+    with app.app_context():
+        seed_quiz_catalog()
+    app.config["SQL_QUERY_COUNT_HEADER"] = True
+    quiz = client.post("/learning/quiz/start", json={}, headers=headers).get_json()
+    assert quiz["count"] == 15
+    answers = [q["answer"] if i % 2 else "wrong" for i, q in enumerate(quiz["questions"])]
+    res = client.post(f"/learning/quiz/{quiz['quiz_id']}/answer", json={"answers": answers}, headers=headers)
+    body = res.get_json()
+    assert body["correct"] == 7
+    # Stored quiz, catalog and stats lookups, one INSERT for all answers: not one query per question
+    assert int(res.headers["X-SQL-Queries"]) < 10
+    rast = next(d for d in body["details"] if d["explanation"]["maqam_en"] == "Rast")
+    assert rast["explanation"] == {"maqam_en": "Rast", "emotion_en": "joy", "regions": ["sfax"], "usage": "weddings"}
+
+    with app.app_context():
+        rows = QuizAnswer.query.order_by(QuizAnswer.position).all()
+        assert len(rows) == 15 and len({r.quiz_ref for r in rows}) == 1
+        assert rows[0].quiz_ref.startswith("s:")
+        assert [r.is_correct for r in rows] == [bool(i % 2) for i in range(15)]
+        assert {r.kind for r in rows} == {"emotion", "region", "usage", "ajnas"}
+        assert rows[0].user_answer == "wrong" and rows[0].user_id == "demo@local"
+
+
+def test_review_schedule_from_quiz_and_activities(app, client):
+    from datetime import datetime, timedelta
+    from models import ReviewState
+    from services.review_service import due_reviews
+
+    headers = auth_header(client)
+    with app.app_context():
+        seed_quiz_catalog()
+    quiz = client.post("/learning/quiz/start", json={"lang": "en"}, headers=headers).get_json()
+    # Every answer wrong: each graded question becomes a lapsed item
+    client.post(f"/learning/quiz/{quiz['quiz_id']}/answer", json={"answers": [None] * quiz["count"]},
+                headers=headers)
+    with app.app_context():
+        states = ReviewState.query.filter_by(user_id="demo@local").all()
+        assert len(states) == quiz["count"]
+        assert all(s.lapses == 1 and s.repetitions == 0 and s.ease < 2.5 for s in states)
+
+    res = client.post("/learning/complete-activity", headers=headers,
+                      json={"maqam_id": 1, "activity": "flashcards_region", "grade": 5})
+    assert res.status_code == 200
+    res = client.post("/learning/complete-activity", headers=headers,
+                      json={"maqam_id": 1, "activity": "flashcards_region", "grade": 9})
+    assert res.status_code == 400
+    with app.app_context():
+        state = db.session.get(ReviewState, ("demo@local", 1, "region"))
+        assert state.repetitions == 1 and state.interval_days == 1.0
+        # Unknown activities are logged but not scheduled
+        before = ReviewState.query.count()
+        client.post("/learning/complete-activity", json={"maqam_id": 1, "activity": "a1"}, headers=headers)
+        assert ReviewState.query.count() == before
+
+    # Nothing is due before the lapse delay; afterwards the lapsed items are, not the recalled one
+    assert client.get("/learning/review/due", headers=headers).get_json()["count"] == 0
+    with app.app_context():
+        later = datetime.utcnow() + timedelta(hours=1)
+        due = due_reviews("demo@local", 100, now=later)
+        lapsed = ReviewState.query.filter_by(repetitions=0).count()
+        assert len(due) == lapsed and all(item["repetitions"] == 0 for item in due)
+        assert [item["due_at"] for item in due] == sorted(item["due_at"] for item in due)
+        assert len(due_reviews("demo@local", 2, now=later)) == min(2, lapsed)
+        assert all(item["topic"] == "ajnas" for item in due_reviews("demo@local", 100, "ajnas", now=later))
+        ReviewState.query.update({ReviewState.due_at: datetime.utcnow() - timedelta(minutes=1)})
+        db.session.commit()
+
+    body = client.get("/learning/review/due?limit=1", headers=headers).get_json()
+    assert body["count"] == 1 and body["items"][0]["name_en"]
+    assert client.get("/learning/review/due?topic=bogus", headers=headers).status_code == 400
+    assert client.get("/learning/review/due").status_code == 401
+
+
+def test_review_due_query_uses_user_due_index(app):
+    from sqlalchemy import text
+
+    with app.app_context():
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM review_state WHERE user_id = 'a' AND due_at <= '2030-01-01' "
+            "ORDER BY due_at LIMIT 20"
+        )).all()
+        assert "ix_review_state_user_due" in " ".join(str(row[-1]) for row in plan)
+
+
+def test_every_planned_activity_is_scheduled(app, client):
+    from models import ReviewState
+    from services.review_service import ACTIVITY_TOPICS
+
+    headers = auth_header(client)
+    plan = client.get("/learning/plan", headers=headers).get_json()
+    planned = plan["items"][0]["suggested_activities"]
+    # Names the web client reports besides the plan's
+    reported = ["mcq_region", "matching_emotion", "audio_mcq", "order_notes"]
+    for activity in planned + reported:
+        res = client.post("/learning/complete-activity", headers=headers,
+                          json={"maqam_id": 1, "activity": activity, "user_id": "someone-else@test"})
+        assert res.status_code == 200
+    with app.app_context():
+        topics = {s.topic for s in ReviewState.query.filter_by(user_id="demo@local", maqam_id=1)}
+        assert topics == {ACTIVITY_TOPICS[a] for a in planned + reported}
+        assert topics == {"emotion", "region", "audio", "clues", "notes"}
+        # The body cannot write another learner's progress
+        assert ReviewState.query.filter_by(user_id="someone-else@test").count() == 0
+
+
+def test_quiz_answers_cannot_be_replayed(app, client):
+    from models import UserStat
+
+    headers = auth_header(client)
+    with app.app_context():
+        seed_quiz_catalog()
+    for body in ({"stateless": True}, {}):
+        quiz = client.post("/learning/quiz/start", json=body, headers=headers).get_json()
+        url = f"/learning/quiz/{quiz['quiz_id']}/answer"
+        first = client.post(url, json={"answers": [None] * quiz["count"]}, headers=headers)
+        assert first.status_code == 200 and first.get_json()["correct"] == 0
+        # Resubmitting with the answers the first attempt revealed does not score
+        answers = [d["correct_answer"] for d in first.get_json()["details"]]
+        res = client.post(url, json={"answers": answers}, headers=headers)
+        assert res.status_code == 409
+    with app.app_context():
+        stat = UserStat.query.filter_by(user_id="demo@local").one()
+        assert (stat.quizzes, stat.best_score) == (2, 0.0)
+
+
+def test_stored_quiz_refs_survive_store_restart(app, client):
+    app.config["QUIZ_STORE_BACKEND"] = "memory"
+    headers = auth_header(client)
+    with app.app_context():
+        seed_quiz_catalog()
+    quiz_ids = []
+    for _ in range(2):
+        quiz = client.post("/learning/quiz/start", json={"stateless": False}, headers=headers).get_json()
+        quiz_ids.append(quiz["quiz_id"])
+        res = client.post(f"/learning/quiz/{quiz['quiz_id']}/answer",
+                          json={"answers": [None] * quiz["count"]}, headers=headers)
+        assert res.status_code == 200
+        # A restarted worker numbers its in-memory quizzes from 1 again
+        app.extensions.pop("quiz_store")
+    assert quiz_ids == [1, 1]
+
+
+def test_answer_errors_other_than_replays_propagate(app):
+    from sqlalchemy.exc import IntegrityError
+    from services.quiz_service import record_answers
+
+    row = {"position": 0, "maqam_id": None, "kind": "emotion", "user_answer": None, "is_correct": False}
+    with app.app_context():
+        with pytest.raises(IntegrityError):
+            record_answers(None, "s:nonce", [row])
+        db.session.rollback()
+
+
+def test_token_without_email_answers_quiz(app, client):
+    from services.auth_service import issue_token
+
+    with app.app_context():
+        seed_quiz_catalog()
+        headers = {"Authorization": f"Bearer {issue_token(sub='guest', role='learner')}"}
+    quiz = client.post("/learning/quiz/start", json={"stateless": False}, headers=headers).get_json()
+    res = client.post(f"/learning/quiz/{quiz['quiz_id']}/answer",
+                      json={"answers": [None] * quiz["count"]}, headers=headers)
+    assert res.status_code == 200
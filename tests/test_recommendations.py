@@ -560,3 +560,141 @@ class TestResponseFields:
         if data["recommendations"]:
             rec = data["recommendations"][0]
             assert "rarity_level" in rec
+
+
+# =============================================================================
+# Response Cache Tests
+# =============================================================================
+
+class TestRecommendationCache:
+    """Tests for the normalized-request response cache."""
+
+    def test_equivalent_requests_hit_cache(self, client):
+        """Case and whitespace variants of a request share one cache entry."""
+        headers = get_auth_header(client)
+
+        first = client.post("/recommendations/maqam", json={"mood": "joy", "region": "Tunis"}, headers=headers)
+        second = client.post("/recommendations/maqam", json={"mood": " JOY ", "region": "tunis"}, headers=headers)
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert first.get_data() == second.get_data()
+
+    def test_personalized_requests_bypass_cache(self, client):
+        """Personalized requests are never cached."""
+        headers = get_auth_header(client)
+
+        for _ in range(2):
+            response = client.post(
+                "/recommendations/maqam",
+                json={"mood": "joy", "personalize": True},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert "X-Cache" not in response.headers
+
+    def test_knowledge_write_invalidates_cache(self, client, app):
+        """Updating a maqam changes the catalog version and drops cached responses."""
+        from services.auth_service import issue_token
+
+        headers = get_auth_header(client)
+        client.post("/recommendations/maqam", json={"mood": "longing"}, headers=headers)
+
+        with app.app_context():
+            token = issue_token(sub="admin@test", role="admin", email="admin@test")
+        res = client.put(
+            "/knowledge/maqam/1",
+            json={"emotion": "longing"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert res.status_code == 200
+
+        response = client.post("/recommendations/maqam", json={"mood": "longing"}, headers=headers)
+        assert response.headers["X-Cache"] == "MISS"
+        names = [r["maqam"] for r in response.get_json()["recommendations"]]
+        assert "Rast" in names
+
+    def test_cache_metrics_exposed(self, client):
+        """Hit-rate metrics are reported on /status."""
+        headers = get_auth_header(client)
+        client.post("/recommendations/maqam", json={"mood": "joy"}, headers=headers)
+        client.post("/recommendations/maqam", json={"mood": "joy"}, headers=headers)
+
+        stats = client.get("/status").get_json()["caches"]["recommendations"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+class TestRecommendationTuning:
+    """Test weight files and the offline evaluation harness."""
+
+    def _scenarios(self, tmp_path):
+        path = tmp_path / "scenarios.json"
+        path.write_text(json.dumps({"scenarios": [
+            {"id": "joy", "request": {"mood": "joy"}, "relevant": ["Rast"]},
+            {"id": "sad", "request": {"mood": "sadness"}, "relevant": ["Bayati"]},
+            {"id": "sahel", "request": {"region": "sahel", "preserve_heritage": True}, "relevant": ["Sika"]},
+            {"id": "tunis_beginner", "request": {"region": "tunis", "simple_for_beginners": True},
+             "relevant": ["Rast", "Bayati"]},
+        ]}))
+        return str(path)
+
+    def test_weights_file_changes_engine(self, app, client, tmp_path):
+        """A configured weights file is used by the online engine."""
+        weights = tmp_path / "weights.json"
+        weights.write_text(json.dumps({"weights": {"region": 0.9}}))
+        app.config["RECOMMENDATION_WEIGHTS_FILE"] = str(weights)
+
+        response = client.post("/recommendations/maqam", json={"region": "tunis"}, headers=get_auth_header(client))
+        confidences = [r["confidence"] for r in response.get_json()["recommendations"]]
+        assert confidences and confidences[0] >= 0.9
+
+    def test_unknown_weight_rejected(self, tmp_path):
+        from services.recommendation_service import load_weights
+
+        weights = tmp_path / "weights.json"
+        weights.write_text(json.dumps({"tempo": 1.0}))
+        with pytest.raises(ValueError):
+            load_weights(str(weights))
+
+    def test_vectorized_ranking_matches_engine(self, app, tmp_path):
+        """The harness ranks exactly like the online engine."""
+        from services.recommendation_eval import FeatureSet, load_scenarios, rank_matrix
+        from services.recommendation_service import DEFAULT_WEIGHTS, load_profiles, rank_profiles
+
+        with app.app_context():
+            profiles = load_profiles()
+            scenarios = load_scenarios(self._scenarios(tmp_path))
+            rankings = rank_matrix(FeatureSet(profiles, scenarios), DEFAULT_WEIGHTS)
+            for sc, ranked in zip(scenarios, rankings):
+                expected = [r["maqam"] for r in rank_profiles(profiles, sc["params"], DEFAULT_WEIGHTS)]
+                assert [profiles[i].name_en for i in ranked] == expected
+
+    def test_evaluate_reports_metrics_and_latency(self, app, tmp_path):
+        from services.recommendation_eval import evaluate, load_scenarios
+        from services.recommendation_service import load_profiles
+
+        with app.app_context():
+            scenarios = load_scenarios(self._scenarios(tmp_path))
+            report = evaluate(load_profiles(), scenarios, repeat=1)
+
+        assert set(report["metrics"]) == {"precision_at_k", "recall_at_k", "mrr", "ndcg_at_k"}
+        assert 0 < report["metrics"]["mrr"] <= 1
+        assert set(report["latency_ms"]["per_scenario"]) == {"joy", "sad", "sahel", "tunis_beginner"}
+
+    def test_grid_search_picks_best_configuration(self, app, tmp_path):
+        """A grid search across worker processes prefers weights that rank the labels first."""
+        from services.recommendation_eval import grid_search, load_scenarios
+        from services.recommendation_service import load_profiles
+
+        with app.app_context():
+            profiles = load_profiles()
+            scenarios = load_scenarios(self._scenarios(tmp_path))
+        grid = {"emotion_match": [0.0, 0.3], "region": [0.0, 0.2]}
+        result = grid_search(profiles, scenarios, grid=grid, objective="mrr", workers=2, chunk_size=1)
+
+        assert result["configurations"] == 4
+        assert result["weights"]["emotion_match"] == 0.3
+        assert result["metrics"]["mrr"] == max(entry["metrics"]["mrr"] for entry in result["leaderboard"])
+        assert result["metrics"]["mrr"] > result["leaderboard"][-1]["metrics"]["mrr"]